@@ -7,4 +7,6 @@ admin.site.register(Subject)
 admin.site.register(Instructor)
 admin.site.register(TeachingAssignment)
 admin.site.register(Timetable)
-admin.site.register(Grade)
\ No newline at end of file
+admin.site.register(Grade)
+admin.site.register(TranscriptSummary)
+admin.site.register(CohortSummary)
\ No newline at end of file
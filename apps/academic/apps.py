@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class AcademicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.academic'
\ No newline at end of file
+    name = 'apps.academic'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,272 @@
+"""
+Bulk grade ingestion.
+
+Parses CSV or JSON-lines uploads, resolves admission numbers and subject
+names to primary keys with batched lookups, validates rows chunk by chunk
+and writes every valid row inside one transaction — through PostgreSQL
+``COPY`` when available, ``bulk_create`` otherwise.
+
+Expected columns: ``admission_number`` (or ``student``/``student_id``),
+``subject`` (name, or ``subject_id``) and ``score``.
+"""
+
+import csv
+import io
+import json
+import math
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Grade, Student, Subject
+from .transcripts import mark_stale
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "jsonl")
+
+
+class GradeImportError(Exception):
+    """Raised when an upload cannot be read at all (bad format, missing columns)."""
+
+
+def detect_format(filename, explicit=None):
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and filename.lower().endswith((".jsonl", ".ndjson", ".json")):
+        fmt = "jsonl"
+    else:
+        fmt = "csv"
+    if fmt not in FORMATS:
+        raise GradeImportError(f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    return fmt
+
+
+def iter_rows(stream, fmt):
+    """
+    Yield ``(row_number, dict)`` pairs from a binary or text stream.
+    Row numbers are 1-based and count data rows only.
+    """
+    if isinstance(stream, (bytes, str)):
+        stream = io.BytesIO(stream.encode() if isinstance(stream, str) else stream)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames:
+            raise GradeImportError("CSV upload has no header row.")
+        for number, row in enumerate(reader, start=1):
+            yield number, row
+        return
+
+    number = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield number, row if isinstance(row, dict) else {"__invalid__": line}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _clean(value):
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+class _KeyResolver:
+    """Caches admission-number and subject lookups across chunks."""
+
+    def __init__(self):
+        self.students = {}
+        self.subjects = {}
+        self.subject_ids = set()
+        self.ambiguous_subjects = set()
+
+    def resolve(self, admission_numbers, subject_names, subject_ids):
+        missing = [a for a in admission_numbers if a not in self.students]
+        if missing:
+            self.students.update(
+                Student.objects.filter(admission_number__in=missing).values_list("admission_number", "id")
+            )
+        missing = [s for s in subject_names if s not in self.subjects and s not in self.ambiguous_subjects]
+        if missing:
+            for name, pk in Subject.objects.filter(name__in=missing).values_list("name", "id"):
+                if name in self.subjects:
+                    self.ambiguous_subjects.add(name)
+                else:
+                    self.subjects[name] = pk
+            for name in self.ambiguous_subjects:
+                self.subjects.pop(name, None)
+        missing = [pk for pk in subject_ids if pk not in self.subject_ids]
+        if missing:
+            self.subject_ids.update(Subject.objects.filter(pk__in=missing).values_list("id", flat=True))
+
+
+def _parse_row(raw):
+    """Split a raw row into its lookup keys and score, collecting field errors."""
+    errors = {}
+    if "__invalid__" in raw:
+        return None, {"row": ["Line is not a JSON object."]}
+
+    admission_number = _clean(raw.get("admission_number") or raw.get("student") or raw.get("student_id"))
+    if not admission_number:
+        errors["admission_number"] = ["This field is required."]
+
+    subject_name = _clean(raw.get("subject"))
+    subject_id = _clean(raw.get("subject_id"))
+    if subject_id:
+        if subject_id.isdigit():
+            subject_id = int(subject_id)
+        else:
+            errors["subject_id"] = ["A valid integer is required."]
+    elif not subject_name:
+        errors["subject"] = ["This field is required."]
+
+    score = raw.get("score")
+    try:
+        score = float(score)
+        if not math.isfinite(score):
+            raise ValueError
+    except (TypeError, ValueError):
+        errors["score"] = ["A valid number is required."]
+
+    return (admission_number, subject_name, subject_id or None, score), errors
+
+
+def _validate_chunk(chunk, resolver):
+    """Return ``(valid_rows, errors)`` for a chunk of ``(row_number, raw)`` pairs."""
+    parsed = []
+    errors = []
+    for number, raw in chunk:
+        values, row_errors = _parse_row(raw)
+        if row_errors:
+            errors.append({"row": number, "errors": row_errors})
+        else:
+            parsed.append((number, values))
+
+    resolver.resolve(
+        {v[0] for _, v in parsed},
+        {v[1] for _, v in parsed if v[2] is None},
+        {v[2] for _, v in parsed if v[2] is not None},
+    )
+
+    valid = []
+    for number, (admission_number, subject_name, subject_id, score) in parsed:
+        row_errors = {}
+        student_pk = resolver.students.get(admission_number)
+        if student_pk is None:
+            row_errors["admission_number"] = [f"Unknown admission number '{admission_number}'."]
+        if subject_id is not None:
+            if subject_id not in resolver.subject_ids:
+                row_errors["subject_id"] = [f"Unknown subject id {subject_id}."]
+        elif subject_name in resolver.ambiguous_subjects:
+            row_errors["subject"] = [f"Subject name '{subject_name}' is ambiguous; use subject_id."]
+        else:
+            subject_id = resolver.subjects.get(subject_name)
+            if subject_id is None:
+                row_errors["subject"] = [f"Unknown subject '{subject_name}'."]
+        if row_errors:
+            errors.append({"row": number, "errors": row_errors})
+        else:
+            valid.append((student_pk, subject_id, score))
+    return valid, errors
+
+
+def _copy_rows(rows, now):
+    """Stream rows into the grade table with PostgreSQL COPY."""
+    meta = Grade._meta
+    columns = [meta.get_field(name).column for name in ("student", "subject", "score", "created_at", "updated_at")]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    stamp = now.isoformat()
+    for student_pk, subject_pk, score in rows:
+        writer.writerow((student_pk, subject_pk, repr(score), stamp, stamp))
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        quote(meta.db_table), ", ".join(quote(c) for c in columns)
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def _bulk_create_rows(rows, now):
+    Grade.objects.bulk_create(
+        [Grade(student_id=s, subject_id=j, score=score, created_at=now) for s, j, score in rows],
+        batch_size=CHUNK_SIZE,
+    )
+
+
+def _supports_copy():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        return hasattr(cursor.cursor, "copy_expert")
+
+
+def import_grades(rows, partial=False, chunk_size=CHUNK_SIZE, use_copy=None):
+    """
+    Validate and store grade rows.
+
+    ``rows`` is an iterable of ``(row_number, dict)`` as produced by
+    `iter_rows`. When ``partial`` is false, nothing is written if any row
+    fails validation. Returns a report dict with ``created``, ``rejected``
+    and up to ``MAX_REPORTED_ERRORS`` per-row ``errors``.
+    """
+    resolver = _KeyResolver()
+    valid = []
+    errors = []
+    error_count = 0
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        total += len(chunk)
+        chunk_valid, chunk_errors = _validate_chunk(chunk, resolver)
+        valid.extend(chunk_valid)
+        error_count += len(chunk_errors)
+        room = MAX_REPORTED_ERRORS - len(errors)
+        if room > 0:
+            errors.extend(chunk_errors[:room])
+
+    created = 0
+    if valid and (partial or not error_count):
+        if use_copy is None:
+            use_copy = _supports_copy()
+        now = timezone.now()
+        with transaction.atomic():
+            if use_copy:
+                _copy_rows(valid, now)
+            else:
+                _bulk_create_rows(valid, now)
+            # COPY and bulk_create bypass the Grade signals.
+            mark_stale({student_pk for student_pk, _, _ in valid})
+        created = len(valid)
+        logger.info("Imported %s grades (%s rejected) via %s", created, error_count, "COPY" if use_copy else "bulk_create")
+
+    errors.sort(key=lambda e: e["row"])
+    return {
+        "total": total,
+        "created": created,
+        "rejected": error_count,
+        "errors": errors,
+        "errors_truncated": error_count > len(errors),
+    }
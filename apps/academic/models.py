@@ -54,6 +54,7 @@ class Instructor(models.Model):
 
 class Course(models.Model):
     name = models.CharField(max_length=100, default="Unnamed Course")
+    moodle_id = models.PositiveIntegerField(null=True, blank=True, unique=True)
     program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='courses', null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -77,6 +78,9 @@ class Student(models.Model):
     class Meta:
         verbose_name = 'Student'
         verbose_name_plural = 'Students'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='student_created_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.login_id} - {self.admission_number}"
@@ -85,6 +89,7 @@ class Student(models.Model):
 class Subject(models.Model):
     name = models.CharField(max_length=100)
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='subjects', null=True, blank=True)
+    credits = models.PositiveSmallIntegerField(default=1, help_text="Weight of the subject in GPA calculations")
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -113,8 +118,9 @@ class Timetable(models.Model):
 
 
 class Grade(models.Model):
-    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='grades', null=True, blank=True)
-    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='grades', null=True, blank=True)
+    # Indexed by the per-student and per-subject keyset indexes below.
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='grades', null=True, blank=True, db_index=False)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='grades', null=True, blank=True, db_index=False)
     score = models.FloatField(default=0.0)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -122,6 +128,11 @@ class Grade(models.Model):
     class Meta:
         verbose_name = 'Grade'
         verbose_name_plural = 'Grades'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='grade_created_keyset_idx'),
+            models.Index(fields=['student', 'created_at', 'id'], name='grade_student_keyset_idx'),
+            models.Index(fields=['subject', 'created_at', 'id'], name='grade_subject_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.subject} - {self.score}"
@@ -138,4 +149,74 @@ class TeachingAssignment(models.Model):
         verbose_name_plural = 'Teaching Assignments'
 
     def __str__(self):
-        return f"{self.instructor} - {self.course}"
\ No newline at end of file
+        return f"{self.instructor} - {self.course}"
+
+
+class TranscriptSummary(models.Model):
+    """
+    Materialized per-student transcript aggregates, refreshed by
+    apps.academic.transcripts whenever the student's grades change.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='transcript_summary')
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='transcript_summaries', null=True, blank=True)
+    # Admission year: the start year of the academic year of the student's
+    # accepted admissions offer, or the year the student record was created
+    # for students admitted outside the admissions app.
+    cohort_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    gpa = models.FloatField(default=0.0)
+    mean_score = models.FloatField(default=0.0)
+    mean_attendance = models.FloatField(null=True, blank=True)
+    subjects_taken = models.PositiveIntegerField(default=0)
+    subjects_passed = models.PositiveIntegerField(default=0)
+    credits_attempted = models.PositiveIntegerField(default=0)
+    credits_earned = models.PositiveIntegerField(default=0)
+    pass_rate = models.FloatField(default=0.0)
+    program_rank = models.PositiveIntegerField(null=True, blank=True)
+    cohort_rank = models.PositiveIntegerField(null=True, blank=True)
+    percentile = models.FloatField(null=True, blank=True)
+    is_stale = models.BooleanField(default=True)
+    # Bumped by every mark_stale; a refresh clears is_stale only if the row
+    # is still at the version it read before computing.
+    stale_version = models.PositiveIntegerField(default=0)
+    computed_version = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Transcript Summary'
+        verbose_name_plural = 'Transcript Summaries'
+        ordering = ['program', 'program_rank']
+        indexes = [
+            models.Index(fields=['program', 'program_rank'], name='transcript_program_rank_idx'),
+            models.Index(fields=['program', 'cohort_year', 'cohort_rank'], name='transcript_cohort_rank_idx'),
+            models.Index(fields=['is_stale'], name='transcript_stale_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - GPA {self.gpa:.2f}"
+
+
+class CohortSummary(models.Model):
+    """
+    Aggregates over the transcript summaries of one program, either for a
+    single cohort (admission year) or, when cohort_year is null, all cohorts.
+    """
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='cohort_summaries')
+    cohort_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    student_count = models.PositiveIntegerField(default=0)
+    mean_gpa = models.FloatField(default=0.0)
+    mean_score = models.FloatField(default=0.0)
+    score_p25 = models.FloatField(default=0.0)
+    score_median = models.FloatField(default=0.0)
+    score_p75 = models.FloatField(default=0.0)
+    score_p90 = models.FloatField(default=0.0)
+    pass_rate = models.FloatField(default=0.0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Cohort Summary'
+        verbose_name_plural = 'Cohort Summaries'
+        unique_together = ('program', 'cohort_year')
+        ordering = ['program', '-cohort_year']
+
+    def __str__(self):
+        return f"{self.program} - {self.cohort_year or 'all cohorts'}"
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Program, Instructor, Course, Student, Subject, Timetable, Grade, TeachingAssignment, AcademicYear
+from .models import (
+    Program, Instructor, Course, Student, Subject, Timetable, Grade, TeachingAssignment, AcademicYear,
+    TranscriptSummary, CohortSummary
+)
 from apps.hr.models import Department
 from apps.core.models import College
 from apps.users.models import User
@@ -57,7 +60,7 @@ class SubjectSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Subject
-        fields = ['id', 'name', 'course', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'course', 'credits', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 # Serializer for Timetable
@@ -87,4 +90,45 @@ class TeachingAssignmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = TeachingAssignment
         fields = ['id', 'instructor', 'course', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+# Serializer for the bulk grade upload action
+class GradeBulkUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    partial = serializers.BooleanField(default=False)
+
+
+# Serializers for materialized transcript aggregates
+class TranscriptSummarySerializer(serializers.ModelSerializer):
+    admission_number = serializers.CharField(source='student.admission_number', read_only=True)
+
+    class Meta:
+        model = TranscriptSummary
+        fields = [
+            'student', 'admission_number', 'program', 'cohort_year', 'gpa', 'mean_score', 'mean_attendance',
+            'subjects_taken', 'subjects_passed', 'credits_attempted', 'credits_earned', 'pass_rate',
+            'program_rank', 'cohort_rank', 'percentile', 'is_stale', 'computed_at',
+        ]
+        read_only_fields = fields
+
+class TranscriptLineSerializer(serializers.Serializer):
+    grade_id = serializers.IntegerField()
+    subject_id = serializers.IntegerField(allow_null=True)
+    subject = serializers.CharField(allow_null=True)
+    course = serializers.CharField(allow_null=True)
+    credits = serializers.IntegerField()
+    score = serializers.FloatField()
+    letter = serializers.CharField()
+    points = serializers.FloatField()
+    passed = serializers.BooleanField()
+    recorded_at = serializers.DateTimeField()
+
+class CohortSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CohortSummary
+        fields = [
+            'id', 'program', 'cohort_year', 'student_count', 'mean_gpa', 'mean_score', 'score_p25',
+            'score_median', 'score_p75', 'score_p90', 'pass_rate', 'computed_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Grade, Student
+from .transcripts import mark_stale
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def grade_changed(sender, instance, **kwargs):
+    mark_stale([instance.student_id])
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, **kwargs):
+    # A program change moves the student between rankings.
+    if not created:
+        mark_stale([instance.pk])
+
+
+@receiver(post_save, sender='reporting.StudentPerformance')
+@receiver(post_delete, sender='reporting.StudentPerformance')
+def performance_changed(sender, instance, **kwargs):
+    mark_stale([instance.student_id])
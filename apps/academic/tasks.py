@@ -0,0 +1,11 @@
+from celery import shared_task
+from .transcripts import refresh_stale, refresh_program
+
+@shared_task
+def refresh_stale_transcripts():
+    """Recompute transcript summaries for every program with stale rows."""
+    return refresh_stale()
+
+@shared_task
+def refresh_program_transcripts(program_id):
+    return refresh_program(program_id)
@@ -7,8 +7,12 @@ from django.utils import timezone
 from apps.users.models import User
 from apps.hr.models import Department
 from apps.core.models import College
-from apps.academic.models import AcademicYear, Program, Instructor, Course, Student, Subject, Timetable, Grade, TeachingAssignment
+from apps.academic.models import AcademicYear, Program, Instructor, Course, Student, Subject, Timetable, Grade, TeachingAssignment, TranscriptSummary, CohortSummary
+from apps.academic import transcripts
 from datetime import date # Import the date class
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from unittest import mock
 
 # Factory Definitions for Academic Models
 class UserFactory(factory.django.DjangoModelFactory):
@@ -183,4 +187,191 @@ class AcademicAPITests(TestCase):
         data = {'instructor': self.instructor.id, 'course': self.course.id}
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(TeachingAssignment.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(TeachingAssignment.objects.count(), 1)
+
+
+class GradeBulkUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = UserFactory(is_staff=True, is_superuser=True)
+        self.client.force_authenticate(user=self.staff_user)
+        self.course = CourseFactory()
+        self.math = SubjectFactory(name='Mathematics', course=self.course)
+        self.physics = SubjectFactory(name='Physics', course=self.course)
+        self.students = [StudentFactory(program=self.course.program) for _ in range(3)]
+        self.url = reverse('grade-bulk-upload')
+
+    def _upload(self, name, content, **extra):
+        data = {'file': SimpleUploadedFile(name, content.encode())}
+        data.update(extra)
+        return self.client.post(self.url, data, format='multipart')
+
+    def test_csv_upload_creates_grades(self):
+        lines = ['admission_number,subject,score']
+        for student in self.students:
+            lines.append(f'{student.admission_number},Mathematics,71.5')
+            lines.append(f'{student.admission_number},Physics,64')
+        response = self._upload('grades.csv', '\n'.join(lines))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['created'], 6)
+        self.assertEqual(Grade.objects.count(), 6)
+        self.assertEqual(Grade.objects.filter(subject=self.physics, score=64).count(), 3)
+
+    def test_jsonl_upload_accepts_subject_id(self):
+        student = self.students[0]
+        content = '\n'.join([
+            f'{{"admission_number": "{student.admission_number}", "subject_id": {self.math.id}, "score": 88}}',
+            f'{{"admission_number": "{student.admission_number}", "subject": "Physics", "score": 91}}',
+        ])
+        response = self._upload('grades.jsonl', content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(Grade.objects.filter(student=student).count(), 2)
+
+    def test_invalid_rows_reject_whole_upload(self):
+        content = '\n'.join([
+            'admission_number,subject,score',
+            f'{self.students[0].admission_number},Mathematics,70',
+            'ADM-MISSING,Mathematics,70',
+            f'{self.students[1].admission_number},Chemistry,70',
+            f'{self.students[2].admission_number},Physics,abc',
+        ])
+        response = self._upload('grades.csv', content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['rejected'], 3)
+        self.assertEqual([e['row'] for e in response.data['errors']], [2, 3, 4])
+        self.assertIn('admission_number', response.data['errors'][0]['errors'])
+        self.assertIn('subject', response.data['errors'][1]['errors'])
+        self.assertIn('score', response.data['errors'][2]['errors'])
+        self.assertEqual(Grade.objects.count(), 0)
+
+    def test_partial_upload_keeps_valid_rows(self):
+        content = '\n'.join([
+            'admission_number,subject,score',
+            f'{self.students[0].admission_number},Mathematics,70',
+            'ADM-MISSING,Mathematics,70',
+        ])
+        response = self._upload('grades.csv', content, partial='true')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['rejected'], 1)
+        self.assertEqual(Grade.objects.count(), 1)
+
+    def test_ambiguous_subject_name_is_reported(self):
+        SubjectFactory(name='Mathematics')
+        content = f'admission_number,subject,score\n{self.students[0].admission_number},Mathematics,70'
+        response = self._upload('grades.csv', content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ambiguous', response.data['errors'][0]['errors']['subject'][0])
+
+
+class TranscriptTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserFactory(is_staff=True))
+        self.program = ProgramFactory()
+        course = CourseFactory(program=self.program)
+        self.core = SubjectFactory(course=course, credits=3)
+        self.elective = SubjectFactory(course=course, credits=1)
+        self.top = StudentFactory(program=self.program)
+        self.middle = StudentFactory(program=self.program)
+        self.bottom = StudentFactory(program=self.program)
+        for student, core, elective in [(self.top, 80, 75), (self.middle, 65, 90), (self.bottom, 30, 45)]:
+            GradeFactory(student=student, subject=self.core, score=core)
+            GradeFactory(student=student, subject=self.elective, score=elective)
+
+    def test_grade_changes_mark_summaries_stale(self):
+        self.assertEqual(TranscriptSummary.objects.filter(is_stale=True).count(), 3)
+        transcripts.refresh_program(self.program.id)
+        self.assertFalse(TranscriptSummary.objects.filter(is_stale=True).exists())
+        GradeFactory(student=self.bottom, subject=self.elective, score=50)
+        self.assertTrue(TranscriptSummary.objects.get(student=self.bottom).is_stale)
+
+    def test_weighted_gpa_and_ranking(self):
+        transcripts.refresh_program(self.program.id)
+        top = TranscriptSummary.objects.get(student=self.top)
+        middle = TranscriptSummary.objects.get(student=self.middle)
+        bottom = TranscriptSummary.objects.get(student=self.bottom)
+        self.assertAlmostEqual(top.gpa, 4.0)
+        self.assertAlmostEqual(middle.gpa, (3 * 3.0 + 1 * 4.0) / 4)
+        self.assertAlmostEqual(bottom.gpa, (3 * 0.0 + 1 * 1.0) / 4)
+        self.assertEqual([top.program_rank, middle.program_rank, bottom.program_rank], [1, 2, 3])
+        self.assertEqual(top.percentile, 100.0)
+        self.assertEqual(bottom.credits_earned, 1)
+        self.assertEqual(bottom.pass_rate, 50.0)
+
+    def test_cohort_summary(self):
+        transcripts.refresh_program(self.program.id)
+        summary = CohortSummary.objects.get(program=self.program, cohort_year__isnull=True)
+        self.assertEqual(summary.student_count, 3)
+        self.assertAlmostEqual(summary.pass_rate, 100.0 * 5 / 6, places=2)
+
+    def test_ranking_endpoint_refreshes_and_reads_index(self):
+        url = reverse('transcriptsummary-list') + f'?program={self.program.id}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['student'] for row in response.data['results']], [self.top.id, self.middle.id, self.bottom.id])
+        for grade in Grade.objects.filter(student=self.bottom):
+            grade.score = 100
+            grade.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['student'], self.bottom.id)
+
+    def test_ranking_pages_keep_unranked_students_last(self):
+        ungraded = StudentFactory(program=self.program)
+        transcripts.refresh_program(self.program.id)
+        self.assertIsNone(TranscriptSummary.objects.get(student=ungraded).program_rank)
+        url = reverse('transcriptsummary-list') + f'?program={self.program.id}&page_size=2'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertEqual(
+            [row['student'] for page in pages for row in page['results']],
+            [self.top.id, self.middle.id, self.bottom.id, ungraded.id],
+        )
+        back = self.client.get(pages[1]['previous'])
+        self.assertEqual([row['student'] for row in back.data['results']], [self.top.id, self.middle.id])
+
+    def test_transcript_detail_includes_subject_lines(self):
+        url = reverse('transcriptsummary-detail', kwargs={'student': self.middle.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['program_rank'], 2)
+        self.assertEqual(len(response.data['subjects']), 2)
+        self.assertEqual({line['letter'] for line in response.data['subjects']}, {'A', 'B'})
+
+    def test_change_during_refresh_keeps_summary_stale(self):
+        compute = transcripts._student_stats
+
+        def grade_changes_midway(students_qs):
+            stats = compute(students_qs)
+            GradeFactory(student=self.bottom, subject=self.elective, score=99)
+            return stats
+
+        with mock.patch.object(transcripts, '_student_stats', side_effect=grade_changes_midway):
+            transcripts.refresh_program(self.program.id)
+        self.assertEqual(list(TranscriptSummary.objects.filter(is_stale=True).values_list('student', flat=True)), [self.bottom.id])
+        transcripts.refresh_program(self.program.id)
+        self.assertFalse(TranscriptSummary.objects.filter(is_stale=True).exists())
+
+    def test_unfiltered_lists_queue_the_refresh(self):
+        cache.delete(transcripts.REFRESH_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(reverse('transcriptsummary-list'))
+            self.client.get(reverse('cohortsummary-list'))
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(all(row['is_stale'] for row in response.data['results']))
+        self.assertTrue(TranscriptSummary.objects.filter(is_stale=True).exists())
+
+    def test_cohort_is_the_admission_year(self):
+        from apps.admissions.models import AcademicYear as AdmissionsYear, Application, Intake
+
+        year = AdmissionsYear.objects.create(year='2021/2022', start_date=date(2021, 9, 1), end_date=date(2022, 7, 31))
+        intake = Intake.objects.create(name='September', academic_year=year, opens_at=date(2021, 1, 1), closes_at=date(2021, 6, 1))
+        Application.objects.create(applicant=self.top.user, intake=intake, program=self.program, status='offer_accepted')
+        transcripts.refresh_program(self.program.id)
+        years = dict(TranscriptSummary.objects.values_list('student', 'cohort_year'))
+        self.assertEqual(years[self.top.id], 2021)
+        self.assertEqual(years[self.middle.id], self.middle.created_at.year)
@@ -0,0 +1,299 @@
+"""
+Transcript and GPA computation.
+
+Per-student aggregates (credit-weighted GPA, mean score, pass rate,
+attendance) are computed with grouped SQL for a whole program at a time,
+ranked in one pass and stored in `TranscriptSummary`; per-program and
+per-cohort distributions go to `CohortSummary`. A student's cohort is their
+admission year (see `_cohort_years`). Grade changes only flag summaries as
+stale (see `mark_stale`) — the recomputation happens in `refresh_stale`
+(Celery) or lazily before a read via `ensure_fresh`. A refresh clears the
+flag only on rows nobody re-flagged while it was computing.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CohortSummary, Grade, Student, TranscriptSummary
+
+logger = logging.getLogger(__name__)
+
+# (minimum score, letter, grade points), highest band first
+GRADE_SCALE = getattr(settings, "GRADE_POINT_SCALE", [
+    (70, "A", 4.0),
+    (60, "B", 3.0),
+    (50, "C", 2.0),
+    (40, "D", 1.0),
+    (0, "E", 0.0),
+])
+PASS_MARK = getattr(settings, "GRADE_PASS_MARK", 40)
+REFRESH_KEY = "transcripts:refresh-scheduled"
+REFRESH_DELAY = 60
+
+SUMMARY_FIELDS = [
+    "program", "cohort_year", "gpa", "mean_score", "mean_attendance", "subjects_taken",
+    "subjects_passed", "credits_attempted", "credits_earned", "pass_rate", "program_rank",
+    "cohort_rank", "percentile", "computed_version", "computed_at",
+]
+
+
+def grade_points_expression(field="score"):
+    """SQL CASE mapping a score column to grade points on GRADE_SCALE."""
+    return Case(
+        *[When(**{f"{field}__gte": minimum}, then=Value(points)) for minimum, _, points in GRADE_SCALE],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def letter_for(score):
+    for minimum, letter, _ in GRADE_SCALE:
+        if score >= minimum:
+            return letter
+    return GRADE_SCALE[-1][1]
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def mark_stale(student_ids):
+    """Flag the given students' summaries for recomputation (two queries)."""
+    student_ids = {pk for pk in student_ids if pk is not None}
+    if not student_ids:
+        return
+    TranscriptSummary.objects.bulk_create(
+        [TranscriptSummary(student_id=pk, is_stale=True, stale_version=1) for pk in student_ids],
+        ignore_conflicts=True,
+    )
+    # Bump the version of already-stale rows too, so a refresh that read the
+    # grades before this change does not clear the flag.
+    TranscriptSummary.objects.filter(student_id__in=student_ids).update(
+        is_stale=True, stale_version=F("stale_version") + 1
+    )
+
+
+def _student_stats(students_qs):
+    credits = Coalesce(F("subject__credits"), Value(1))
+    passed = Q(score__gte=PASS_MARK)
+    rows = (
+        Grade.objects.filter(student__in=students_qs)
+        .values("student_id")
+        .annotate(
+            taken=Count("id"),
+            passed=Count("id", filter=passed),
+            mean_score=Avg("score"),
+            credits_attempted=Sum(credits),
+            credits_earned=Coalesce(Sum(credits, filter=passed), Value(0)),
+            weighted_points=Sum(credits * grade_points_expression(), output_field=FloatField()),
+        )
+    )
+    return {row["student_id"]: row for row in rows}
+
+
+def _student_attendance(students_qs):
+    from apps.reporting.models import StudentPerformance
+
+    rows = (
+        StudentPerformance.objects.filter(student__in=students_qs)
+        .values("student_id")
+        .annotate(mean_attendance=Avg("attendance_percentage"))
+        .values_list("student_id", "mean_attendance")
+    )
+    return {pk: float(value) for pk, value in rows if value is not None}
+
+
+def _cohort_years(students):
+    """
+    ``{student_id: admission year}`` for ``[(student_id, user_id, created_at)]``:
+    the start year of the academic year of the student's accepted admissions
+    offer, else the year the student record was created.
+    """
+    from apps.admissions.models import Application
+
+    admitted = dict(
+        Application.objects.filter(applicant_id__in=[user_id for _, user_id, _ in students], status="offer_accepted")
+        .order_by("intake__academic_year__start_date")
+        .values_list("applicant_id", "intake__academic_year__start_date")
+    )
+    years = {}
+    for student_id, user_id, created_at in students:
+        start = admitted.get(user_id)
+        years[student_id] = start.year if start else (created_at.year if created_at else None)
+    return years
+
+
+def _rank(summaries, rank_field):
+    """Competition-rank ("1224") summaries by GPA, then mean score."""
+    ordered = sorted(summaries, key=lambda s: (-s.gpa, -s.mean_score))
+    previous = None
+    for position, summary in enumerate(ordered, start=1):
+        key = (summary.gpa, summary.mean_score)
+        rank = position if key != previous else getattr(ordered[position - 2], rank_field)
+        setattr(summary, rank_field, rank)
+        previous = key
+    return ordered
+
+
+def _cohort_summary(program_id, cohort_year, summaries, now):
+    scores = sorted(s.mean_score for s in summaries)
+    taken = sum(s.subjects_taken for s in summaries)
+    passed = sum(s.subjects_passed for s in summaries)
+    return CohortSummary(
+        program_id=program_id,
+        cohort_year=cohort_year,
+        student_count=len(summaries),
+        mean_gpa=round(sum(s.gpa for s in summaries) / len(summaries), 4),
+        mean_score=round(sum(scores) / len(scores), 4),
+        score_p25=round(percentile(scores, 25), 4),
+        score_median=round(percentile(scores, 50), 4),
+        score_p75=round(percentile(scores, 75), 4),
+        score_p90=round(percentile(scores, 90), 4),
+        pass_rate=round(100.0 * passed / taken, 2) if taken else 0.0,
+        computed_at=now,
+    )
+
+
+def refresh_program(program_id):
+    """
+    Recompute every transcript summary in a program (``None`` for students
+    without one) plus its cohort summaries. Returns the number of students.
+    """
+    students_qs = Student.objects.filter(program_id=program_id) if program_id else Student.objects.filter(program__isnull=True)
+    students = list(students_qs.values_list("id", "user_id", "created_at"))
+    # Read the summaries (and their stale versions) before the grades.
+    existing = {s.student_id: s for s in TranscriptSummary.objects.filter(student_id__in=[pk for pk, _, _ in students])}
+    stats = _student_stats(students_qs)
+    attendance = _student_attendance(students_qs)
+    cohort_years = _cohort_years(students)
+    now = timezone.now()
+
+    summaries = []
+    for student_id, _, _ in students:
+        row = stats.get(student_id)
+        summary = existing.get(student_id) or TranscriptSummary(student_id=student_id, is_stale=False)
+        summary.program_id = program_id
+        summary.cohort_year = cohort_years[student_id]
+        summary.mean_attendance = attendance.get(student_id)
+        summary.program_rank = summary.cohort_rank = summary.percentile = None
+        summary.computed_version = summary.stale_version
+        summary.computed_at = now
+        if row:
+            attempted = row["credits_attempted"] or 0
+            summary.subjects_taken = row["taken"]
+            summary.subjects_passed = row["passed"]
+            summary.mean_score = round(row["mean_score"] or 0.0, 4)
+            summary.credits_attempted = attempted
+            summary.credits_earned = row["credits_earned"]
+            summary.gpa = round(row["weighted_points"] / attempted, 4) if attempted else 0.0
+            summary.pass_rate = round(100.0 * row["passed"] / row["taken"], 2)
+        else:
+            summary.subjects_taken = summary.subjects_passed = 0
+            summary.credits_attempted = summary.credits_earned = 0
+            summary.mean_score = summary.gpa = summary.pass_rate = 0.0
+        summaries.append(summary)
+
+    cohorts = []
+    if program_id:
+        graded = [s for s in summaries if s.subjects_taken]
+        ranked = _rank(graded, "program_rank")
+        n = len(ranked)
+        for s in ranked:
+            s.percentile = round(100.0 * (n - s.program_rank) / (n - 1), 2) if n > 1 else 100.0
+        by_cohort = defaultdict(list)
+        for s in graded:
+            by_cohort[s.cohort_year].append(s)
+        for cohort_year, members in by_cohort.items():
+            _rank(members, "cohort_rank")
+            cohorts.append(_cohort_summary(program_id, cohort_year, members, now))
+        if graded:
+            cohorts.append(_cohort_summary(program_id, None, graded, now))
+
+    with transaction.atomic():
+        # is_stale and stale_version are left to mark_stale; a row created
+        # concurrently by mark_stale wins and stays stale.
+        TranscriptSummary.objects.bulk_update([s for s in summaries if s.pk], SUMMARY_FIELDS, batch_size=1000)
+        TranscriptSummary.objects.bulk_create([s for s in summaries if not s.pk], batch_size=1000, ignore_conflicts=True)
+        TranscriptSummary.objects.filter(
+            student_id__in=[s.student_id for s in summaries], is_stale=True, stale_version=F("computed_version")
+        ).update(is_stale=False)
+        if program_id:
+            CohortSummary.objects.filter(program_id=program_id).delete()
+            CohortSummary.objects.bulk_create(cohorts)
+    logger.debug("Refreshed transcripts for program %s (%s students)", program_id, len(summaries))
+    return len(summaries)
+
+
+def _stale_programs():
+    stale = TranscriptSummary.objects.filter(is_stale=True)
+    programs = set(stale.values_list("program_id", flat=True).distinct())
+    programs.update(stale.values_list("student__program_id", flat=True).distinct())
+    return programs
+
+
+def refresh_stale():
+    """Refresh every program that has at least one stale summary."""
+    programs = _stale_programs()
+    refreshed = sum(refresh_program(program_id) for program_id in programs)
+    return {"programs": len(programs), "students": refreshed}
+
+
+def schedule_refresh():
+    """
+    Queue `refresh_stale` in the background when summaries are stale, at most
+    once per delay window; readers meanwhile get the stale rows, flagged.
+    """
+    if TranscriptSummary.objects.filter(is_stale=True).exists() and cache.add(REFRESH_KEY, 1, REFRESH_DELAY):
+        from .tasks import refresh_stale_transcripts
+        transaction.on_commit(lambda: refresh_stale_transcripts.apply_async(countdown=REFRESH_DELAY))
+
+
+def ensure_fresh(program_id=None, student_id=None):
+    """Refresh the affected program before a read if any of its summaries are stale."""
+    stale = TranscriptSummary.objects.filter(is_stale=True)
+    if student_id is not None:
+        if not stale.filter(student_id=student_id).exists():
+            return False
+        program_id = Student.objects.filter(pk=student_id).values_list("program_id", flat=True).first()
+    elif not stale.filter(Q(program_id=program_id) | Q(student__program_id=program_id)).exists():
+        return False
+    refresh_program(program_id)
+    return True
+
+
+def transcript_lines(student_id):
+    """Per-subject transcript lines for one student, with grade points and letters."""
+    rows = (
+        Grade.objects.filter(student_id=student_id)
+        .annotate(points=grade_points_expression())
+        .values("id", "subject_id", "subject__name", "subject__credits", "subject__course__name", "score", "points", "created_at")
+        .order_by("subject__course__name", "subject__name", "created_at")
+    )
+    return [
+        {
+            "grade_id": row["id"],
+            "subject_id": row["subject_id"],
+            "subject": row["subject__name"],
+            "course": row["subject__course__name"],
+            "credits": row["subject__credits"] or 1,
+            "score": row["score"],
+            "letter": letter_for(row["score"]),
+            "points": row["points"],
+            "passed": row["score"] >= PASS_MARK,
+            "recorded_at": row["created_at"],
+        }
+        for row in rows
+    ]
@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ProgramViewSet, InstructorViewSet, CourseViewSet, StudentViewSet,
     SubjectViewSet, TimetableViewSet, GradeViewSet, TeachingAssignmentViewSet,
-    AcademicYearViewSet # Import the AcademicYearViewSet
+    AcademicYearViewSet, # Import the AcademicYearViewSet
+    TranscriptViewSet, CohortSummaryViewSet
 )
 
 router = DefaultRouter()
@@ -16,6 +17,8 @@ router.register(r'subjects', SubjectViewSet)
 router.register(r'timetables', TimetableViewSet)
 router.register(r'grades', GradeViewSet)
 router.register(r'teaching-assignments', TeachingAssignmentViewSet)
+router.register(r'transcripts', TranscriptViewSet)
+router.register(r'cohort-summaries', CohortSummaryViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,12 +1,24 @@
+import csv
 import logging
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Program, Instructor, Course, Student, Subject, Timetable, Grade, TeachingAssignment, AcademicYear
+from .models import (
+    Program, Instructor, Course, Student, Subject, Timetable, Grade, TeachingAssignment, AcademicYear,
+    TranscriptSummary, CohortSummary
+)
 from apps.admissions.models import Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision
 from .serializers import (
     ProgramSerializer, InstructorSerializer, CourseSerializer, StudentSerializer,
-    SubjectSerializer, TimetableSerializer, GradeSerializer, TeachingAssignmentSerializer, AcademicYearSerializer
+    SubjectSerializer, TimetableSerializer, GradeSerializer, TeachingAssignmentSerializer, AcademicYearSerializer,
+    GradeBulkUploadSerializer, TranscriptSummarySerializer, TranscriptLineSerializer, CohortSummarySerializer
 )
+from . import transcripts
+from .grade_import import GradeImportError, detect_format, iter_rows, import_grades
+from apps.core.exports import ExportMixin
+from apps.core.pagination import LookupPagination
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +26,7 @@ logger = logging.getLogger(__name__)
 class AcademicYearViewSet(viewsets.ModelViewSet):
     queryset = AcademicYear.objects.all()
     serializer_class = AcademicYearSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["is_current"]
@@ -23,6 +36,7 @@ class AcademicYearViewSet(viewsets.ModelViewSet):
 class ProgramViewSet(viewsets.ModelViewSet):
     queryset = Program.objects.select_related("department", "college").all()
     serializer_class = ProgramSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["department", "college"]
@@ -41,6 +55,7 @@ class InstructorViewSet(viewsets.ModelViewSet):
 class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.select_related("program").all()
     serializer_class = CourseSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["program"]
@@ -59,6 +74,7 @@ class StudentViewSet(viewsets.ModelViewSet):
 class SubjectViewSet(viewsets.ModelViewSet):
     queryset = Subject.objects.select_related("course").all()
     serializer_class = SubjectSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["course"]
@@ -74,7 +90,7 @@ class TimetableViewSet(viewsets.ModelViewSet):
     search_fields = ["course__name"]
     ordering = ["-created_at"]
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.select_related("student", "subject").all()
     serializer_class = GradeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -82,6 +98,27 @@ class GradeViewSet(viewsets.ModelViewSet):
     filterset_fields = ["student", "subject"]
     search_fields = ["student__admission_number", "subject__name"]
     ordering = ["-created_at"]
+    export_fields = ["id", "student_id", "student__admission_number", "subject_id", "subject__name", "score", "created_at", "updated_at"]
+
+    @action(detail=False, methods=["post"], url_path="bulk-upload", parser_classes=[MultiPartParser, FormParser])
+    def bulk_upload(self, request):
+        """
+        Create grades from a CSV or JSON-lines file.
+        Rows are validated in chunks and written in one transaction; unless
+        `partial` is set, any invalid row rejects the whole upload.
+        """
+        ser = GradeBulkUploadSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        upload = ser.validated_data["file"]
+        try:
+            fmt = detect_format(upload.name, ser.validated_data.get("format"))
+            report = import_grades(iter_rows(upload.file, fmt), partial=ser.validated_data["partial"])
+        except (GradeImportError, UnicodeDecodeError, csv.Error) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        logger.debug(f"Grade bulk upload by {request.user}: {report['created']} created, {report['rejected']} rejected")
+        if report["created"]:
+            return Response(report, status=status.HTTP_201_CREATED)
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
 
 class TeachingAssignmentViewSet(viewsets.ModelViewSet):
     queryset = TeachingAssignment.objects.select_related("instructor", "course").all()
@@ -90,4 +127,56 @@ class TeachingAssignmentViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["instructor", "course"]
     search_fields = ["instructor__user__login_id", "course__name"]
-    ordering = ["-created_at"]
\ No newline at end of file
+    ordering = ["-created_at"]
+
+class TranscriptViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Materialized transcripts. Listing by `program` returns the class ranking
+    straight from the (program, program_rank) index; retrieving by student id
+    adds the per-subject transcript lines.
+    Stale summaries of the requested program or student are recomputed
+    before they are served; unfiltered lists serve them flagged ``is_stale``
+    and queue a background refresh.
+    """
+    queryset = TranscriptSummary.objects.select_related("student").all()
+    serializer_class = TranscriptSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["program", "cohort_year"]
+    ordering_fields = ["program_rank", "cohort_rank", "gpa", "mean_score"]
+    ordering = ["program", "program_rank"]
+    lookup_field = "student"
+
+    def list(self, request, *args, **kwargs):
+        program = request.query_params.get("program")
+        if program and program.isdigit():
+            transcripts.ensure_fresh(program_id=int(program))
+        elif not program:
+            transcripts.schedule_refresh()
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        student = kwargs.get(self.lookup_field)
+        if str(student).isdigit():
+            transcripts.ensure_fresh(student_id=int(student))
+        summary = self.get_object()
+        data = self.get_serializer(summary).data
+        data["subjects"] = TranscriptLineSerializer(transcripts.transcript_lines(summary.student_id), many=True).data
+        return Response(data)
+
+class CohortSummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = CohortSummary.objects.all()
+    serializer_class = CohortSummarySerializer
+    pagination_class = LookupPagination
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["program", "cohort_year"]
+    ordering = ["program", "-cohort_year"]
+
+    def list(self, request, *args, **kwargs):
+        program = request.query_params.get("program")
+        if program and program.isdigit():
+            transcripts.ensure_fresh(program_id=int(program))
+        else:
+            transcripts.schedule_refresh()
+        return super().list(request, *args, **kwargs)
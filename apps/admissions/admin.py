@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import AcademicYear, Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision
+from .funnel import bulk_set_status
+from .models import (
+    AcademicYear, Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision,
+    FunnelCount, FunnelSnapshot, DocumentUpload,
+)
 
 @admin.register(AcademicYear)
 class AcademicYearAdmin(admin.ModelAdmin):
@@ -30,7 +34,7 @@ class ApplicationAdmin(admin.ModelAdmin):
 
     @admin.action(description="Mark selected applications as Under Review")
     def mark_under_review(self, request, queryset):
-        updated = queryset.update(status="under_review")
+        updated = bulk_set_status(queryset, "under_review")
         self.message_user(request, f"{updated} application(s) marked as Under Review.")
 
 
@@ -43,11 +47,33 @@ class ApplicationReviewAdmin(admin.ModelAdmin):
 
 @admin.register(Offer)
 class OfferAdmin(admin.ModelAdmin):
-    list_display = ("application", "amount_cents", "expires_at", "issued_at", "accepted_at", "declined_at")
-    list_filter = ("accepted_at", "declined_at")
+    list_display = ("application", "status", "amount_cents", "expires_at", "issued_at", "accepted_at", "declined_at")
+    list_filter = ("status", "accepted_at", "declined_at")
+    readonly_fields = ("status",)
 
 
 @admin.register(AdmissionDecision)
 class AdmissionDecisionAdmin(admin.ModelAdmin):
     list_display = ("application", "decision", "decided_by", "decided_at")
     list_filter = ("decision",)
+
+
+@admin.register(FunnelCount)
+class FunnelCountAdmin(admin.ModelAdmin):
+    list_display = ("intake", "program", "status", "count", "updated_at")
+    list_filter = ("status", "intake__academic_year")
+    readonly_fields = ("intake", "program", "status", "count", "updated_at")
+
+
+@admin.register(FunnelSnapshot)
+class FunnelSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("day", "intake", "program", "status", "count")
+    list_filter = ("status", "day")
+    readonly_fields = ("day", "intake", "program", "status", "count", "taken_at")
+
+
+@admin.register(DocumentUpload)
+class DocumentUploadAdmin(admin.ModelAdmin):
+    list_display = ("upload_id", "application", "doc_type", "filename", "received", "size", "status", "updated_at")
+    list_filter = ("status", "doc_type")
+    readonly_fields = ("upload_id", "received", "sha256", "status", "error", "document", "created_by")
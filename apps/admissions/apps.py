@@ -5,4 +5,5 @@ class AdmissionsConfig(AppConfig):
     name = "apps.admissions"
     verbose_name = "Admissions"
 
-    
\ No newline at end of file
+    def ready(self):
+        from . import signals  # noqa: F401
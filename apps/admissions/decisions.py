@@ -0,0 +1,134 @@
+"""
+Admission decision engine.
+
+`decide_intake` decides every open application (submitted or under review,
+with no `AdmissionDecision` or `Offer` yet) of one intake and program in a
+single pass. Review scores are averaged per application in one grouped
+query that also ranks the applications (highest score first, earlier
+submission breaking ties). Walking the ranking:
+
+* applications with fewer than ``min_reviews`` scored reviews are left
+  undecided (``pending``);
+* applications scoring below ``min_score`` are rejected;
+* the rest fill the seats left under ``capacity`` (applications already
+  accepted or holding an offer take seats), then ``waitlist`` places, and
+  are rejected after that.
+
+Unless ``dry_run`` is set, the decisions (and, with ``make_offers``, the
+offers) are written with ``bulk_create`` and the application statuses with
+`funnel.bulk_set_status`, all in one transaction that locks the candidates.
+Waitlisted applications stay under review.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .funnel import bulk_set_status
+from .models import AdmissionDecision, Application, Offer
+
+BATCH_SIZE = getattr(settings, "ADMISSIONS_DECISION_BATCH_SIZE", 1000)
+OFFER_DAYS = getattr(settings, "ADMISSIONS_OFFER_DAYS", 14)
+OPEN_STATUSES = ("submitted", "under_review")
+ADMITTED_STATUSES = ("accepted", "offer_made", "offer_accepted")
+
+
+def _candidates(intake_id, program_id):
+    return Application.objects.filter(intake_id=intake_id, program_id=program_id, status__in=OPEN_STATUSES).exclude(
+        Exists(AdmissionDecision.objects.filter(application=OuterRef("pk")))
+    ).exclude(
+        Exists(Offer.objects.filter(application=OuterRef("pk")))
+    )
+
+
+def rank(intake_id, program_id):
+    """``(application_id, average_score, scored_reviews)`` rows, best first."""
+    return list(
+        _candidates(intake_id, program_id)
+        .annotate(average=Avg("reviews__score"), scored=Count("reviews__score"))
+        .order_by(F("average").desc(nulls_last=True), F("submitted_at").asc(nulls_last=True), "pk")
+        .values_list("pk", "average", "scored")
+    )
+
+
+def decide_intake(
+    intake, program, capacity, *, min_score=None, waitlist=0, min_reviews=1, decided_by=None,
+    make_offers=False, offer_amount_cents=0, offer_expires_at=None, dry_run=False,
+):
+    """
+    Rank and decide ``intake``/``program``; returns the per-decision counts,
+    and with ``dry_run`` the ranking itself, without writing anything.
+    """
+    with transaction.atomic():
+        if not dry_run:
+            # Lock the candidates first: FOR UPDATE cannot share the grouped ranking query.
+            list(_candidates(intake.pk, program.pk).select_for_update().order_by("pk").values_list("pk", flat=True))
+        admitted = Application.objects.filter(
+            intake_id=intake.pk, program_id=program.pk, status__in=ADMITTED_STATUSES
+        ).count()
+        seats = max(capacity - admitted, 0)
+        places = waitlist
+
+        ranking = []
+        decided = {"accept": [], "waitlist": [], "reject": []}
+        for position, (pk, average, scored) in enumerate(rank(intake.pk, program.pk), start=1):
+            if not scored or scored < min_reviews:
+                decision = None
+            elif min_score is not None and average < min_score:
+                decision = "reject"
+            elif seats:
+                decision, seats = "accept", seats - 1
+            elif places:
+                decision, places = "waitlist", places - 1
+            else:
+                decision = "reject"
+            if decision:
+                decided[decision].append((pk, position, average))
+            ranking.append({
+                "application": pk, "rank": position, "score": average, "reviews": scored,
+                "decision": decision or "pending",
+            })
+
+        counts = Counter(row["decision"] for row in ranking)
+        result = {
+            "intake": intake.pk, "program": program.pk, "capacity": capacity, "admitted_before": admitted,
+            "dry_run": dry_run, "counts": {name: counts[name] for name in ("accept", "waitlist", "reject", "pending")},
+        }
+        if dry_run:
+            result["ranking"] = ranking
+            return result
+
+        now = timezone.now()
+        AdmissionDecision.objects.bulk_create(
+            [
+                AdmissionDecision(
+                    application_id=pk, decided_by=decided_by, decision=decision,
+                    remarks=f"Rank {position}, average score {average:.2f}",
+                )
+                for decision, rows in decided.items()
+                for pk, position, average in rows
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        accepted = [pk for pk, _, _ in decided["accept"]]
+        if make_offers and accepted:
+            expires_at = offer_expires_at or timezone.localdate() + timedelta(days=OFFER_DAYS)
+            Offer.objects.bulk_create(
+                [
+                    Offer(application_id=pk, offered_by=decided_by, amount_cents=offer_amount_cents, expires_at=expires_at)
+                    for pk in accepted
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        for status, pks in (
+            ("offer_made" if make_offers else "accepted", accepted),
+            ("rejected", [pk for pk, _, _ in decided["reject"]]),
+            ("under_review", [pk for pk, _, _ in decided["waitlist"]]),
+        ):
+            if pks:
+                bulk_set_status(Application.objects.filter(pk__in=pks), status, decision_date=now)
+    return result
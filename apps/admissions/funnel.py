@@ -0,0 +1,230 @@
+"""
+Admissions funnel counters.
+
+`FunnelCount` holds the number of applications per intake, program and
+status. `Application.save` (submit, offers, any status edit) and application
+deletes move one application between counters with an ``F()`` update in the
+same transaction, so the funnel endpoint reads a few indexed rows instead of
+counting applications. Bulk status changes go through `bulk_set_status`;
+other writes that bypass `Application.save` (``QuerySet.update``,
+``bulk_create``) must call `adjust_counts` themselves. `rebuild_counts`
+recomputes the table from scratch for reconciliation, with the counter
+rows locked so concurrent transitions are neither lost nor double counted.
+
+`take_snapshot` copies the counters of every intake/program pair that changed
+since the previous snapshot into `FunnelSnapshot` for the day, and
+`funnel_history` replays those rows into a daily series.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, When
+from django.utils import timezone
+
+from .models import Application, FunnelCount, FunnelSnapshot
+
+STATUSES = [status for status, _ in Application.STATUS_CHOICES]
+# Transactions that were still open when the previous snapshot was taken
+# commit counters stamped slightly before it; re-check that window.
+SNAPSHOT_OVERLAP = timedelta(minutes=5)
+
+
+def adjust_counts(deltas):
+    """
+    Apply ``{(intake_id, program_id, status): change}`` in one UPDATE. Counter
+    rows are created for increments only, so decrements that race a cascade
+    delete of the intake or program never resurrect its rows.
+    """
+    deltas = {key: change for key, change in deltas.items() if change}
+    if not deltas:
+        return
+    created = [
+        FunnelCount(intake_id=intake_id, program_id=program_id, status=status)
+        for (intake_id, program_id, status), change in deltas.items() if change > 0
+    ]
+    if created:
+        FunnelCount.objects.bulk_create(created, ignore_conflicts=True)
+    match = Q()
+    for intake_id, program_id, status in deltas:
+        match |= Q(intake_id=intake_id, program_id=program_id, status=status)
+    FunnelCount.objects.filter(match).update(
+        count=Case(
+            *[
+                When(intake_id=intake_id, program_id=program_id, status=status, then=F("count") + change)
+                for (intake_id, program_id, status), change in deltas.items()
+            ],
+            default=F("count"),
+            output_field=IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def apply_application_transition(old, new):
+    """
+    Move one application from ``old`` to ``new``, each an
+    ``(intake_id, program_id, status)`` tuple or None (created / deleted).
+    Must run inside the application's transaction.
+    """
+    deltas = Counter()
+    if old and None not in old:
+        deltas[old] -= 1
+    if new and None not in new:
+        deltas[new] += 1
+    adjust_counts(deltas)
+
+
+def bulk_set_status(applications, status, **fields):
+    """
+    Move ``applications`` to ``status`` (also setting ``fields``) with one
+    UPDATE and adjust the funnel in the same transaction. Applications already
+    in ``status`` are left alone. Returns the number moved.
+    """
+    with transaction.atomic():
+        pks = list(applications.exclude(status=status).select_for_update().order_by().values_list("pk", flat=True))
+        if not pks:
+            return 0
+        moving = Application.objects.filter(pk__in=pks)
+        deltas = Counter()
+        for intake_id, program_id, old_status, count in (
+            moving.values_list("intake_id", "program_id", "status").annotate(count=Count("pk")).order_by()
+        ):
+            deltas[(intake_id, program_id, old_status)] -= count
+            deltas[(intake_id, program_id, status)] += count
+        moving.update(status=status, updated_at=timezone.now(), **fields)
+        adjust_counts(deltas)
+    return len(pks)
+
+
+def rebuild_counts(intake_id=None):
+    """
+    Recompute the counters from the application table (reconciliation).
+    The counter rows are locked before the applications are counted: a
+    transition that already moved a counter is waited for and counted, and
+    one that has not yet reached its counters adds its delta on top of the
+    recomputed value after this commits. Counters are therefore rewritten in
+    place (pairs without applications drop to 0), not deleted and recreated.
+    Returns the number of counters with applications.
+    """
+    applications = Application.objects.all()
+    counters = FunnelCount.objects.all()
+    if intake_id is not None:
+        applications = applications.filter(intake_id=intake_id)
+        counters = counters.filter(intake_id=intake_id)
+    with transaction.atomic():
+        existing = {
+            (intake, program, status): pk
+            for intake, program, status, pk in counters.select_for_update().order_by("pk")
+            .values_list("intake_id", "program_id", "status", "pk")
+        }
+        totals = {
+            (intake, program, status): total
+            for intake, program, status, total in applications.values_list("intake_id", "program_id", "status")
+            .annotate(total=Count("pk")).order_by()
+        }
+        now = timezone.now()
+        FunnelCount.objects.bulk_create(
+            [
+                FunnelCount(intake_id=intake, program_id=program, status=status, count=total, updated_at=now)
+                for (intake, program, status), total in totals.items() if (intake, program, status) not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        FunnelCount.objects.bulk_update(
+            [FunnelCount(pk=pk, count=totals.get(key, 0), updated_at=now) for key, pk in existing.items()],
+            ["count", "updated_at"], batch_size=1000,
+        )
+    return len(totals)
+
+
+def _grouped(rows, key_fields):
+    """Fold ``status``/``count`` rows into one dict per ``key_fields`` value."""
+    groups = {}
+    for row in rows:
+        key = tuple(row[field] for field in key_fields)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {field: row[field] for field in key_fields}
+            group["counts"] = dict.fromkeys(STATUSES, 0)
+        group["counts"][row["status"]] += row["count"]
+    for group in groups.values():
+        group["total"] = sum(group["counts"].values())
+    return list(groups.values())
+
+
+def funnel(intake_id=None, program_id=None, academic_year=None):
+    """Live counts per intake and program, plus totals per status."""
+    rows = FunnelCount.objects.all()
+    if intake_id is not None:
+        rows = rows.filter(intake_id=intake_id)
+    if program_id is not None:
+        rows = rows.filter(program_id=program_id)
+    if academic_year is not None:
+        rows = rows.filter(intake__academic_year__year=academic_year)
+    fields = ["intake_id", "intake__name", "program_id", "program__name"]
+    rows = list(rows.values(*fields, "status", "count").order_by("intake_id", "program_id"))
+    results = _grouped(rows, fields)
+    for result in results:
+        result["intake"] = result.pop("intake__name")
+        result["program"] = result.pop("program__name")
+    totals = dict.fromkeys(STATUSES, 0)
+    for row in rows:
+        totals[row["status"]] += row["count"]
+    return {"statuses": STATUSES, "totals": totals, "results": results}
+
+
+def take_snapshot(day=None):
+    """
+    Record the counters that changed since the previous snapshot under ``day``
+    (default today), replacing an earlier snapshot of the same day.
+    Returns the number of rows written.
+    """
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        FunnelSnapshot.objects.filter(day=day).delete()
+        since = FunnelSnapshot.objects.filter(day__lt=day).aggregate(last=Max("taken_at"))["last"]
+        counters = FunnelCount.objects.all()
+        if since is not None:
+            counters = counters.filter(Exists(FunnelCount.objects.filter(
+                intake_id=OuterRef("intake_id"), program_id=OuterRef("program_id"), updated_at__gte=since - SNAPSHOT_OVERLAP,
+            )))
+        now = timezone.now()
+        rows = [
+            FunnelSnapshot(day=day, intake_id=intake_id, program_id=program_id, status=status, count=count, taken_at=now)
+            for intake_id, program_id, status, count in counters.values_list("intake_id", "program_id", "status", "count")
+        ]
+        FunnelSnapshot.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def funnel_history(intake_id, program_id=None, since=None, until=None):
+    """
+    Daily counts for an intake (optionally one program), one entry per
+    snapshot day in ``[since, until]``. Pairs without a row on a day keep
+    their previous counts.
+    """
+    rows = FunnelSnapshot.objects.filter(intake_id=intake_id)
+    if program_id is not None:
+        rows = rows.filter(program_id=program_id)
+    if until is not None:
+        rows = rows.filter(day__lte=until)
+    current = {}
+    history = []
+    day = None
+    for row in rows.values("day", "program_id", "status", "count").order_by("day"):
+        if row["day"] != day and day is not None and (since is None or day >= since):
+            history.append(_day_entry(day, current))
+        day = row["day"]
+        current[(row["program_id"], row["status"])] = row["count"]
+    if day is not None and (since is None or day >= since):
+        history.append(_day_entry(day, current))
+    return history
+
+
+def _day_entry(day, current):
+    counts = dict.fromkeys(STATUSES, 0)
+    for (_, status), count in current.items():
+        counts[status] += count
+    return {"day": day, "counts": counts, "total": sum(counts.values())}
@@ -1,4 +1,6 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator
@@ -54,6 +56,7 @@ class Application(models.Model):
         ("offer_made", "Offer Made"),
         ("offer_accepted", "Offer Accepted"),
         ("offer_declined", "Offer Declined"),
+        ("offer_expired", "Offer Expired"),
     ]
 
     applicant = models.ForeignKey(
@@ -69,17 +72,102 @@ class Application(models.Model):
     status = models.CharField(max_length=32, choices=STATUS_CHOICES, default="draft")
     submitted_at = models.DateTimeField(null=True, blank=True)
     decision_date = models.DateTimeField(null=True, blank=True)
+    # Review work queue lease (see apps.admissions.reviews).
+    review_claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    review_claim_expires_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # (intake_id, program_id, status) as last loaded from or written to the database
+    _loaded_state = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        state = tuple(instance.__dict__.get(name) for name in ("intake_id", "program_id", "status"))
+        instance._loaded_state = None if None in state else state
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .funnel import apply_application_transition
+
+        old = self._loaded_state
+        with transaction.atomic():
+            if old is None and not self._state.adding:
+                # Loaded with deferred fields (or built by hand): read what is stored.
+                old = Application.objects.filter(pk=self.pk).values_list("intake_id", "program_id", "status").first()
+            super().save(*args, **kwargs)
+            new = (self.intake_id, self.program_id, self.status)
+            if new != old:
+                # Funnel counters move in the same transaction as the status.
+                apply_application_transition(old, new)
+        self._loaded_state = new
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "intake", "created_at", "id"], name="application_status_intake_idx"),
+            # The review queue: open applications, oldest submission first.
+            models.Index(
+                fields=["submitted_at", "id"], condition=models.Q(status__in=["submitted", "under_review"]),
+                name="application_review_queue_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.applicant} - {self.program.name} ({self.intake})"
 
 
+class FunnelCount(models.Model):
+    """
+    Live number of applications per intake, program and status, kept in step
+    with application saves and deletes by `apps.admissions.funnel`.
+    """
+    # Indexed by the unique constraint.
+    intake = models.ForeignKey(Intake, on_delete=models.CASCADE, related_name="funnel_counts", db_index=False)
+    program = models.ForeignKey("academic.Program", on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(max_length=32, choices=Application.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["intake", "program", "status"], name="funnel_count_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.intake_id}/{self.program_id} {self.status}: {self.count}"
+
+
+class FunnelSnapshot(models.Model):
+    """
+    `FunnelCount` rows as of one day. A day only has rows for the intake and
+    program pairs whose counts changed since the previous snapshot; earlier
+    values carry forward.
+    """
+    day = models.DateField()
+    intake = models.ForeignKey(Intake, on_delete=models.CASCADE, related_name="funnel_snapshots", db_index=False)
+    program = models.ForeignKey("academic.Program", on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(max_length=32, choices=Application.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(fields=["intake", "day", "program", "status"], name="funnel_snapshot_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="funnel_snapshot_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.intake_id}/{self.program_id} {self.status}: {self.count}"
+
+
 class ApplicationDocument(models.Model):
     """
     Stores metadata about uploaded documents for applications.
@@ -98,6 +186,10 @@ class ApplicationDocument(models.Model):
     doc_type = models.CharField(max_length=32, choices=DOC_TYPES)
     file = models.FileField(upload_to="admissions/docs/%Y/%m/")
     meta = DJJSONField(default=dict, blank=True)
+    # Filled in the background by apps.admissions.uploads.process_document;
+    # documents with the same content hash share one stored file.
+    sha256 = models.CharField(max_length=64, blank=True)
+    thumbnail = models.FileField(upload_to="admissions/thumbs/%Y/%m/", blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -105,11 +197,58 @@ class ApplicationDocument(models.Model):
     class Meta:
         unique_together = [("application", "doc_type")]
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["sha256"], name="appdoc_sha256_idx"),
+        ]
 
     def __str__(self):
         return f"{self.application_id} - {self.doc_type}"
 
 
+class DocumentUpload(models.Model):
+    """
+    A resumable, chunked upload of an application document. Chunks are
+    appended to a part file outside the media storage; once complete, a
+    worker stores (or deduplicates) the file as the application's document
+    of ``doc_type``. See `apps.admissions.uploads`.
+    """
+    STATUS_CHOICES = [
+        ("uploading", "Uploading"),
+        ("processing", "Processing"),
+        ("complete", "Complete"),
+        ("failed", "Failed"),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name="uploads")
+    doc_type = models.CharField(max_length=32, choices=ApplicationDocument.DOC_TYPES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    # Optional checksum from the client, verified before the file is stored.
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="uploading")
+    error = models.TextField(blank=True)
+    document = models.ForeignKey(
+        ApplicationDocument, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Abandoned uploads, purged by apps.admissions.uploads.purge_stale_uploads.
+            models.Index(fields=["updated_at"], condition=models.Q(status="uploading"), name="docupload_stale_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.upload_id} ({self.received}/{self.size})"
+
+
 class ApplicationReview(models.Model):
     """
     Represents a review of an application by an admissions officer/staff.
@@ -196,17 +335,41 @@ class Offer(models.Model):
     issued_at = models.DateTimeField(auto_now_add=True)
     accepted_at = models.DateTimeField(null=True, blank=True)
     declined_at = models.DateTimeField(null=True, blank=True)
+    # Derived from the dates on save; pending offers past their expiry date
+    # are expired in bulk by apps.admissions.offers.expire_offers.
+    status = models.CharField(max_length=16, choices=OFFER_STATUS, default="pending")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "issued_at", "id"], name="offer_status_issued_idx"),
+            # The expiry sweep: pending offers by expiry date.
+            models.Index(fields=["expires_at"], condition=models.Q(status="pending"), name="offer_pending_due_idx"),
+        ]
 
-    @property
-    def status(self):
+    def current_status(self):
         if self.accepted_at:
             return "accepted"
         elif self.declined_at:
             return "declined"
-        elif self.expires_at < timezone.now().date():
+        elif self.expires_at < timezone.localdate():
             return "expired"
         else:
             return "pending"
 
+    def save(self, *args, **kwargs):
+        from .funnel import bulk_set_status
+
+        self.status = self.current_status()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "status" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "status"]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.status == "expired":
+                # Same transition as the expiry sweep, funnel counters included.
+                bulk_set_status(
+                    Application.objects.filter(pk=self.application_id, status="offer_made"), "offer_expired"
+                )
+
     def __str__(self):
         return f"Offer for {self.application} - {self.status}"
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""
+Offer expiry.
+
+`Offer.status` is stored and indexed. Saving an offer derives it from the
+offer's dates, and `expire_offers` (run daily by the
+``expire_admission_offers`` task) expires every pending offer past its
+expiry date with one UPDATE, moving the applications still at
+``offer_made`` to ``offer_expired`` with `funnel.bulk_set_status` in the same
+transaction. `Offer.save` makes the same move when an edit finds the offer
+expired. Offers answered before the status was stored still read
+``pending``; the same run settles them as accepted or declined, and they are
+never expired. Accepting or declining checks both the stored and the derived
+status, so an offer the sweep closed cannot be reopened.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .funnel import bulk_set_status
+from .models import Application, Offer
+
+
+def expire_offers(today=None):
+    """Expire pending offers that expired before ``today``; returns how many."""
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        pending = Offer.objects.filter(status="pending")
+        pending.filter(accepted_at__isnull=False).update(status="accepted")
+        pending.filter(accepted_at__isnull=True, declined_at__isnull=False).update(status="declined")
+        due = list(
+            pending.filter(expires_at__lt=today, accepted_at__isnull=True, declined_at__isnull=True)
+            .select_for_update().order_by("pk").values_list("pk", "application_id")
+        )
+        if not due:
+            return 0
+        Offer.objects.filter(pk__in=[pk for pk, _ in due]).update(status="expired")
+        bulk_set_status(
+            Application.objects.filter(pk__in=[application_id for _, application_id in due], status="offer_made"),
+            "offer_expired",
+        )
+    return len(due)
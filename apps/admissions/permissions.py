@@ -1,6 +1,7 @@
 
 import logging
 from rest_framework import permissions
+from apps.users.roles import get_roles
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +13,9 @@ class IsAdmissionsStaff(permissions.BasePermission):
     """
     def has_permission(self, request, view):
         logger.debug(f"Checking IsAdmissionsStaff for user: {request.user}")
-        is_staff = request.user.is_authenticated and (
-            request.user.is_superuser or
-            request.user.groups.filter(name__in=ADMISSIONS_GROUPS).exists()
+        roles = get_roles(request.user)
+        is_staff = roles.is_authenticated and (
+            roles.is_superuser or roles.in_group(*ADMISSIONS_GROUPS)
         )
         logger.debug(f"IsAdmissionsStaff result: {is_staff}")
         return is_staff
@@ -31,7 +32,8 @@ class IsApplicantOrAdmissionsStaff(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         logger.debug(f"Checking has_object_permission for user: {request.user}, obj: {obj}")
-        if request.user.is_superuser or request.user.groups.filter(name__in=ADMISSIONS_GROUPS).exists():
+        roles = get_roles(request.user)
+        if roles.is_superuser or roles.in_group(*ADMISSIONS_GROUPS):
             logger.debug("User is superuser or in staff groups")
             return True
         owner = getattr(obj, "applicant", None)
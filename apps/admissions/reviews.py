@@ -0,0 +1,113 @@
+"""
+Application review work queue.
+
+`claim_applications` hands a reviewer the next open applications (submitted
+or under review, oldest submission first) that still need a review and that
+they have not reviewed. Candidate rows are locked with ``FOR UPDATE SKIP
+LOCKED``, so concurrent reviewers each take different applications without
+waiting on one another, and each claimed row gets a lease
+(``review_claimed_by`` / ``review_claim_expires_at``) so it stays out of other
+reviewers' queues until it is reviewed or the lease runs out. Claimed
+submitted applications move to ``under_review``.
+
+`submit_reviews` records a batch of reviews in one transaction with a single
+``bulk_create`` and releases the reviewer's leases on them.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .funnel import bulk_set_status
+from .models import Application, ApplicationReview
+
+REVIEWS_REQUIRED = getattr(settings, "ADMISSIONS_REVIEWS_REQUIRED", 1)
+CLAIM_MINUTES = getattr(settings, "ADMISSIONS_REVIEW_CLAIM_MINUTES", 30)
+OPEN_STATUSES = ("submitted", "under_review")
+
+
+class ReviewError(Exception):
+    """Raised when a batch of reviews cannot be recorded."""
+
+
+def _claimable(reviewer, now):
+    """Open applications needing a review from ``reviewer`` that no one else holds."""
+    reviews = ApplicationReview.objects.filter(application=OuterRef("pk")).order_by()
+    review_count = reviews.values("application").annotate(total=Count("pk")).values("total")
+    return (
+        Application.objects.filter(status__in=OPEN_STATUSES)
+        .filter(Q(review_claimed_by__isnull=True) | Q(review_claimed_by=reviewer) | Q(review_claim_expires_at__lte=now))
+        .exclude(Exists(reviews.filter(reviewer=reviewer)))
+        .alias(reviews_done=Coalesce(Subquery(review_count, output_field=IntegerField()), Value(0)))
+        .filter(reviews_done__lt=REVIEWS_REQUIRED)
+    )
+
+
+def claim_applications(reviewer, size):
+    """
+    Lease up to ``size`` applications to ``reviewer`` (their unexpired claims
+    included) and return them, oldest submission first.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=CLAIM_MINUTES)
+    with transaction.atomic():
+        pks = list(
+            _claimable(reviewer, now).order_by("submitted_at", "pk")
+            .select_for_update(skip_locked=True).values_list("pk", flat=True)[:size]
+        )
+        if not pks:
+            return []
+        Application.objects.filter(pk__in=pks).update(review_claimed_by=reviewer, review_claim_expires_at=expires_at)
+        bulk_set_status(Application.objects.filter(pk__in=pks, status="submitted"), "under_review")
+    return list(Application.objects.filter(pk__in=pks).order_by("submitted_at", "pk"))
+
+
+def submit_reviews(reviewer, items):
+    """
+    Record ``items`` (dicts with ``application``, ``decision``, ``score``,
+    ``comments``) as ``reviewer``'s reviews; all are saved or none are.
+    """
+    ids = [item["application"] for item in items]
+    if len(set(ids)) != len(ids):
+        raise ReviewError("Each application can only be reviewed once per batch.")
+    now = timezone.now()
+    with transaction.atomic():
+        applications = {
+            application.pk: application
+            for application in Application.objects.filter(pk__in=ids).select_for_update().order_by("pk")
+        }
+        missing = sorted(set(ids) - set(applications))
+        if missing:
+            raise ReviewError(f"Unknown applications: {', '.join(map(str, missing))}.")
+        closed = sorted(pk for pk, application in applications.items() if application.status not in OPEN_STATUSES)
+        if closed:
+            raise ReviewError(f"Applications not open for review: {', '.join(map(str, closed))}.")
+        held = sorted(
+            pk for pk, application in applications.items()
+            if application.review_claimed_by_id not in (None, reviewer.pk)
+            and application.review_claim_expires_at and application.review_claim_expires_at > now
+        )
+        if held:
+            raise ReviewError(f"Applications claimed by another reviewer: {', '.join(map(str, held))}.")
+        done = sorted(
+            ApplicationReview.objects.filter(reviewer=reviewer, application_id__in=ids).values_list("application_id", flat=True)
+        )
+        if done:
+            raise ReviewError(f"Already reviewed: {', '.join(map(str, done))}.")
+
+        reviews = ApplicationReview.objects.bulk_create([
+            ApplicationReview(
+                application_id=item["application"], reviewer=reviewer, decision=item["decision"],
+                score=item.get("score"), comments=item.get("comments", ""),
+            )
+            for item in items
+        ])
+        Application.objects.filter(pk__in=ids, review_claimed_by=reviewer).update(
+            review_claimed_by=None, review_claim_expires_at=None
+        )
+        bulk_set_status(Application.objects.filter(pk__in=ids, status="submitted"), "under_review")
+    return reviews
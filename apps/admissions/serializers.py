@@ -1,6 +1,8 @@
 import logging
 import json
 from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from .models import (
     AcademicYear,
@@ -10,9 +12,11 @@ from .models import (
     ApplicationReview,
     Offer,
     AdmissionDecision,
+    DocumentUpload,
 )
 from apps.users.models import User
 from apps.academic.models import Program
+from apps.core.expansion import ExpandableSerializerMixin
 
 logger = logging.getLogger(__name__)
 
@@ -109,10 +113,12 @@ class ApplicationDocumentSerializer(serializers.ModelSerializer):
             "doc_type",
             "file",
             "meta",
+            "sha256",
+            "thumbnail",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        read_only_fields = ["id", "sha256", "thumbnail", "created_at", "updated_at"]
 
     def validate_meta(self, value):
         if isinstance(value, str):
@@ -124,14 +130,42 @@ class ApplicationDocumentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Meta field must be a JSON object.")
         return value
 
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    """Starts a chunked upload; ``received`` is where the next chunk goes."""
+    application_id = serializers.PrimaryKeyRelatedField(queryset=Application.objects.all(), source="application")
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r"^[0-9a-fA-F]{64}$", required=False)
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DocumentUpload
+        fields = [
+            "upload_id", "application_id", "doc_type", "filename", "size", "sha256", "received", "chunk_size",
+            "status", "error", "document", "created_at", "updated_at",
+        ]
+        read_only_fields = ["upload_id", "received", "status", "error", "document", "created_at", "updated_at"]
+
+    def get_chunk_size(self, obj):
+        return getattr(settings, "ADMISSIONS_UPLOAD_CHUNK_BYTES", 5 * 1024 * 1024)
+
+class UploadChunkSerializer(serializers.Serializer):
+    offset = serializers.IntegerField(min_value=0)
+    chunk = serializers.FileField(allow_empty_file=False)
+
+    def validate_chunk(self, value):
+        if value.size > getattr(settings, "ADMISSIONS_UPLOAD_CHUNK_BYTES", 5 * 1024 * 1024):
+            raise serializers.ValidationError("Chunk is larger than the chunk size limit.")
+        return value
+
 class ApplicationReviewSerializer(serializers.ModelSerializer):
     application = ApplicationSerializer(read_only=True)
     application_id = serializers.PrimaryKeyRelatedField(
         queryset=Application.objects.all(), source="application", write_only=True
     )
     reviewer = serializers.StringRelatedField(read_only=True)
+    # Defaults to the requesting user.
     reviewer_id = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(), source="reviewer", write_only=True
+        queryset=User.objects.all(), source="reviewer", write_only=True, required=False
     )
 
     class Meta:
@@ -149,6 +183,50 @@ class ApplicationReviewSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "created_at"]
 
+class ApplicationReviewListSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    """Flat review rows for list responses; ``?expand=application,reviewer``."""
+    expandable = {
+        "application": (
+            ApplicationSerializer,
+            ("application__applicant", "application__program", "application__intake__academic_year"),
+        ),
+        "reviewer": (serializers.StringRelatedField, "reviewer"),
+    }
+
+    class Meta:
+        model = ApplicationReview
+        fields = ["id", "application_id", "reviewer_id", "decision", "score", "comments", "created_at"]
+        read_only_fields = fields
+
+class CompactApplicationSerializer(serializers.ModelSerializer):
+    """Queue entries: the application's own columns, no nested intake tree."""
+    class Meta:
+        model = Application
+        fields = ["id", "applicant_id", "program_id", "intake_id", "status", "submitted_at", "review_claim_expires_at"]
+        read_only_fields = fields
+
+class ReviewItemSerializer(serializers.Serializer):
+    application = serializers.IntegerField(min_value=1)
+    decision = serializers.ChoiceField(choices=ApplicationReview.DECISION_CHOICES)
+    score = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+    comments = serializers.CharField(required=False, allow_blank=True)
+
+class BatchReviewSerializer(serializers.Serializer):
+    """A reviewer's scores for many applications; all are saved or none are."""
+    reviews = serializers.ListField(
+        child=ReviewItemSerializer(), allow_empty=False,
+        max_length=getattr(settings, "ADMISSIONS_REVIEW_BATCH_MAX", 500),
+    )
+
+    def validate_reviews(self, value):
+        ids = [item["application"] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Applications must not repeat.")
+        return value
+
+class ReviewQueueSerializer(serializers.Serializer):
+    size = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
 class IssueOfferSerializer(serializers.ModelSerializer):
     class Meta:
         model = Offer
@@ -193,7 +271,8 @@ class AcceptOfferSerializer(serializers.ModelSerializer):
         if offer.accepted_at or offer.declined_at:
             raise serializers.ValidationError("Offer has already been accepted or declined.")
         
-        if offer.expires_at < timezone.now().date():
+        # The stored status catches offers the expiry sweep already closed.
+        if offer.status != "pending" or offer.current_status() != "pending":
             raise serializers.ValidationError("Offer has expired.")
         
         return attrs
@@ -201,10 +280,11 @@ class AcceptOfferSerializer(serializers.ModelSerializer):
     def save(self, **kwargs):
         application = self.context["application"]
         offer = application.offer
-        offer.accepted_at = timezone.now()
-        offer.save()
-        application.status = "offer_accepted"
-        application.save()
+        with transaction.atomic():
+            offer.accepted_at = timezone.now()
+            offer.save()
+            application.status = "offer_accepted"
+            application.save()
         return offer
 
 class DeclineOfferSerializer(serializers.ModelSerializer):
@@ -223,7 +303,8 @@ class DeclineOfferSerializer(serializers.ModelSerializer):
         if offer.accepted_at or offer.declined_at:
             raise serializers.ValidationError("Offer has already been accepted or declined.")
         
-        if offer.expires_at < timezone.now().date():
+        # The stored status catches offers the expiry sweep already closed.
+        if offer.status != "pending" or offer.current_status() != "pending":
             raise serializers.ValidationError("Offer has expired.")
         
         return attrs
@@ -231,10 +312,11 @@ class DeclineOfferSerializer(serializers.ModelSerializer):
     def save(self, **kwargs):
         application = self.context["application"]
         offer = application.offer
-        offer.declined_at = timezone.now()
-        offer.save()
-        application.status = "offer_declined"
-        application.save()
+        with transaction.atomic():
+            offer.declined_at = timezone.now()
+            offer.save()
+            application.status = "offer_declined"
+            application.save()
         return offer
 
 class OfferSerializer(serializers.ModelSerializer):
@@ -251,9 +333,10 @@ class OfferSerializer(serializers.ModelSerializer):
             "issued_at",
             "accepted_at",
             "declined_at",
+            "status",
             "offered_by",
         ]
-        read_only_fields = ["id", "issued_at", "accepted_at", "declined_at", "offered_by"]
+        read_only_fields = ["id", "issued_at", "accepted_at", "declined_at", "status", "offered_by"]
 
 class AdmissionDecisionSerializer(serializers.ModelSerializer):
     application = ApplicationSerializer(read_only=True)
@@ -277,4 +360,22 @@ class AdmissionDecisionSerializer(serializers.ModelSerializer):
             "remarks",
             "decided_at",
         ]
-        read_only_fields = ["id", "decided_at"]
\ No newline at end of file
+        read_only_fields = ["id", "decided_at"]
+
+class DecideIntakeSerializer(serializers.Serializer):
+    """Parameters of a decision run over one intake and program."""
+    intake = serializers.PrimaryKeyRelatedField(queryset=Intake.objects.all())
+    program = serializers.PrimaryKeyRelatedField(queryset=Program.objects.all())
+    capacity = serializers.IntegerField(min_value=0)
+    min_score = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    waitlist = serializers.IntegerField(min_value=0, default=0)
+    min_reviews = serializers.IntegerField(min_value=1, default=getattr(settings, "ADMISSIONS_REVIEWS_REQUIRED", 1))
+    make_offers = serializers.BooleanField(default=False)
+    offer_amount_cents = serializers.IntegerField(min_value=0, default=0)
+    offer_expires_at = serializers.DateField(required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_offer_expires_at(self, value):
+        if value < timezone.localdate():
+            raise serializers.ValidationError("Offer expiry must not be in the past.")
+        return value
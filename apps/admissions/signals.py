@@ -0,0 +1,15 @@
+"""
+Keep the funnel counters in step with application deletes (cascades
+included). Creates and status transitions are handled in `Application.save`.
+"""
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .funnel import apply_application_transition
+from .models import Application
+
+
+@receiver(post_delete, sender=Application)
+def application_deleted(sender, instance, **kwargs):
+    apply_application_transition(instance._loaded_state or (instance.intake_id, instance.program_id, instance.status), None)
@@ -0,0 +1,37 @@
+from celery import shared_task
+from .funnel import rebuild_counts, take_snapshot
+from .offers import expire_offers
+from .models import ApplicationDocument, DocumentUpload
+from .uploads import process_document, purge_stale_uploads, store_upload
+
+@shared_task
+def snapshot_admissions_funnel():
+    # Daily, shortly before midnight: record the day's funnel counts.
+    return take_snapshot()
+
+@shared_task
+def rebuild_admissions_funnel(intake_id=None):
+    # Reconciliation after bulk writes that bypassed Application.save.
+    return rebuild_counts(intake_id)
+
+@shared_task
+def expire_admission_offers():
+    # Daily, just after midnight: expire pending offers past their expiry date.
+    return expire_offers()
+
+@shared_task
+def store_document_upload(upload_pk):
+    # Queued when a chunked upload completes.
+    return store_upload(DocumentUpload.objects.get(pk=upload_pk)).status
+
+@shared_task
+def process_application_document(document_pk):
+    # Queued when a document is uploaded in a single request.
+    document = ApplicationDocument.objects.filter(pk=document_pk).first()
+    if document is not None:
+        process_document(document)
+
+@shared_task
+def purge_stale_document_uploads():
+    # Daily: drop chunked uploads abandoned part way.
+    return purge_stale_uploads()
@@ -1,5 +1,12 @@
 import logging
-from django.test import TestCase, LiveServerTestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+from io import BytesIO
+from PIL import Image
+from django.test import TestCase, LiveServerTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
@@ -11,8 +18,15 @@ from apps.users.models import User
 from apps.hr.models import Department
 from apps.core.models import College
 from apps.academic.models import Program
-from .models import AcademicYear, Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    AcademicYear, Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision, FunnelCount,
+    FunnelSnapshot, DocumentUpload,
+)
 from .filters import ApplicationFilter
+from . import funnel, uploads
 
 logger = logging.getLogger(__name__)
 
@@ -427,4 +441,552 @@ class AdmissionsAPITests(LiveServerTestCase):
         offer = Offer.objects.get(application=application)
         self.assertIsNotNone(offer.declined_at)
         application.refresh_from_db()
-        self.assertEqual(application.status, "offer_declined")
\ No newline at end of file
+        self.assertEqual(application.status, "offer_declined")
+
+
+class FunnelTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        department = Department.objects.create(name="Admissions Department")
+        self.programs = [Program.objects.create(name=f"Program {i}", department=department) for i in range(2)]
+        year = AcademicYear.objects.create(
+            year='2025-2026', start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=365)
+        )
+        self.intake = Intake.objects.create(
+            name='Fall 2025', academic_year=year, opens_at=timezone.now().date(),
+            closes_at=timezone.now().date() + timedelta(days=90),
+        )
+        self.staff = User.objects.create_user(login_id='officer', password='testpass123')
+        self.staff.groups.add(Group.objects.get_or_create(name='Admissions')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+        self.applications = [
+            Application.objects.create(
+                applicant=User.objects.create_user(login_id=f'applicant{i}', password='testpass123'),
+                intake=self.intake, program=self.programs[i % 2],
+            )
+            for i in range(6)
+        ]
+
+    def _counters(self):
+        return {
+            (row.intake_id, row.program_id, row.status): row.count
+            for row in FunnelCount.objects.all() if row.count
+        }
+
+    def _expected(self):
+        rows = Application.objects.values_list('intake_id', 'program_id', 'status').annotate(n=Count('pk')).order_by()
+        return {(intake, program, status): n for intake, program, status, n in rows}
+
+    def test_workflow_transitions_move_counters(self):
+        first, second, third = self.applications[:3]
+        ApplicationDocument.objects.create(application=first, doc_type='transcript', file=SimpleUploadedFile("t.pdf", b"pdf"))
+        response = self.client.post(reverse("application-submit", kwargs={"pk": first.pk}), {"status": "submitted"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        second.status = 'accepted'
+        second.save()
+        response = self.client.post(
+            reverse("application-issue-offer", kwargs={"pk": second.pk}),
+            {"amount_cents": 0, "expires_at": (timezone.now().date() + timedelta(days=30)).isoformat()}, format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse("application-accept-offer", kwargs={"pk": second.pk}), format="json")
+        self.assertEqual(response.status_code, 200)
+
+        third.program = self.programs[0]
+        third.save()
+        self.applications[3].delete()
+        Application.objects.get(pk=self.applications[4].pk).delete()
+
+        self.assertEqual(self._counters(), self._expected())
+        statuses = funnel.funnel(self.intake.pk)['totals']
+        self.assertEqual((statuses['draft'], statuses['submitted'], statuses['offer_accepted']), (2, 1, 1))
+
+    def test_funnel_endpoint_reads_counter_rows(self):
+        url = reverse("application-funnel")
+        self.client.get(url)  # warm the role cache
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"intake": self.intake.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals']['draft'], 6)
+        self.assertEqual([row['counts']['draft'] for row in response.data['results']], [3, 3])
+        self.assertEqual(self.client.get(url, {"intake": "x"}).status_code, 400)
+
+        applicant = APIClient()
+        applicant.force_authenticate(user=self.applications[0].applicant)
+        self.assertEqual(applicant.get(url).status_code, 403)
+
+    def test_bulk_status_change_and_rebuild(self):
+        moved = funnel.bulk_set_status(Application.objects.filter(program=self.programs[0]), 'under_review')
+        self.assertEqual(moved, 3)
+        self.assertEqual(funnel.bulk_set_status(Application.objects.all(), 'under_review'), 3)
+        self.assertEqual(self._counters(), self._expected())
+
+        Application.objects.filter(pk=self.applications[0].pk).update(status='rejected')  # bypasses the counters
+        self.assertNotEqual(self._counters(), self._expected())
+        funnel.rebuild_counts()
+        self.assertEqual(self._counters(), self._expected())
+
+    def test_snapshots_keep_daily_history(self):
+        today = timezone.localdate()
+        first, second = today - timedelta(days=2), today - timedelta(days=1)
+        FunnelCount.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(funnel.take_snapshot(first), 2)
+        app = self.applications[0]
+        app.status = 'submitted'
+        app.save()
+        # Only the changed program's rows are recorded for the second day.
+        self.assertEqual(funnel.take_snapshot(second), 2)
+        self.assertEqual(set(FunnelSnapshot.objects.filter(day=second).values_list('program_id', flat=True)), {app.program_id})
+
+        response = self.client.get(reverse("application-funnel-history"), {"intake": self.intake.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['day'] for entry in response.data], [first, second])
+        self.assertEqual([entry['counts']['draft'] for entry in response.data], [6, 5])
+        self.assertEqual([entry['total'] for entry in response.data], [6, 6])
+        response = self.client.get(reverse("application-funnel-history"), {"intake": self.intake.pk, "since": second.isoformat()})
+        self.assertEqual([entry['counts']['submitted'] for entry in response.data], [1])
+        response = self.client.get(reverse("application-funnel-history"), {"intake": self.intake.pk, "until": "2024-13-45"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Admissions Department")
+        program = Program.objects.create(name="Program", department=department)
+        year = AcademicYear.objects.create(
+            year='2026-2027', start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=365)
+        )
+        intake = Intake.objects.create(
+            name='Fall 2026', academic_year=year, opens_at=timezone.now().date(),
+            closes_at=timezone.now().date() + timedelta(days=90),
+        )
+        group = Group.objects.get_or_create(name='Admissions')[0]
+        self.reviewers = []
+        self.clients = []
+        for i in range(2):
+            reviewer = User.objects.create_user(login_id=f'reviewer{i}', password='testpass123')
+            reviewer.groups.add(group)
+            client = APIClient()
+            client.force_authenticate(user=reviewer)
+            self.reviewers.append(reviewer)
+            self.clients.append(client)
+        now = timezone.now()
+        self.applications = [
+            Application.objects.create(
+                applicant=User.objects.create_user(login_id=f'applicant{i}', password='testpass123'),
+                intake=intake, program=program, status='submitted', submitted_at=now - timedelta(hours=5 - i),
+            )
+            for i in range(5)
+        ]
+        Application.objects.create(
+            applicant=User.objects.create_user(login_id='drafter', password='testpass123'), intake=intake, program=program,
+        )
+
+    def _queue(self, client, size):
+        response = client.post(reverse("applicationreview-queue"), {"size": size}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_queue_hands_out_disjoint_applications(self):
+        first = self._queue(self.clients[0], 3)
+        second = self._queue(self.clients[1], 3)
+        self.assertEqual(first, [app.pk for app in self.applications[:3]])
+        self.assertEqual(second, [app.pk for app in self.applications[3:]])
+        # A reviewer asking again gets their own claims back, not someone else's.
+        self.assertEqual(self._queue(self.clients[0], 3), first)
+        self.assertEqual(set(Application.objects.filter(pk__in=first + second).values_list('status', flat=True)), {'under_review'})
+        self.assertEqual(funnel.funnel()['totals']['under_review'], 5)
+
+        Application.objects.filter(pk__in=first).update(review_claim_expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self._queue(self.clients[1], 5), first + second)
+
+    def test_batch_is_all_or_nothing(self):
+        url = reverse("applicationreview-batch")
+        claimed = self._queue(self.clients[1], 1)
+        items = [{"application": app.pk, "decision": "accept", "score": 80} for app in self.applications]
+        response = self.clients[0].post(url, {"reviews": items}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertIn(str(claimed[0]), response.data['detail'])
+        self.assertFalse(ApplicationReview.objects.exists())
+
+        response = self.clients[0].post(url, {"reviews": items[1:]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(ApplicationReview.objects.filter(reviewer=self.reviewers[0]).count(), 4)
+        self.assertEqual(self.clients[0].post(url, {"reviews": items[1:2]}, format="json").status_code, 409)
+        self.assertEqual(self.clients[0].post(url, {"reviews": items[:1] * 2}, format="json").status_code, 400)
+
+        # Reviewed applications drop out of the queue once enough reviews are in.
+        self.assertEqual(self._queue(self.clients[0], 5), [])
+        response = self.clients[1].post(url, {"reviews": items[:1]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(Application.objects.get(pk=claimed[0]).review_claimed_by_id)
+
+    def test_list_is_flat_with_optional_expansion(self):
+        reviews = [
+            ApplicationReview(application=app, reviewer=self.reviewers[0], decision='accept') for app in self.applications
+        ]
+        ApplicationReview.objects.bulk_create(reviews)
+        url = reverse("applicationreview-list")
+        client = self.clients[0]
+        client.get(url)  # warm the role cache
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('application', response.data['results'][0])
+        with self.assertNumQueries(1):
+            response = client.get(url, {"expand": "application,reviewer"})
+        self.assertEqual(response.data['results'][0]['application']['intake']['academic_year']['year'], '2026-2027')
+        self.assertEqual(response.data['results'][0]['reviewer'], str(self.reviewers[0]))
+
+class DecisionEngineTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Admissions Department")
+        self.program = Program.objects.create(name="Program", department=department)
+        year = AcademicYear.objects.create(
+            year='2027-2028', start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=365)
+        )
+        self.intake = Intake.objects.create(
+            name='Fall 2027', academic_year=year, opens_at=timezone.now().date(),
+            closes_at=timezone.now().date() + timedelta(days=90),
+        )
+        self.staff = User.objects.create_user(login_id='officer', password='testpass123')
+        self.staff.groups.add(Group.objects.get_or_create(name='Admissions')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+        reviewers = [User.objects.create_user(login_id=f'reviewer{i}', password='testpass123') for i in range(2)]
+        now = timezone.now()
+        # Average scores 90, 80, 80 (submitted later), 60, 40, and one without reviews.
+        self.applications = []
+        for i, scores in enumerate([(95, 85), (80, 80), (70, 90), (60, 60), (40, 40), ()]):
+            app = Application.objects.create(
+                applicant=User.objects.create_user(login_id=f'applicant{i}', password='testpass123'),
+                intake=self.intake, program=self.program, status='submitted', submitted_at=now - timedelta(hours=10 - i),
+            )
+            ApplicationReview.objects.bulk_create([
+                ApplicationReview(application=app, reviewer=reviewer, decision='accept', score=score)
+                for reviewer, score in zip(reviewers, scores)
+            ])
+            self.applications.append(app)
+
+    def _decide(self, **params):
+        params = {"intake": self.intake.pk, "program": self.program.pk, "capacity": 2, **params}
+        return self.client.post(reverse("admissiondecision-decide"), params, format="json")
+
+    def test_dry_run_ranks_without_writing(self):
+        response = self._decide(waitlist=1, min_score=50, dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        ranking = response.data['ranking']
+        self.assertEqual([row['application'] for row in ranking], [app.pk for app in self.applications])
+        self.assertEqual(
+            [row['decision'] for row in ranking], ['accept', 'accept', 'waitlist', 'reject', 'reject', 'pending']
+        )
+        self.assertEqual(response.data['counts'], {'accept': 2, 'waitlist': 1, 'reject': 2, 'pending': 1})
+        self.assertFalse(AdmissionDecision.objects.exists())
+        self.assertEqual(set(Application.objects.values_list('status', flat=True)), {'submitted'})
+
+    def test_decides_in_bulk_and_keeps_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._decide(waitlist=1, min_score=70, make_offers=True, offer_amount_cents=5000)
+        self.assertEqual(response.status_code, 201)
+        # One grouped ranking query and one INSERT per table, whatever the intake size.
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([q for q in sql if 'AVG(' in q]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "admissions_admissiondecision"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "admissions_offer"')]), 1)
+        self.assertNotIn('ranking', response.data)
+        statuses = dict(Application.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[app.pk] for app in self.applications],
+            ['offer_made', 'offer_made', 'under_review', 'rejected', 'rejected', 'submitted'],
+        )
+        self.assertEqual(Offer.objects.filter(amount_cents=5000, offered_by=self.staff).count(), 2)
+        self.assertEqual(
+            dict(AdmissionDecision.objects.values_list('application_id', 'decision')),
+            {self.applications[0].pk: 'accept', self.applications[1].pk: 'accept', self.applications[2].pk: 'waitlist',
+             self.applications[3].pk: 'reject', self.applications[4].pk: 'reject'},
+        )
+        totals = funnel.funnel(self.intake.pk)['totals']
+        self.assertEqual((totals['offer_made'], totals['rejected'], totals['under_review']), (2, 2, 1))
+
+        # Decided applications are not decided again, and admitted ones take seats.
+        ApplicationReview.objects.create(
+            application=self.applications[5], reviewer=self.staff, decision='accept', score=99
+        )
+        response = self._decide(capacity=3)
+        self.assertEqual(response.data['counts'], {'accept': 1, 'waitlist': 0, 'reject': 0, 'pending': 0})
+        self.assertEqual(Application.objects.get(pk=self.applications[5].pk).status, 'accepted')
+
+    def test_requires_admissions_staff(self):
+        applicant = APIClient()
+        applicant.force_authenticate(user=self.applications[0].applicant)
+        response = applicant.post(
+            reverse("admissiondecision-decide"), {"intake": self.intake.pk, "program": self.program.pk, "capacity": 1},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self._decide(capacity=-1).status_code, 400)
+
+class OfferExpiryTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Admissions Department")
+        program = Program.objects.create(name="Program", department=department)
+        year = AcademicYear.objects.create(
+            year='2028-2029', start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=365)
+        )
+        intake = Intake.objects.create(
+            name='Fall 2028', academic_year=year, opens_at=timezone.now().date(),
+            closes_at=timezone.now().date() + timedelta(days=90),
+        )
+        self.staff = User.objects.create_user(login_id='officer', password='testpass123')
+        self.staff.groups.add(Group.objects.get_or_create(name='Admissions')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+        today = timezone.now().date()
+        # Two overdue, one still open, one accepted after its expiry date passed.
+        self.offers = []
+        for i, (expires_at, accepted) in enumerate([(-2, False), (-1, False), (3, False), (-1, True)]):
+            app = Application.objects.create(
+                applicant=User.objects.create_user(login_id=f'applicant{i}', password='testpass123'),
+                intake=intake, program=program, status='offer_accepted' if accepted else 'offer_made',
+            )
+            offer = Offer.objects.create(
+                application=app, offered_by=self.staff, expires_at=today + timedelta(days=3),
+                accepted_at=timezone.now() if accepted else None,
+            )
+            # Offers are issued with a future expiry date that later passes.
+            Offer.objects.filter(pk=offer.pk).update(expires_at=today + timedelta(days=expires_at))
+            self.offers.append(offer)
+
+    def test_status_is_stored_from_the_dates(self):
+        self.assertEqual([offer.status for offer in self.offers], ['pending', 'pending', 'pending', 'accepted'])
+        offer = Offer.objects.get(pk=self.offers[0].pk)
+        offer.amount_cents = 100
+        offer.save(update_fields=['amount_cents'])
+        self.assertEqual(Offer.objects.get(pk=offer.pk).status, 'expired')
+        self.assertEqual(Application.objects.get(pk=offer.application_id).status, 'offer_expired')
+        self.assertEqual(funnel.funnel()['totals']['offer_expired'], 1)
+
+    def test_sweeper_expires_due_offers_in_bulk(self):
+        from .offers import expire_offers
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(expire_offers(), 2)
+        expiring = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "admissions_offer"') and 'expired' in q['sql']]
+        self.assertEqual(len(expiring), 1)
+        self.assertEqual(
+            list(Offer.objects.order_by('pk').values_list('status', flat=True)), ['expired', 'expired', 'pending', 'accepted']
+        )
+        self.assertEqual(
+            [Application.objects.get(pk=offer.application_id).status for offer in self.offers],
+            ['offer_expired', 'offer_expired', 'offer_made', 'offer_accepted'],
+        )
+        self.assertEqual(funnel.funnel()['totals']['offer_expired'], 2)
+        self.assertEqual(expire_offers(), 0)
+
+        response = self.client.get(reverse("offer-list"), {"status": "expired"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row['id'] for row in response.data['results']), [self.offers[0].pk, self.offers[1].pk])
+
+    def test_swept_offers_cannot_be_accepted_or_declined(self):
+        from .offers import expire_offers
+
+        expire_offers()
+        # Still open by its dates, but already closed by the sweep.
+        Offer.objects.filter(pk=self.offers[1].pk).update(expires_at=timezone.localdate())
+        application = Application.objects.get(pk=self.offers[1].application_id)
+        self.client.force_authenticate(user=application.applicant)
+        for name in ('application-accept-offer', 'application-decline-offer'):
+            response = self.client.post(reverse(name, kwargs={'pk': application.pk}), format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Application.objects.get(pk=application.pk).status, 'offer_expired')
+
+    def test_answered_offers_stored_as_pending_are_settled_not_expired(self):
+        from .offers import expire_offers
+
+        # Rows answered before the status column existed default to pending.
+        Offer.objects.filter(pk=self.offers[1].pk).update(declined_at=timezone.now())
+        Offer.objects.filter(pk__in=[self.offers[1].pk, self.offers[3].pk]).update(status='pending')
+        self.assertEqual(expire_offers(), 1)
+        self.assertEqual(
+            list(Offer.objects.order_by('pk').values_list('status', flat=True)), ['expired', 'declined', 'pending', 'accepted']
+        )
+        self.assertEqual(Application.objects.get(pk=self.offers[3].application_id).status, 'offer_accepted')
+
+class DocumentUploadTests(TestCase):
+    def setUp(self):
+        media, parts = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.addCleanup(shutil.rmtree, parts)
+        self.media = media
+        # Audit rows are written inline, so the queued task is the only commit callback.
+        settings_override = override_settings(
+            MEDIA_ROOT=media, ADMISSIONS_UPLOAD_DIR=parts, ADMISSIONS_UPLOAD_CHUNK_BYTES=4096, AUDIT_ASYNC=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        department = Department.objects.create(name="Admissions Department")
+        program = Program.objects.create(name="Program", department=department)
+        year = AcademicYear.objects.create(
+            year='2029-2030', start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=365)
+        )
+        intake = Intake.objects.create(
+            name='Fall 2029', academic_year=year, opens_at=timezone.now().date(),
+            closes_at=timezone.now().date() + timedelta(days=90),
+        )
+        self.applications, self.clients = [], []
+        for i in range(2):
+            applicant = User.objects.create_user(login_id=f'applicant{i}', password='testpass123')
+            client = APIClient()
+            client.force_authenticate(user=applicant)
+            self.applications.append(Application.objects.create(applicant=applicant, intake=intake, program=program))
+            self.clients.append(client)
+        image = BytesIO()
+        Image.effect_noise((600, 400), 64).convert("RGB").save(image, "PNG")
+        self.scan = image.getvalue()
+
+    def _stored_files(self):
+        return sorted(
+            os.path.join(root, name) for root, _, names in os.walk(os.path.join(self.media, 'admissions', 'docs'))
+            for name in names
+        )
+
+    def _upload(self, index, data, **extra):
+        client = self.clients[index]
+        response = client.post(reverse("documentupload-list"), {
+            "application_id": self.applications[index].pk, "doc_type": "transcript",
+            "filename": "scan.png", "size": len(data), **extra,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data['upload_id']
+        chunk_url = reverse("documentupload-chunk", kwargs={"upload_id": upload_id})
+        for offset in range(0, len(data), 4096):
+            piece = SimpleUploadedFile("chunk", data[offset:offset + 4096])
+            response = client.post(chunk_url, {"offset": offset, "chunk": piece}, format="multipart")
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['received'], len(data))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post(reverse("documentupload-complete", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        # Run what the worker would.
+        return uploads.store_upload(DocumentUpload.objects.get(upload_id=upload_id))
+
+    def test_chunked_upload_resumes_and_is_processed(self):
+        client = self.clients[0]
+        response = client.post(reverse("documentupload-list"), {
+            "application_id": self.applications[0].pk, "doc_type": "transcript", "filename": "scan.png", "size": len(self.scan),
+        }, format="json")
+        upload_id = response.data['upload_id']
+        chunk_url = reverse("documentupload-chunk", kwargs={"upload_id": upload_id})
+        client.post(chunk_url, {"offset": 0, "chunk": SimpleUploadedFile("c", self.scan[:4096])}, format="multipart")
+        # A chunk sent again after a dropped response is refused with the offset to resume from.
+        response = client.post(chunk_url, {"offset": 0, "chunk": SimpleUploadedFile("c", self.scan[:4096])}, format="multipart")
+        self.assertEqual((response.status_code, response.data['received']), (409, 4096))
+        response = client.post(reverse("documentupload-complete", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.status_code, 409)
+        response = client.get(reverse("documentupload-detail", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.data['received'], 4096)
+        self.assertEqual(self.clients[1].get(reverse("documentupload-detail", kwargs={"upload_id": upload_id})).status_code, 404)
+
+        upload = DocumentUpload.objects.get(upload_id=upload_id)
+        for offset in range(4096, len(self.scan), 4096):
+            uploads.append_chunk(upload, offset, SimpleUploadedFile("c", self.scan[offset:offset + 4096]))
+        uploads.complete_upload(upload)
+        upload = uploads.store_upload(DocumentUpload.objects.get(pk=upload.pk))
+        self.assertEqual(upload.status, 'complete')
+        self.assertFalse(os.path.exists(uploads.part_path(upload)))
+
+        document = upload.document
+        self.assertEqual(document.sha256, hashlib.sha256(self.scan).hexdigest())
+        with document.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.scan)
+        self.assertEqual(
+            {key: document.meta['file'][key] for key in ('format', 'width', 'height', 'size')},
+            {'format': 'PNG', 'width': 600, 'height': 400, 'size': len(self.scan)},
+        )
+        with document.thumbnail.open('rb') as thumb, Image.open(thumb) as image:
+            self.assertEqual(image.size, (256, 171))
+
+    def test_identical_uploads_share_one_stored_file(self):
+        first = self._upload(0, self.scan).document
+        second = self._upload(1, self.scan).document
+        self.assertNotEqual(first.application_id, second.application_id)
+        self.assertEqual((second.file.name, second.thumbnail.name), (first.file.name, first.thumbnail.name))
+        self.assertEqual(second.meta['file']['width'], 600)
+        self.assertEqual(len(self._stored_files()), 1)
+
+        # A single-request upload of the same bytes is deduplicated by the worker.
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.clients[0].post(reverse("applicationdocument-list"), {
+                "application_id": self.applications[0].pk, "doc_type": "photo",
+                "file": SimpleUploadedFile("photo.png", self.scan), "meta": "{}",
+            }, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(self._stored_files()), 2)
+        document = uploads.process_document(ApplicationDocument.objects.get(pk=response.data['id']))
+        self.assertEqual(document.file.name, first.file.name)
+        self.assertEqual(len(self._stored_files()), 1)
+
+    def test_replacement_drops_the_old_file_and_meta_errors_keep_it_complete(self):
+        first = self._upload(0, self.scan).document
+        other = BytesIO()
+        Image.effect_noise((300, 200), 64).convert("RGB").save(other, "PNG")
+        with mock.patch.object(uploads, 'process_document', side_effect=OSError('disk full')), \
+                self.assertLogs('apps.admissions.uploads', level='ERROR'):
+            upload = self._upload(0, other.getvalue())
+        self.assertEqual(upload.status, 'complete')
+        self.assertEqual(upload.document.pk, first.pk)
+        self.assertNotEqual(upload.document.file.name, first.file.name)
+        self.assertEqual(self._stored_files(), [os.path.join(self.media, upload.document.file.name)])
+        self.assertFalse(first.thumbnail.storage.exists(first.thumbnail.name))
+
+    def test_checksum_mismatch_fails_the_upload(self):
+        upload = self._upload(0, self.scan, sha256="0" * 64)
+        self.assertEqual(upload.status, 'failed')
+        self.assertIsNone(upload.document)
+        self.assertFalse(ApplicationDocument.objects.exists())
+
+
+    def test_lost_part_file_restarts_the_upload(self):
+        client = self.clients[0]
+        response = client.post(reverse("documentupload-list"), {
+            "application_id": self.applications[0].pk, "doc_type": "transcript", "filename": "scan.png", "size": len(self.scan),
+        }, format="json")
+        upload = DocumentUpload.objects.get(upload_id=response.data['upload_id'])
+        chunk_url = reverse("documentupload-chunk", kwargs={"upload_id": upload.upload_id})
+        client.post(chunk_url, {"offset": 0, "chunk": SimpleUploadedFile("c", self.scan[:4096])}, format="multipart")
+        # E.g. the next chunk reached a web server that does not share the part directory.
+        os.remove(uploads.part_path(upload))
+        response = client.post(chunk_url, {"offset": 4096, "chunk": SimpleUploadedFile("c", self.scan[4096:8192])}, format="multipart")
+        self.assertEqual((response.status_code, response.data['received']), (409, 0))
+        response = client.post(chunk_url, {"offset": 0, "chunk": SimpleUploadedFile("c", self.scan[:4096])}, format="multipart")
+        self.assertEqual((response.status_code, response.data['received']), (200, 4096))
+
+    def test_failed_and_stuck_processing_is_marked_failed(self):
+        upload = uploads.start_upload(self.applications[0], "transcript", "scan.png", len(self.scan))
+        uploads.append_chunk(upload, 0, SimpleUploadedFile("c", self.scan))
+        uploads.complete_upload(upload)
+        os.remove(uploads.part_path(upload))
+        with self.assertLogs('apps.admissions.uploads', level='ERROR'):
+            upload = uploads.store_upload(DocumentUpload.objects.get(pk=upload.pk))
+        self.assertEqual(upload.status, 'failed')
+        self.assertFalse(ApplicationDocument.objects.exists())
+
+        stuck = uploads.start_upload(self.applications[1], "transcript", "scan.png", len(self.scan))
+        uploads.append_chunk(stuck, 0, SimpleUploadedFile("c", self.scan))
+        uploads.complete_upload(stuck)
+        DocumentUpload.objects.filter(pk=stuck.pk).update(updated_at=timezone.now() - timedelta(hours=49))
+        self.assertEqual(uploads.purge_stale_uploads(), 1)
+        stuck.refresh_from_db()
+        self.assertEqual((stuck.status, stuck.error), ('failed', 'Processing never finished.'))
+        self.assertFalse(os.path.exists(uploads.part_path(stuck)))
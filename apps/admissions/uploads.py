@@ -0,0 +1,264 @@
+"""
+Chunked document uploads and background document processing.
+
+A `DocumentUpload` is started with the file's name and size. The client then
+sends the file in order, one chunk per request, each at the offset the
+server has received so far. `append_chunk` writes every chunk straight to a
+part file in ``ADMISSIONS_UPLOAD_DIR``. A client that lost its connection
+reads ``received`` back and resumes from there, so the web worker never
+holds more than one chunk. A part file that has lost acknowledged bytes
+(deleted, or written on another host) resets ``received`` to 0 and the
+chunk is refused, so the client starts over instead of completing a
+corrupt file. `complete_upload` hands the part file to a worker
+(``store_document_upload``), which must share ``ADMISSIONS_UPLOAD_DIR``.
+
+`store_upload` hashes the part file. If a document with the same SHA-256
+already exists, the new `ApplicationDocument` points at its stored file,
+thumbnail and extracted meta, and nothing is written to storage. Otherwise
+the file is streamed into storage and `process_document` runs. A file or
+thumbnail the document replaced is deleted once no document points at it.
+An error before the document is stored marks the upload failed, and
+`purge_stale_uploads` also fails uploads that sat in processing too long (a
+lost task), so none stay in limbo. An error while extracting meta or the
+thumbnail is only logged: the upload is complete and its file is stored.
+
+`process_document` also runs in a worker for documents uploaded in one
+request (``process_application_document``). It hashes and deduplicates the
+stored file, then records its size, type and (for images) format and
+dimensions under ``meta["file"]``. For images it also writes a JPEG
+thumbnail. Extraction leaves the client-supplied ``meta`` keys alone.
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import ApplicationDocument, DocumentUpload
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised when a chunk or a completion request does not fit the upload."""
+
+
+def _setting(name, default):
+    # Read on use so tests can point the upload directory elsewhere.
+    return getattr(settings, name, default)
+
+
+def part_path(upload):
+    return os.path.join(_setting("ADMISSIONS_UPLOAD_DIR", "admission-uploads"), f"{upload.upload_id}.part")
+
+
+def start_upload(application, doc_type, filename, size, sha256="", user=None):
+    if size > _setting("ADMISSIONS_UPLOAD_MAX_BYTES", 50 * 1024 * 1024):
+        raise UploadError("File is larger than the upload limit.")
+    return DocumentUpload.objects.create(
+        application=application, doc_type=doc_type, filename=os.path.basename(filename), size=size,
+        sha256=sha256.lower(), created_by=user,
+    )
+
+
+def append_chunk(upload, offset, chunk):
+    """
+    Write ``chunk`` (an uploaded file) at ``offset``, which must equal the
+    bytes received so far. Returns the refreshed upload.
+    """
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != "uploading":
+            raise UploadError(f"Upload is {upload.status}; it takes no more chunks.")
+        path = part_path(upload)
+        # Bytes past ``received`` are a failed attempt and get truncated below;
+        # acknowledged bytes missing from the part file cannot be recovered.
+        lost = (os.path.getsize(path) if os.path.exists(path) else 0) < upload.received
+        if lost:
+            upload.received = 0
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            if offset != upload.received:
+                raise UploadError(f"Expected the chunk at offset {upload.received}.")
+            if upload.received + chunk.size > upload.size:
+                raise UploadError("Chunk runs past the declared file size.")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+                part.seek(offset)
+                part.truncate()
+                for piece in chunk.chunks():
+                    part.write(piece)
+                upload.received = part.tell()
+        upload.save(update_fields=["received", "updated_at"])
+    if lost:
+        raise UploadError("Received bytes were lost; restart the upload from offset 0.")
+    return upload
+
+
+def complete_upload(upload):
+    """Mark a fully received upload for processing; the caller queues the worker."""
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != "uploading":
+            raise UploadError(f"Upload is already {upload.status}.")
+        if upload.received != upload.size:
+            raise UploadError(f"Received {upload.received} of {upload.size} bytes.")
+        upload.status = "processing"
+        upload.save(update_fields=["status", "updated_at"])
+    return upload
+
+
+def file_sha256(fileobj):
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(HASH_BLOCK), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def _duplicate_of(digest, exclude_pk=None):
+    return ApplicationDocument.objects.filter(sha256=digest).exclude(pk=exclude_pk).exclude(file="").order_by("pk").first()
+
+
+def _adopt(document, original, filename):
+    """Point ``document`` at ``original``'s stored file, thumbnail and extracted meta."""
+    document.file.name = original.file.name
+    document.thumbnail.name = original.thumbnail.name
+    document.sha256 = original.sha256
+    if "file" in original.meta:
+        document.meta = {**document.meta, "file": {**original.meta["file"], "name": filename}}
+
+
+def _fail(upload, error):
+    upload.status, upload.error = "failed", error
+    upload.save(update_fields=["status", "error", "updated_at"])
+    if os.path.exists(part_path(upload)):
+        os.remove(part_path(upload))
+    return upload
+
+
+def _delete_unreferenced(storage, names):
+    """Delete stored files (or thumbnails) no document points at any more."""
+    for field, name in names:
+        if name and not ApplicationDocument.objects.filter(**{field: name}).exists():
+            storage.delete(name)
+
+
+def store_upload(upload):
+    """Store a completed upload as its application's document (worker side)."""
+    if upload.status != "processing":
+        return upload
+    try:
+        upload, document = _store(upload)
+    except Exception:
+        logger.exception("Storing upload %s failed", upload.upload_id)
+        return _fail(upload, "Processing failed; upload the file again.")
+    if document is not None:
+        try:
+            process_document(document)
+        except Exception:
+            # The file is stored and the upload complete; only meta and thumbnail are missing.
+            logger.exception("Extracting meta for document %s failed", document.pk)
+    return upload
+
+
+def _store(upload):
+    """
+    Store the part file; returns the upload and the document still to be
+    processed (None when it adopted a processed duplicate or failed).
+    """
+    path = part_path(upload)
+    with open(path, "rb") as part:
+        digest = file_sha256(part)
+    if upload.sha256 and upload.sha256 != digest:
+        return _fail(upload, "Checksum mismatch: the file was corrupted in transit."), None
+    duplicate = _duplicate_of(digest)
+    with transaction.atomic():
+        document = (
+            ApplicationDocument.objects.select_for_update()
+            .filter(application_id=upload.application_id, doc_type=upload.doc_type).first()
+            or ApplicationDocument(application_id=upload.application_id, doc_type=upload.doc_type)
+        )
+        replaced = [("file", document.file.name), ("thumbnail", document.thumbnail.name)]
+        if duplicate is not None:
+            _adopt(document, duplicate, upload.filename)
+        else:
+            with open(path, "rb") as part:
+                document.file.save(upload.filename, File(part), save=False)
+            document.thumbnail.name = ""
+            document.sha256 = digest
+        document.save()
+        upload.status, upload.document = "complete", document
+        upload.save(update_fields=["status", "document", "updated_at"])
+    os.remove(path)
+    _delete_unreferenced(document.file.storage, replaced)
+    if duplicate is None or "file" not in duplicate.meta:
+        return upload, document
+    return upload, None
+
+
+def process_document(document):
+    """Hash and deduplicate a stored document, then extract its meta and thumbnail."""
+    filename = os.path.basename(document.file.name)
+    if not document.sha256:
+        with document.file.open("rb") as stored:
+            digest = file_sha256(stored)
+        duplicate = _duplicate_of(digest, exclude_pk=document.pk)
+        if duplicate is not None and duplicate.file.name != document.file.name:
+            own_name = document.file.name
+            _adopt(document, duplicate, filename)
+            document.save(update_fields=["file", "thumbnail", "sha256", "meta", "updated_at"])
+            _delete_unreferenced(document.file.storage, [("file", own_name)])
+            if "file" in duplicate.meta:
+                return document
+        document.sha256 = digest
+
+    info = {
+        "name": filename,
+        "size": document.file.size,
+        "content_type": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+    }
+    edge = _setting("ADMISSIONS_THUMBNAIL_SIZE", 256)
+    document.thumbnail.name = ""
+    try:
+        with document.file.open("rb") as stored, Image.open(stored) as image:
+            info.update(format=image.format, width=image.width, height=image.height, mode=image.mode)
+            # Decode large JPEGs at a reduced scale instead of full size.
+            image.draft("RGB", (edge, edge))
+            image.thumbnail((edge, edge))
+            thumb = BytesIO()
+            image.convert("RGB").save(thumb, "JPEG", quality=80)
+        document.thumbnail.save(f"{os.path.splitext(filename)[0]}.jpg", ContentFile(thumb.getvalue()), save=False)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        # Not an image Pillow can read (PDF scans and the like): no thumbnail.
+        logger.debug("No thumbnail for document %s (%s)", document.pk, filename)
+    document.meta = {**document.meta, "file": info}
+    document.save(update_fields=["file", "thumbnail", "sha256", "meta", "updated_at"])
+    return document
+
+
+def purge_stale_uploads(hours=None):
+    """
+    Fail uploads untouched for ``hours`` (abandoned by the client, or stuck in
+    processing after a lost task) and delete their part files.
+    """
+    hours = hours or _setting("ADMISSIONS_UPLOAD_EXPIRY_HOURS", 48)
+    stale = DocumentUpload.objects.filter(
+        status__in=("uploading", "processing"), updated_at__lt=timezone.now() - timedelta(hours=hours)
+    )
+    purged = 0
+    for upload in stale.iterator():
+        _fail(upload, "Upload abandoned." if upload.status == "uploading" else "Processing never finished.")
+        purged += 1
+    return purged
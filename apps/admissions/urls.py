@@ -6,6 +6,7 @@ from .views import (
     IntakeViewSet,
     ApplicationViewSet,
     ApplicationDocumentViewSet,
+    DocumentUploadViewSet,
     ApplicationReviewViewSet,
     OfferViewSet,
     AdmissionDecisionViewSet
@@ -16,6 +17,7 @@ router.register(r'academic-years', AcademicYearViewSet)
 router.register(r'intakes', IntakeViewSet)
 router.register(r'applications', ApplicationViewSet)
 router.register(r'documents', ApplicationDocumentViewSet)
+router.register(r'uploads', DocumentUploadViewSet)
 router.register(r'reviews', ApplicationReviewViewSet)
 router.register(r'offers', OfferViewSet)
 router.register(r'decisions', AdmissionDecisionViewSet)
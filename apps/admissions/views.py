@@ -1,23 +1,38 @@
 import logging
-from rest_framework import viewsets, status, filters, permissions
+from rest_framework import viewsets, mixins, status, filters, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.utils import timezone
-from .models import AcademicYear, Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision
+from django.utils.dateparse import parse_date
+from .models import (
+    AcademicYear, Intake, Application, ApplicationDocument, ApplicationReview, Offer, AdmissionDecision, DocumentUpload,
+)
 from .serializers import (
     AcademicYearSerializer, IntakeSerializer, ApplicationSerializer, ApplicationDocumentSerializer,
-    ApplicationReviewSerializer, SubmitApplicationSerializer, IssueOfferSerializer,
+    ApplicationReviewSerializer, ApplicationReviewListSerializer, BatchReviewSerializer, CompactApplicationSerializer,
+    ReviewQueueSerializer, DecideIntakeSerializer, DocumentUploadSerializer, UploadChunkSerializer, SubmitApplicationSerializer, IssueOfferSerializer,
     OfferSerializer, AcceptOfferSerializer, DeclineOfferSerializer, AdmissionDecisionSerializer
 )
 from .permissions import IsAdmissionsStaff, IsApplicantOrAdmissionsStaff
 from .filters import ApplicationFilter
+from .funnel import funnel, funnel_history
+from . import reviews
+from .decisions import decide_intake
+from . import uploads
+from apps.users.roles import user_in_groups
+from apps.core.pagination import LookupPagination
+from apps.core.expansion import ExpandMixin
 
 logger = logging.getLogger(__name__)
 
 class AcademicYearViewSet(viewsets.ModelViewSet):
     queryset = AcademicYear.objects.all()
     serializer_class = AcademicYearSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated, IsAdmissionsStaff]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["year"]
@@ -26,6 +41,7 @@ class AcademicYearViewSet(viewsets.ModelViewSet):
 class IntakeViewSet(viewsets.ModelViewSet):
     queryset = Intake.objects.select_related("academic_year").all()
     serializer_class = IntakeSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated, IsAdmissionsStaff]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["academic_year__year", "is_open"]
@@ -49,13 +65,13 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         qs = super().get_queryset()
         user = self.request.user
         logger.debug(f"ApplicationViewSet.get_queryset for user: {user}")
-        if user.groups.filter(name='Admissions').exists():
+        if user_in_groups(user, 'Admissions'):
             return qs
         return qs.filter(applicant=user)
 
     def perform_create(self, serializer):
         logger.debug(f"ApplicationViewSet.perform_create for user: {self.request.user}")
-        if not self.request.user.groups.filter(name='Admissions').exists():
+        if not user_in_groups(self.request.user, 'Admissions'):
             serializer.save(applicant=self.request.user)
         else:
             serializer.save()
@@ -73,10 +89,11 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         app = self.get_object()
         ser = IssueOfferSerializer(data=request.data, context={"request": request, "application": app})
         ser.is_valid(raise_exception=True)
-        offer = ser.save()
-        # Explicitly set the application status to 'offer_made'
-        app.status = 'offer_made'
-        app.save()
+        with transaction.atomic():
+            offer = ser.save()
+            # Explicitly set the application status to 'offer_made'
+            app.status = 'offer_made'
+            app.save()
         return Response(OfferSerializer(offer).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["post"], url_path="accept-offer", permission_classes=[permissions.IsAuthenticated, IsApplicantOrAdmissionsStaff])
@@ -95,30 +112,162 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         offer = ser.save()
         return Response(OfferSerializer(offer).data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated, IsAdmissionsStaff])
+    def funnel(self, request):
+        """Live application counts per status; ``?intake=``, ``?program=``, ``?academic_year=``."""
+        ids = {}
+        for name in ("intake", "program"):
+            value = request.query_params.get(name)
+            if value is not None and not value.isdigit():
+                return Response({"detail": f"{name} must be an id."}, status=status.HTTP_400_BAD_REQUEST)
+            ids[name] = int(value) if value else None
+        return Response(funnel(ids["intake"], ids["program"], request.query_params.get("academic_year")))
+
+    @action(detail=False, methods=["get"], url_path="funnel-history", permission_classes=[permissions.IsAuthenticated, IsAdmissionsStaff])
+    def funnel_history(self, request):
+        """Daily funnel snapshots of one ``?intake=`` (``?program=``, ``?since=``, ``?until=``)."""
+        intake, program = request.query_params.get("intake"), request.query_params.get("program")
+        if not intake or not intake.isdigit() or (program is not None and not program.isdigit()):
+            return Response({"detail": "intake (and program, if given) must be an id."}, status=status.HTTP_400_BAD_REQUEST)
+        days = {}
+        for name in ("since", "until"):
+            value = request.query_params.get(name)
+            try:
+                days[name] = parse_date(value) if value else None
+            except ValueError:
+                # Well-formed but not a real date, e.g. 2024-13-45.
+                days[name] = None
+            if value and days[name] is None:
+                return Response({"detail": f"{name} must be a date (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(funnel_history(int(intake), int(program) if program else None, days["since"], days["until"]))
+
 class ApplicationDocumentViewSet(viewsets.ModelViewSet):
     queryset = ApplicationDocument.objects.select_related("application").all()
     serializer_class = ApplicationDocumentSerializer
     permission_classes = [permissions.IsAuthenticated, IsApplicantOrAdmissionsStaff]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["application", "doc_type"]
-    ordering = ["-uploaded_at"]
+    ordering = ["-created_at"]
 
     def get_queryset(self):
         qs = super().get_queryset()
         user = self.request.user
         logger.debug(f"ApplicationDocumentViewSet.get_queryset for user: {user}")
-        if user.groups.filter(name='Admissions').exists():
+        if user_in_groups(user, 'Admissions'):
             return qs
         return qs.filter(application__applicant=user)
 
-class ApplicationReviewViewSet(viewsets.ModelViewSet):
-    queryset = ApplicationReview.objects.select_related("application", "reviewer").all()
+    def _process(self, document):
+        from .tasks import process_application_document
+
+        transaction.on_commit(lambda: process_application_document.delay(document.pk))
+
+    def perform_create(self, serializer):
+        self._process(serializer.save())
+
+    def perform_update(self, serializer):
+        if "file" in serializer.validated_data:
+            self._process(serializer.save(sha256=""))
+        else:
+            serializer.save()
+
+class DocumentUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Chunked, resumable document uploads. POST the file's name and size, then
+    each chunk to ``chunk/`` at the offset in ``received`` (GET the upload to
+    resume), then POST ``complete/``; a worker stores and processes the file.
+    """
+    queryset = DocumentUpload.objects.select_related("application").all()
+    serializer_class = DocumentUploadSerializer
+    permission_classes = [permissions.IsAuthenticated, IsApplicantOrAdmissionsStaff]
+    lookup_field = "upload_id"
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if user_in_groups(self.request.user, 'Admissions'):
+            return qs
+        return qs.filter(application__applicant=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        application = data["application"]
+        if application.applicant_id != request.user.pk and not user_in_groups(request.user, 'Admissions'):
+            raise PermissionDenied("You can only upload documents to your own applications.")
+        try:
+            upload = uploads.start_upload(
+                application, data["doc_type"], data["filename"], data["size"], data.get("sha256", ""), request.user
+            )
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"], parser_classes=[MultiPartParser, FormParser])
+    def chunk(self, request, upload_id=None):
+        """Append one chunk; a wrong offset answers 409 with the offset to resume from."""
+        upload = self.get_object()
+        ser = UploadChunkSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        try:
+            upload = uploads.append_chunk(upload, ser.validated_data["offset"], ser.validated_data["chunk"])
+        except uploads.UploadError as exc:
+            upload.refresh_from_db()
+            return Response({"detail": str(exc), "received": upload.received}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, upload_id=None):
+        """Hand the received file to a worker for storage, deduplication and thumbnails."""
+        from .tasks import store_document_upload
+
+        upload = self.get_object()
+        try:
+            with transaction.atomic():
+                upload = uploads.complete_upload(upload)
+                transaction.on_commit(lambda: store_document_upload.delay(upload.pk))
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_202_ACCEPTED)
+
+class ApplicationReviewViewSet(ExpandMixin, viewsets.ModelViewSet):
+    queryset = ApplicationReview.objects.all()
     serializer_class = ApplicationReviewSerializer
+    list_serializer_class = ApplicationReviewListSerializer
+    detail_select_related = ("application__applicant", "application__program", "application__intake__academic_year", "reviewer")
     permission_classes = [permissions.IsAuthenticated, IsAdmissionsStaff]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["application", "decision"]
     ordering = ["-created_at"]
 
+    def perform_create(self, serializer):
+        if "reviewer" in serializer.validated_data:
+            serializer.save()
+        else:
+            serializer.save(reviewer=self.request.user)
+
+    @action(detail=False, methods=["post"])
+    def queue(self, request):
+        """Claim the next ``size`` applications awaiting this reviewer's review."""
+        ser = ReviewQueueSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        claimed = reviews.claim_applications(request.user, ser.validated_data["size"])
+        return Response({"count": len(claimed), "results": CompactApplicationSerializer(claimed, many=True).data})
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """Record many reviews by the requesting user; all succeed or none do."""
+        ser = BatchReviewSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        try:
+            created = reviews.submit_reviews(request.user, ser.validated_data["reviews"])
+        except reviews.ReviewError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            {"created": len(created), "results": ApplicationReviewListSerializer(created, many=True).data},
+            status=status.HTTP_201_CREATED,
+        )
+
 class AdmissionDecisionViewSet(viewsets.ModelViewSet):
     queryset = AdmissionDecision.objects.select_related("application", "decided_by").all()
     serializer_class = AdmissionDecisionSerializer
@@ -130,6 +279,16 @@ class AdmissionDecisionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(decided_by=self.request.user)
 
+    @action(detail=False, methods=["post"])
+    def decide(self, request):
+        """Rank and decide one intake and program from review scores; ``dry_run`` only ranks."""
+        ser = DecideIntakeSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = dict(ser.validated_data)
+        intake, program, capacity = data.pop("intake"), data.pop("program"), data.pop("capacity")
+        result = decide_intake(intake, program, capacity, decided_by=request.user, **data)
+        return Response(result, status=status.HTTP_200_OK if result["dry_run"] else status.HTTP_201_CREATED)
+
 class OfferViewSet(viewsets.ModelViewSet):
     queryset = Offer.objects.select_related("application", "offered_by").all()
     serializer_class = OfferSerializer
@@ -142,6 +301,6 @@ class OfferViewSet(viewsets.ModelViewSet):
         qs = super().get_queryset()
         user = self.request.user
         logger.debug(f"OfferViewSet.get_queryset for user: {user}")
-        if user.groups.filter(name='Admissions').exists():
+        if user_in_groups(user, 'Admissions'):
             return qs
         return qs.filter(application__applicant=user)
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Buffered audit writer.
+
+`record` puts an audit row on an in-process bounded queue once the caller's
+transaction commits (rows of rolled-back work are never written); a daemon
+thread drains the queue and writes rows with one ``bulk_create`` per
+model when a batch fills up (``AUDIT_BATCH_SIZE``) or the oldest queued row
+is ``AUDIT_FLUSH_INTERVAL`` seconds old. Request handlers therefore pay for a
+queue append, not a database round trip.
+
+Backpressure: the queue holds at most ``AUDIT_QUEUE_SIZE`` rows. When it is
+full, or when a flush fails, rows are appended as JSON lines to a per-process
+file in ``AUDIT_SPILL_DIR`` instead of being dropped or blocking the caller.
+`replay_spill` (``manage.py replay_audit_spill``) loads them back. Set
+``AUDIT_ASYNC = False`` to write synchronously.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SPILL_SUFFIX = ".jsonl"
+REPLAY_SUFFIX = ".jsonl.replay"
+_STOP = object()
+
+
+class AuditWriter:
+    def __init__(self, queue_size=None, batch_size=None, flush_interval=None, spill_dir=None):
+        self.queue_size = queue_size or getattr(settings, "AUDIT_QUEUE_SIZE", 10000)
+        self.batch_size = batch_size or getattr(settings, "AUDIT_BATCH_SIZE", 500)
+        self.flush_interval = flush_interval or getattr(settings, "AUDIT_FLUSH_INTERVAL", 2.0)
+        self.spill_dir = str(spill_dir or getattr(settings, "AUDIT_SPILL_DIR", "audit-spill"))
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def emit(self, model_label, fields, start=True):
+        """Queue one row; spills to disk instead of blocking when the queue is full."""
+        try:
+            self._queue.put_nowait((model_label, fields))
+        except queue.Full:
+            self.spill([(model_label, fields)])
+            return
+        if start:
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Also restarts the worker in a child after a pre-fork server forks.
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                event = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if event is _STOP:
+                return
+            batch = [event]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    self.write(batch)
+                    return
+                batch.append(event)
+            self.write(batch)
+            close_old_connections()
+
+    def close(self, timeout=10):
+        """Stop the worker after it writes its current batch, then flush the rest."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+        self.flush()
+
+    def flush(self):
+        """Write everything queued right now from the calling thread."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is not _STOP:
+                    batch.append(event)
+            if not batch:
+                return
+            self.write(batch)
+
+    def write(self, events):
+        grouped = {}
+        for label, fields in events:
+            grouped.setdefault(label, []).append(fields)
+        for label, rows in grouped.items():
+            model = apps.get_model(label)
+            try:
+                model.objects.bulk_create([model(**fields) for fields in rows], batch_size=self.batch_size)
+            except Exception:
+                logger.exception("Audit flush of %s %s rows failed, spilling to disk", len(rows), label)
+                self.spill([(label, fields) for fields in rows], sync=True)
+
+    def spill(self, events, sync=False):
+        """Append rows to this process's spill file; ``sync`` also fsyncs it."""
+        path = os.path.join(self.spill_dir, f"audit-{os.getpid()}{SPILL_SUFFIX}")
+        lines = "".join(
+            json.dumps({"model": label, "fields": fields}, cls=DjangoJSONEncoder) + "\n" for label, fields in events
+        )
+        try:
+            with self._spill_lock:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as handle:
+                    handle.write(lines)
+                    handle.flush()
+                    if sync:
+                        os.fsync(handle.fileno())
+        except OSError:
+            logger.exception("Could not spill %s audit rows to %s; they are lost", len(events), path)
+
+    def replay_spill(self):
+        """Load spilled rows into the database; returns the number written."""
+        if not os.path.isdir(self.spill_dir):
+            return 0
+        # Claim files by renaming them so writers start fresh ones meanwhile.
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(SPILL_SUFFIX):
+                path = os.path.join(self.spill_dir, name)
+                os.replace(path, path[:-len(SPILL_SUFFIX)] + REPLAY_SUFFIX)
+        written = 0
+        for name in sorted(os.listdir(self.spill_dir)):
+            if not name.endswith(REPLAY_SUFFIX):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            grouped = {}
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    model = apps.get_model(event["model"])
+                    fields = {key: model._meta.get_field(key).to_python(value) for key, value in event["fields"].items()}
+                    grouped.setdefault(model, []).append(model(**fields))
+            with transaction.atomic():
+                for model, objs in grouped.items():
+                    model.objects.bulk_create(objs, batch_size=self.batch_size)
+            written += sum(len(objs) for objs in grouped.values())
+            os.remove(path)
+        return written
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+
+def record(model_label, **fields):
+    """
+    Record an audit row for ``model_label`` (e.g. ``"reporting.AuditLog"``).
+    Pass foreign keys as ``<name>_id`` so rows can be spilled as JSON; the
+    event time is captured now, not when the row is flushed. Inside a
+    transaction the row is queued on commit and dropped on rollback.
+    """
+    fields.setdefault("timestamp", timezone.now())
+    if not getattr(settings, "AUDIT_ASYNC", True):
+        # Written in the caller's transaction, so it rolls back with it.
+        apps.get_model(model_label).objects.create(**fields)
+        return
+    transaction.on_commit(lambda: get_writer().emit(model_label, fields))
@@ -0,0 +1,341 @@
+"""
+API benchmark suite (``manage.py benchmark_api``).
+
+`load` seeds a database at a named scale with ``bulk_create`` batches: the
+``full`` scale is 50k students, 500k grades and 1M audit log rows, and the
+other tables are sized relative to those. `discover_endpoints` walks
+``cerps/urls.py`` for every router's GET list/collection routes, plus detail
+routes for one row the benchmark user can see; collection routes that need
+a filter get it from `QUERY_PARAMS`. `measure` records each endpoint's query count,
+p50/p95 latency, peak Python memory (tracemalloc) and, on PostgreSQL, the
+large tables its queries scan sequentially (``EXPLAIN``). `compare` checks a
+run against the stored baseline, so an N+1, an accidental full scan or an
+endpoint that silently stopped being measured fails before deploy.
+"""
+
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.request import Request
+
+BATCH_SIZE = 5000
+FULL_SCAN_MIN_ROWS = 10000
+SKIPPED_ACTIONS = {"export"}  # streams whole tables; covered by the export tests
+
+SCALES = {
+    "smoke": {"students": 200, "grades": 2000, "audit_logs": 5000},
+    "ci": {"students": 5000, "grades": 50000, "audit_logs": 100000},
+    "full": {"students": 50000, "grades": 500000, "audit_logs": 1000000},
+}
+
+Seed = namedtuple("Seed", "name model count build after", defaults=(None,))
+Endpoint = namedtuple("Endpoint", "name path model detail view")
+
+
+def volumes(scale):
+    base = SCALES[scale]
+    students = base["students"]
+    return {
+        **base,
+        "departments": 20,
+        "programs": 60,
+        "courses": max(20, students // 100),
+        "subjects": max(100, students // 20),
+        "users": students + max(10, students // 50),
+        "invoices": students * 2,
+        "payments": students * 2,
+        "notifications": students,
+        "books": max(100, students // 10),
+        "hostels": max(1, students // 5000),
+        "applications": students,
+    }
+
+
+def _pick(pks, i):
+    return pks[i % len(pks)]
+
+
+def seed_plan():
+    """Seeds in dependency order; ``build(i, refs)`` returns one unsaved row."""
+    from apps.academic.models import Course, Grade, Program, Student, Subject
+    from apps.admissions.funnel import rebuild_counts, take_snapshot
+    from apps.admissions.models import AcademicYear as AdmissionYear, Application, Intake
+    from apps.finance.models import Invoice, Ledger, Payment
+    from apps.finance.posting import post_invoices, post_payments
+    from apps.hostel.models import Bed, Floor, Hostel, Room
+    from apps.hostel.occupancy import rebuild_availability
+    from apps.hr.models import Department
+    from apps.library.models import Book
+    from apps.notifications.models import Notification
+    from apps.reporting.models import AuditLog
+    from apps.users.models import User
+
+    today = date.today()
+    now = timezone.now()
+    statuses = [status for status, _ in Application.STATUS_CHOICES]
+
+    def refresh_funnel(applications):
+        # bulk_create skips the counter signals; rebuild them and take today's snapshot.
+        rebuild_counts()
+        take_snapshot()
+
+    return [
+        Seed("departments", Department, "departments", lambda i, r: Department(name=f"Department {i}")),
+        Seed("programs", Program, "programs", lambda i, r: Program(name=f"Program {i}", department_id=_pick(r["departments"], i))),
+        Seed("courses", Course, "courses", lambda i, r: Course(name=f"Course {i}", program_id=_pick(r["programs"], i))),
+        Seed("subjects", Subject, "subjects", lambda i, r: Subject(name=f"Subject {i}", course_id=_pick(r["courses"], i), credits=1 + i % 4)),
+        # "!" is an unusable password; no hashing.
+        Seed("users", User, "users", lambda i, r: User(
+            login_id=f"bench{i:07d}", password="!", first_name=f"First{i}", last_name=f"Last{i}",
+            email=f"bench{i}@example.com", is_student=True,
+        )),
+        Seed("students", Student, "students", lambda i, r: Student(
+            user_id=r["users"][i], admission_number=f"BEN{i:07d}", program_id=_pick(r["programs"], i),
+        )),
+        Seed("grades", Grade, "grades", lambda i, r: Grade(
+            student_id=_pick(r["students"], i), subject_id=_pick(r["subjects"], i * 7), score=float((i * 37) % 100),
+        )),
+        Seed("ledgers", Ledger, "students", lambda i, r: Ledger(student_id=r["students"][i], opening_balance_cents=0)),
+        Seed("invoices", Invoice, "invoices", lambda i, r: Invoice(
+            ledger_id=_pick(r["ledgers"], i), amount_cents=50000 + (i % 7) * 1000, due_date=today + timedelta(days=i % 90),
+        ), post_invoices),
+        Seed("payments", Payment, "payments", lambda i, r: Payment(
+            invoice_id=_pick(r["invoices"], i), amount_cents=10000 + (i % 5) * 500, payment_method="cash",
+            paid_at=now - timedelta(minutes=i),
+        ), post_payments),
+        Seed("audit_logs", AuditLog, "audit_logs", lambda i, r: AuditLog(
+            user_id=_pick(r["users"], i), module=("finance", "academic", "hostel")[i % 3], action="update",
+            object_id=str(i), object_repr=f"Object {i}", timestamp=now - timedelta(seconds=i),
+        )),
+        Seed("notifications", Notification, "notifications", lambda i, r: Notification(
+            recipient_id=_pick(r["users"], i), title=f"Notice {i}", message="Fees are due.", notif_type="EMAIL",
+        )),
+        Seed("books", Book, "books", lambda i, r: Book(isbn=f"978{i:010d}", title=f"Book {i}", author=f"Author {i % 500}")),
+        Seed("hostels", Hostel, "hostels", lambda i, r: Hostel(name=f"Hostel {i}", address="Campus", capacity=400)),
+        Seed("floors", Floor, lambda v: v["hostels"] * 4, lambda i, r: Floor(hostel_id=r["hostels"][i // 4], number=i % 4)),
+        Seed("rooms", Room, lambda v: v["hostels"] * 200, lambda i, r: Room(floor_id=r["floors"][i // 50], number=str(i % 50))),
+        Seed("beds", Bed, lambda v: v["hostels"] * 400, lambda i, r: Bed(room_id=r["rooms"][i // 2], number=str(i % 2)),
+             lambda beds: rebuild_availability()),
+        Seed("admission_years", AdmissionYear, lambda v: 1, lambda i, r: AdmissionYear(
+            year=f"{today.year}/{today.year + 1}", start_date=today, end_date=today + timedelta(days=365),
+        )),
+        Seed("intakes", Intake, lambda v: 3, lambda i, r: Intake(
+            name=f"Intake {i}", academic_year_id=r["admission_years"][0], opens_at=today - timedelta(days=30 * i),
+            closes_at=today + timedelta(days=90 - 30 * i),
+        )),
+        Seed("applications", Application, "applications", lambda i, r: Application(
+            applicant_id=_pick(r["users"], i), intake_id=_pick(r["intakes"], i), program_id=_pick(r["programs"], i * 7),
+            status=statuses[i % len(statuses)], submitted_at=None if i % len(statuses) == 0 else now - timedelta(minutes=i),
+        ), refresh_funnel),
+    ]
+
+
+def load(scale, stdout=None):
+    """Seed ``scale`` volumes; returns ``{seed name: row count}``."""
+    counts = volumes(scale)
+    refs = {}
+    loaded = {}
+    for seed in seed_plan():
+        total = seed.count(counts) if callable(seed.count) else counts[seed.count]
+        keep = []
+        started = time.perf_counter()
+        for offset in range(0, total, BATCH_SIZE):
+            rows = [seed.build(i, refs) for i in range(offset, min(offset + BATCH_SIZE, total))]
+            seed.model.objects.bulk_create(rows)
+            if seed.after:
+                seed.after(rows)
+            if seed.name != "audit_logs":  # nothing references them; don't hold 1M ids
+                keep.extend(row.pk for row in rows)
+        refs[seed.name] = keep
+        loaded[seed.name] = total
+        if stdout:
+            stdout.write(f"seeded {total} {seed.name} in {time.perf_counter() - started:.1f}s")
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return loaded
+
+
+def _route(pattern):
+    route = str(pattern.pattern)
+    return route.lstrip("^").rstrip("$")
+
+
+def discover_endpoints(patterns=None, prefix=""):
+    """GET routes of every DRF router under ``/api/``, in URLconf order."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from discover_endpoints(pattern.url_patterns, prefix + _route(pattern))
+            continue
+        if not isinstance(pattern, URLPattern):
+            continue
+        actions = getattr(pattern.callback, "actions", None) or {}
+        view_class = getattr(pattern.callback, "cls", None)
+        path = "/" + prefix + _route(pattern)
+        action = actions.get("get")
+        if not action or action in SKIPPED_ACTIONS or not path.startswith("/api/") or "(?P<format>" in path:
+            continue
+        queryset = getattr(view_class, "queryset", None)
+        model = queryset.model if queryset is not None else None
+        if "(?P<" not in path:
+            yield Endpoint(pattern.name, path, model, False, view_class)
+        elif action == "retrieve" and path.count("(?P<") == 1 and model is not None:
+            yield Endpoint(pattern.name, path, model, True, view_class)
+
+
+def _first_intake():
+    from apps.admissions.models import Intake
+
+    pk = Intake.objects.order_by("pk").values_list("pk", flat=True).first()
+    return None if pk is None else {"intake": pk}
+
+
+# Collection routes that answer 400 without a filter, by URL name.
+QUERY_PARAMS = {
+    "application-funnel-history": _first_intake,
+}
+
+
+def _lookup_value(endpoint, user):
+    """The lookup value of the first row ``user`` can retrieve, going through the view's queryset."""
+    view = endpoint.view()
+    view.request = Request(RequestFactory().get(endpoint.path))
+    view.request.user = user
+    view.args, view.kwargs, view.format_kwarg, view.action = (), {}, None, "retrieve"
+    return view.get_queryset().order_by("pk").values_list(getattr(view, "lookup_field", "pk"), flat=True).first()
+
+
+def endpoint_url(endpoint, user):
+    """The URL to request as ``user``, or None when there is nothing to request."""
+    if not endpoint.detail:
+        if endpoint.name not in QUERY_PARAMS:
+            return endpoint.path
+        params = QUERY_PARAMS[endpoint.name]()
+        return None if params is None else f"{endpoint.path}?{urlencode(params)}"
+    value = _lookup_value(endpoint, user)
+    if value is None:
+        return None
+    start = endpoint.path.index("(?P<")
+    return endpoint.path[:start] + str(value) + endpoint.path[endpoint.path.index(")", start) + 1:]
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` that keeps the raw SQL and params."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params, many))
+        return execute(sql, params, many, context)
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def full_scans(queries, min_rows=FULL_SCAN_MIN_ROWS):
+    """Tables of at least ``min_rows`` rows that ``queries`` read with a Seq Scan (PostgreSQL)."""
+    if connection.vendor != "postgresql":
+        return []
+    relations = set()
+    with connection.cursor() as cursor:
+        for sql, params, many in queries:
+            if many or not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            relations.update(
+                node["Relation Name"] for node in _plan_nodes(plan[0]["Plan"])
+                if node.get("Node Type") == "Seq Scan" and node.get("Relation Name")
+            )
+        if not relations:
+            return []
+        cursor.execute("SELECT relname FROM pg_class WHERE relname = ANY(%s) AND reltuples >= %s", [list(relations), min_rows])
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def measure(client, url, repeat=20):
+    """Query count, latency percentiles over ``repeat`` (>= 1) requests, peak memory and full scans of one GET endpoint."""
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        response = _get(client, url)
+    timings = []
+    # Collector pauses land on random requests and swamp a 20-sample p95.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            _get(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    try:
+        _get(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    p95 = statistics.quantiles(timings, n=20, method="inclusive")[18] if len(timings) > 1 else timings[0]
+    return {
+        "status": response.status_code,
+        "queries": len(recorder.queries),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(p95, 2),
+        "peak_kb": round(peak / 1024, 1),
+        "full_scans": full_scans(recorder.queries),
+    }
+
+
+def compare(results, baseline, tolerance=0.5, slack_ms=5.0, slack_kb=256.0):
+    """
+    Regressions of ``results`` against ``baseline`` (both ``{path: metrics}``).
+    A baseline endpoint missing from ``results`` (removed, or no longer
+    requested because its seed or lookup found nothing), more queries, a
+    newly failing status or a new full scan always count; p50 latency and
+    memory count past ``tolerance`` (a fraction) plus slack, and p95, being
+    noisier, past twice that.
+    """
+    regressions = [f"{path}: not measured (in the baseline)" for path in sorted(set(baseline) - set(results))]
+    for path, current in results.items():
+        base = baseline.get(path)
+        if base is None:
+            continue
+        if current["status"] >= 400 > base["status"]:
+            regressions.append(f"{path}: status {current['status']} (was {base['status']})")
+        if current["queries"] > base["queries"]:
+            regressions.append(f"{path}: {current['queries']} queries (was {base['queries']})")
+        if current["p50_ms"] > base["p50_ms"] * (1 + tolerance) + slack_ms:
+            regressions.append(f"{path}: p50 {current['p50_ms']}ms (was {base['p50_ms']}ms)")
+        if current["p95_ms"] > base["p95_ms"] * (1 + 2 * tolerance) + 2 * slack_ms:
+            regressions.append(f"{path}: p95 {current['p95_ms']}ms (was {base['p95_ms']}ms)")
+        if current["peak_kb"] > base["peak_kb"] * (1 + tolerance) + slack_kb:
+            regressions.append(f"{path}: peak {current['peak_kb']}KiB (was {base['peak_kb']}KiB)")
+        new_scans = sorted(set(current["full_scans"]) - set(base.get("full_scans", ())))
+        if new_scans:
+            regressions.append(f"{path}: new full scans of {', '.join(new_scans)}")
+    return regressions
@@ -0,0 +1,20 @@
+"""
+Whether the default cache is shared between processes.
+
+``CACHES["default"]`` is Redis when ``REDIS_CACHE_URL`` is set and a
+per-process ``LocMemCache`` otherwise (see cerps.settings). State another
+process must see, such as counters read by the web process or deletes that
+revoke something, only belongs in the cache when it is shared.
+"""
+
+from django.conf import settings
+
+PROCESS_LOCAL_BACKENDS = frozenset({
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+})
+
+
+def cache_is_shared(alias="default"):
+    """True unless ``alias`` is a per-process (or dummy) cache backend."""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,74 @@
+"""
+Query-shape-aware list endpoints.
+
+List responses use a flat ``list_serializer_class`` (foreign keys as ids)
+that needs no joins. ``?expand=invoice,ledger`` nests the named relations;
+each expandable relation carries the ``select_related`` path (or tuple of
+paths) its nested serializer reads, so an expanded page is still one query. Detail actions
+keep the full nested serializer and join ``detail_select_related``.
+
+    class PaymentListSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+        expandable = {"invoice": (InvoiceSerializer, "invoice__ledger__student__user")}
+"""
+
+from rest_framework.exceptions import ValidationError
+
+
+class ExpandableSerializerMixin:
+    """Adds the nested serializers named in ``context["expand"]``."""
+    expandable = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.context.get("expand", ()):
+            serializer_class, _ = self.expandable[name]
+            self.fields[name] = serializer_class(read_only=True)
+
+
+class ExpandMixin:
+    """
+    Viewset side of `ExpandableSerializerMixin`: picks the list serializer,
+    validates ``?expand=`` and applies the matching ``select_related``.
+    """
+    list_serializer_class = None
+    detail_select_related = ()
+    expand_query_param = "expand"
+
+    def _is_flat_list(self):
+        return self.action == "list" and self.list_serializer_class is not None
+
+    def get_expand(self):
+        if not self._is_flat_list():
+            return []
+        if not hasattr(self, "_expand"):
+            raw = self.request.query_params.get(self.expand_query_param, "")
+            names = list(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+            allowed = self.list_serializer_class.expandable
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                raise ValidationError({
+                    self.expand_query_param: f"Cannot expand {', '.join(unknown)}; choose from {', '.join(allowed) or 'nothing'}."
+                })
+            self._expand = names
+        return self._expand
+
+    def get_serializer_class(self):
+        if self._is_flat_list():
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self._is_flat_list():
+            paths = []
+            for name in self.get_expand():
+                related = self.list_serializer_class.expandable[name][1]
+                paths.extend((related,) if isinstance(related, str) else related)
+        else:
+            paths = self.detail_select_related
+        return queryset.select_related(*paths) if paths else queryset
@@ -0,0 +1,216 @@
+"""
+Streaming table exports.
+
+Rows are read with ``QuerySet.values_list(...).iterator(chunk_size=...)``,
+which uses a server-side cursor on PostgreSQL, and are encoded one chunk at a
+time into a `StreamingHttpResponse`. Memory stays flat regardless of table
+size and the first bytes go out as soon as the first chunk is read.
+
+CSV is always available. Parquet and Arrow IPC need the optional ``pyarrow``
+package; without it those formats are rejected with a 400.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+EXPORT_CHUNK_SIZE = 5000
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+
+class ExportError(Exception):
+    """Raised for an unknown or unavailable export format."""
+
+
+def resolve_field(model, path):
+    """Return the model field at the end of a ``related__field`` path."""
+    field = None
+    for part in path.split("__"):
+        field = model._meta.get_field(part)
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    if field.is_relation:
+        field = field.target_field
+    return field
+
+
+class _Echo:
+    """Write-through pseudo-buffer for `csv.writer`."""
+
+    def write(self, value):
+        return value
+
+
+class _ChunkSink(io.RawIOBase):
+    """Non-seekable sink that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _arrow_type(field):
+    internal = field.get_internal_type()
+    if internal in ("AutoField", "BigAutoField", "SmallAutoField", "IntegerField", "BigIntegerField",
+                    "SmallIntegerField", "PositiveIntegerField", "PositiveBigIntegerField",
+                    "PositiveSmallIntegerField"):
+        return pyarrow.int64()
+    if internal == "FloatField":
+        return pyarrow.float64()
+    if internal == "DecimalField":
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    if internal == "BooleanField":
+        return pyarrow.bool_()
+    if internal == "DateTimeField":
+        return pyarrow.timestamp("us", tz="UTC")
+    if internal == "DateField":
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def arrow_schema(model, columns):
+    return pyarrow.schema([(name, _arrow_type(resolve_field(model, name))) for name in columns])
+
+
+def _record_batch(chunk, schema):
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in chunk]
+        if pyarrow.types.is_string(field.type):
+            values = [
+                None if v is None else json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+                for v in values
+            ]
+        elif pyarrow.types.is_decimal(field.type):
+            values = [None if v is None else decimal.Decimal(v) for v in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_columnar(rows, schema, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encode rows as Parquet (one row group per chunk) or an Arrow IPC stream."""
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        write = lambda batch: writer.write_table(pyarrow.Table.from_batches([batch]))
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    for chunk in _chunked(rows, chunk_size):
+        write(_record_batch(chunk, schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def export_response(queryset, columns, fmt, basename, chunk_size=EXPORT_CHUNK_SIZE):
+    """Build a streaming response exporting ``columns`` of ``queryset``."""
+    fmt = (fmt or "csv").lower()
+    if fmt not in FORMATS:
+        raise ExportError(f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    if fmt in COLUMNAR_FORMATS and pyarrow is None:
+        raise ExportError(f"The '{fmt}' format requires the pyarrow package.")
+
+    rows = queryset.order_by("pk").values_list(*columns).iterator(chunk_size=chunk_size)
+    if fmt == "csv":
+        content = iter_csv(rows, columns)
+    else:
+        content = iter_columnar(rows, arrow_schema(queryset.model, columns), fmt, chunk_size)
+
+    content_type, extension = FORMATS[fmt]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f"{basename}-{timezone.localdate():%Y%m%d}.{extension}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ExportMixin:
+    """
+    Adds ``GET <list-url>/export/?export_format=csv|parquet|arrow`` to a
+    viewset. The view's filters apply; ``export_fields`` lists the columns
+    (``related__field`` paths allowed) and defaults to the concrete fields.
+    """
+    export_fields = None
+    export_basename = None
+
+    def get_export_fields(self):
+        if self.export_fields:
+            return list(self.export_fields)
+        model = self.get_queryset().model
+        return [f.attname for f in model._meta.concrete_fields]
+
+    @action(detail=False, methods=["get"], url_path="export", pagination_class=None)
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        basename = self.export_basename or queryset.model._meta.model_name
+        try:
+            return export_response(
+                queryset, self.get_export_fields(), request.query_params.get("export_format"), basename
+            )
+        except ExportError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
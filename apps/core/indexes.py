@@ -0,0 +1,223 @@
+"""
+Index advice (``manage.py index_report``).
+
+`access_patterns` derives the queries the API actually runs from each list
+viewset's declarations: no filter, every ``filterset_fields`` / FilterSet
+filter alone and all of them together, each combined with the default
+``ordering`` and every explicit ``ordering_fields`` entry. `missing_indexes`
+runs those list requests against the current database, each inside a
+transaction that is rolled back, and ``EXPLAIN``s the SQL they issue: a
+sequential scan or a sort of a large table means no index serves that
+filter/order pair. `unused_indexes` lists the non-unique indexes
+``pg_stat_user_indexes`` has never seen scanned since its statistics were
+last reset (PostgreSQL only).
+"""
+
+import json
+import re
+import warnings
+from collections import namedtuple
+from datetime import date, datetime
+
+from django.core.exceptions import FieldError
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection, transaction
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .benchmark import QueryRecorder
+
+MIN_ROWS = 1000
+
+Pattern = namedtuple("Pattern", "path view_class params")
+Finding = namedtuple("Finding", "table kind path params")
+
+
+def list_views(patterns=None, prefix=""):
+    """``(path, view_class)`` for every router list route under ``/api/``."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = str(pattern.pattern).lstrip("^").rstrip("$")
+        if isinstance(pattern, URLResolver):
+            yield from list_views(pattern.url_patterns, prefix + route)
+        elif isinstance(pattern, URLPattern):
+            actions = getattr(pattern.callback, "actions", None) or {}
+            path = "/" + prefix + route
+            if actions.get("get") == "list" and path.startswith("/api/") and "(?P<" not in path:
+                yield path, pattern.callback.cls
+
+
+def _filters(view_class):
+    """``{query_param: (field_path, lookup_expr)}`` for the view's filters."""
+    filterset_class = getattr(view_class, "filterset_class", None)
+    if filterset_class is not None:
+        return {name: (f.field_name, f.lookup_expr) for name, f in filterset_class.base_filters.items()}
+    return {name: (name, "exact") for name in getattr(view_class, "filterset_fields", None) or ()}
+
+
+def _sample(model, field_path, lookup_expr):
+    """A query-string value for the filter taken from an existing row, or None."""
+    if lookup_expr == "isnull":
+        return "true"
+    try:
+        value = (
+            model._default_manager.exclude(**{f"{field_path}__isnull": True})
+            .order_by().values_list(field_path, flat=True).first()
+        )
+    except FieldError:
+        # Not a model field; the request fails the same way and is reported.
+        return None
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def access_patterns(views=None):
+    """The list requests each viewset's filter and ordering declarations allow."""
+    for path, view_class in views if views is not None else list_views():
+        queryset = getattr(view_class, "queryset", None)
+        if queryset is None:
+            continue
+        samples = {}
+        for name, (field_path, lookup_expr) in _filters(view_class).items():
+            value = _sample(queryset.model, field_path, lookup_expr)
+            if value is not None:
+                samples[name] = value
+        filter_sets = [{}] + [{name: value} for name, value in samples.items()]
+        if len(samples) > 1:
+            filter_sets.append(dict(samples))
+        ordering_fields = getattr(view_class, "ordering_fields", None)
+        orderings = [None] + (list(ordering_fields) if isinstance(ordering_fields, (list, tuple)) else [])
+        for params in filter_sets:
+            for ordering in orderings:
+                yield Pattern(path, view_class, dict(params, ordering=ordering) if ordering else params)
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def _relation(node):
+    return next((n["Relation Name"] for n in _plan_nodes(node) if n.get("Relation Name")), None)
+
+
+def explain(sql, params):
+    """
+    ``[(kind, table, rows)]`` for the sequential scans and sorts in the query's
+    plan; ``rows`` is the planner's estimate of the rows sorted, when known.
+    """
+    found = []
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            for node in _plan_nodes(plan[0]["Plan"]):
+                if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+                    found.append(("seq scan", node["Relation Name"], None))
+                elif node.get("Node Type") in ("Sort", "Incremental Sort") and _relation(node):
+                    found.append(("sort", _relation(node), node["Plans"][0]["Plan Rows"]))
+        elif connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            base = re.search(r'\bFROM "([^"]+)"', sql)
+            for row in cursor.fetchall():
+                words = row[-1].split()
+                if words[0] == "SCAN" and len(words) > 1 and "USING" not in words:
+                    found.append(("seq scan", words[1], None))
+                elif row[-1].startswith("USE TEMP B-TREE FOR") and "ORDER BY" in row[-1] and base:
+                    found.append(("sort", base.group(1), None))
+    return found
+
+
+def table_rows(tables):
+    """Estimated row counts (``pg_class.reltuples`` on PostgreSQL, exact elsewhere)."""
+    rows = {}
+    tables = set(tables) & set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql" and tables:
+            cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)", [list(tables)])
+            rows = {name: int(count) for name, count in cursor.fetchall() if count >= 0}
+        for table in tables - set(rows):
+            # Never analyzed (or not PostgreSQL): count.
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+            rows[table] = cursor.fetchone()[0]
+    return rows
+
+
+def run_pattern(pattern, user):
+    """The SELECTs a list request issues; its writes (if any) are rolled back."""
+    request = APIRequestFactory().get(pattern.path, pattern.params)
+    force_authenticate(request, user)
+    recorder = QueryRecorder()
+    with transaction.atomic(), warnings.catch_warnings():
+        warnings.simplefilter("ignore", UnorderedObjectListWarning)
+        with connection.execute_wrapper(recorder):
+            response = pattern.view_class.as_view({"get": "list"})(request)
+        transaction.set_rollback(True)
+    selects = [(sql, params) for sql, params, many in recorder.queries if not many and sql.lstrip().upper().startswith("SELECT")]
+    return response.status_code, selects
+
+
+def missing_indexes(user, patterns=None, min_rows=MIN_ROWS):
+    """
+    Run every access pattern as ``user`` and return ``(findings, failures)``:
+    a `Finding` per large table scanned or sorted, and ``(pattern, error)``
+    for the requests that did not return 200.
+    """
+    findings, failures, seen = [], [], set()
+    for pattern in patterns if patterns is not None else access_patterns():
+        try:
+            status, queries = run_pattern(pattern, user)
+        except Exception as exc:
+            failures.append((pattern, f"{type(exc).__name__}: {exc}"))
+            continue
+        if status != 200:
+            failures.append((pattern, f"HTTP {status}"))
+            continue
+        for sql, params in queries:
+            for kind, table, rows in explain(sql, params):
+                key = (kind, table, pattern.path, tuple(pattern.params.items()))
+                if key not in seen:
+                    seen.add(key)
+                    findings.append((Finding(table, kind, pattern.path, pattern.params), rows))
+    sizes = table_rows({finding.table for finding, _ in findings})
+    return [
+        finding for finding, rows in findings
+        if (rows if rows is not None else sizes.get(finding.table, 0)) >= min_rows
+    ], failures
+
+
+def unused_indexes():
+    """
+    ``(table, index, size_bytes)`` for the project's non-unique indexes with no
+    scans recorded, largest first, and when the statistics were last reset.
+    """
+    if connection.vendor != "postgresql":
+        return [], None
+    tables = connection.introspection.django_table_names(only_existing=True, include_views=False)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT s.relname, s.indexrelname, pg_relation_size(s.indexrelid)
+            FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid
+            WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+              AND (s.relname = ANY(%s) OR s.relid IN (
+                  -- partitions of the project's partitioned tables
+                  SELECT inh.inhrelid FROM pg_inherits inh JOIN pg_class parent ON parent.oid = inh.inhparent
+                  WHERE parent.relname = ANY(%s)
+              ))
+            ORDER BY 3 DESC, 1, 2
+            """,
+            [tables, tables],
+        )
+        unused = cursor.fetchall()
+        cursor.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+        stats_reset = cursor.fetchone()[0]
+    return unused, stats_reset
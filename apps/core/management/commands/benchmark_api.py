@@ -0,0 +1,102 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.benchmark import SCALES, compare, discover_endpoints, endpoint_url, load, measure, volumes
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "api_baseline.json")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, benchmark every API router's GET endpoints "
+        "(queries, p50/p95 latency, peak memory, full scans) and fail on regressions against the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="ci")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed latency/memory growth (0.5 = +50%%).")
+        parser.add_argument("--endpoint", action="append", default=[], help="Only route paths containing this text.")
+        parser.add_argument("--keepdb", action="store_true", help="Keep (and reuse) the seeded test database.")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            results = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+        self._report(results, options)
+
+    def _run(self, options):
+        from apps.academic.models import Student
+        from apps.users.models import User
+
+        if Student.objects.count() < volumes(options["scale"])["students"]:
+            load(options["scale"], stdout=self.stdout)
+        user = User.objects.filter(login_id="benchmark-admin").first() or User.objects.create_superuser(
+            login_id="benchmark-admin", password=None, is_finance=True, is_hr=True, is_faculty=True
+        )
+        # Broken endpoints are recorded as 500s rather than aborting the run.
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        results = {}
+        for endpoint in discover_endpoints():
+            path = endpoint.path
+            if not self._selected(path, options):
+                continue
+            url = endpoint_url(endpoint, user)
+            if url is None:
+                self.stdout.write(self.style.WARNING(f"{path}: no row to request; skipped"))
+                continue
+            results[path] = measure(client, url, options["repeat"])
+            row = results[path]
+            self.stdout.write(
+                f"{row['status']} {path}: {row['queries']} queries, p50 {row['p50_ms']}ms, "
+                f"p95 {row['p95_ms']}ms, peak {row['peak_kb']}KiB"
+                + (f", full scans: {', '.join(row['full_scans'])}" if row["full_scans"] else "")
+            )
+        return results
+
+    @staticmethod
+    def _selected(path, options):
+        return not options["endpoint"] or any(text in path for text in options["endpoint"])
+
+    def _report(self, results, options):
+        key = f"{connection.vendor}:{options['scale']}"
+        stored = {}
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"]) as handle:
+                stored = json.load(handle)
+        if options["update_baseline"]:
+            failing = sorted(f"{row['status']} {path}" for path, row in results.items() if row["status"] >= 400)
+            if failing:
+                raise CommandError("Not recording a baseline with failing endpoints:\n" + "\n".join(failing))
+            stored[key] = {"recorded_at": timezone.now().isoformat(), "endpoints": results}
+            os.makedirs(os.path.dirname(options["baseline"]) or ".", exist_ok=True)
+            with open(options["baseline"], "w") as handle:
+                json.dump(stored, handle, indent=2, sort_keys=True)
+                handle.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline {key} updated ({len(results)} endpoints)."))
+            return
+        if key not in stored:
+            raise CommandError(f"No {key} baseline in {options['baseline']}; run with --update-baseline first.")
+        baseline = {path: row for path, row in stored[key]["endpoints"].items() if self._selected(path, options)}
+        for path in sorted(set(results) - set(baseline)):
+            self.stdout.write(self.style.WARNING(f"{path}: not in the baseline"))
+        regressions = compare(results, baseline, tolerance=options["tolerance"])
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} endpoints within the {key} baseline."))
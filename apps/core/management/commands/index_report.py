@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.core.indexes import MIN_ROWS, access_patterns, missing_indexes, unused_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Report indexes PostgreSQL has never used (pg_stat_user_indexes) and the list endpoint "
+        "filter/order patterns whose queries scan or sort a large table (EXPLAIN)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-rows", type=int, default=MIN_ROWS, help="Ignore scans of smaller tables.")
+        parser.add_argument("--user", help="login_id to run the list requests as (default: the first superuser).")
+        parser.add_argument("--endpoint", action="append", default=[], help="Only paths containing this text.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(login_id=options["user"]) if options["user"] else User.objects.filter(is_superuser=True)
+        user = users.order_by("pk").first()
+        if user is None:
+            raise CommandError("No user to run the list requests as; pass --user.")
+
+        unused, stats_reset = unused_indexes()
+        if connection.vendor != "postgresql":
+            self.stdout.write("Unused indexes: index statistics need PostgreSQL.")
+        else:
+            self.stdout.write(f"Unused indexes (no scans since {stats_reset or 'the statistics were created'}):")
+            for table, index, size in unused:
+                self.stdout.write(f"  {table}.{index} ({size // 1024} kB)")
+            if not unused:
+                self.stdout.write("  none")
+
+        patterns = [
+            pattern for pattern in access_patterns()
+            if not options["endpoint"] or any(text in pattern.path for text in options["endpoint"])
+        ]
+        findings, failures = missing_indexes(user, patterns, min_rows=options["min_rows"])
+        self.stdout.write(f"Missing indexes ({len(patterns)} filter/order patterns, tables of {options['min_rows']}+ rows):")
+        for finding in findings:
+            query = "&".join(f"{name}={value}" for name, value in finding.params.items())
+            self.stdout.write(f"  {finding.kind} of {finding.table}: {finding.path}{'?' + query if query else ''}")
+        if not findings:
+            self.stdout.write("  none")
+        for pattern, error in failures:
+            self.stdout.write(self.style.WARNING(f"  could not run {pattern.path} {pattern.params}: {error}"))
+
+        style = self.style.WARNING if unused or findings else self.style.SUCCESS
+        self.stdout.write(style(f"{len(unused)} unused, {len(findings)} missing."))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.partitioning import (
+    PARTITIONED_MODELS, PartitioningError, archive_partitions, convert_table, ensure_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain monthly partitions of the audit and webhook log tables: pre-create upcoming "
+        "months and archive/drop months past retention. --convert partitions the tables first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Partition tables that are not partitioned yet.")
+        parser.add_argument("--model", choices=sorted(PARTITIONED_MODELS), help="Only maintain this model.")
+        parser.add_argument("--ahead", type=int, default=settings.LOG_PARTITION_MONTHS_AHEAD,
+                            help="Months of partitions to create ahead of the current one.")
+        parser.add_argument("--retain", type=int, default=settings.LOG_RETENTION_MONTHS,
+                            help="Months to keep; older partitions are dropped. 0 keeps everything.")
+        parser.add_argument("--archive-dir", default=settings.LOG_ARCHIVE_DIR,
+                            help="Write dropped partitions here as gzipped CSV.")
+        parser.add_argument("--no-archive", action="store_true", help="Drop old partitions without archiving.")
+
+    def handle(self, *args, **options):
+        labels = [options["model"]] if options["model"] else sorted(PARTITIONED_MODELS)
+        archive_dir = None if options["no_archive"] else options["archive_dir"]
+        try:
+            for label in labels:
+                if options["convert"]:
+                    rows = convert_table(label, months_ahead=options["ahead"])
+                    if rows is not None:
+                        self.stdout.write(f"{label}: partitioned, {rows} rows copied.")
+                created = ensure_partitions(label, months_ahead=options["ahead"])
+                dropped = archive_partitions(label, options["retain"], archive_dir) if options["retain"] else []
+                self.stdout.write(self.style.SUCCESS(
+                    f"{label}: created {len(created)} partitions, dropped {len(dropped)}."
+                ))
+        except PartitioningError as exc:
+            raise CommandError(str(exc))
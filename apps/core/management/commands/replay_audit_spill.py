@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.audit import get_writer
+
+
+class Command(BaseCommand):
+    help = "Write audit rows spilled to AUDIT_SPILL_DIR back into the database."
+
+    def handle(self, *args, **options):
+        rows = get_writer().replay_spill()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {rows} audit rows."))
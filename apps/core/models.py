@@ -39,6 +39,7 @@ class Department(models.Model):
 class AuditLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='audit_logs')
     action = models.TextField()
+    details = models.JSONField(default=dict, blank=True)
     timestamp = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
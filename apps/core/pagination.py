@@ -0,0 +1,213 @@
+"""
+Project-wide pagination.
+
+`KeysetPagination` is the default for list endpoints. It pages with a
+``WHERE (created_at, id) < (last_created_at, last_id)`` style predicate
+instead of ``OFFSET``, so with an index on the ordering columns page N costs
+the same as page 1 and concurrent inserts never shift rows between pages.
+`LookupPagination` keeps classic ``?page=`` numbering for small reference
+tables where jumping to an arbitrary page is useful.
+"""
+
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LookupPagination(PageNumberPagination):
+    """Page-number pagination for small lookup tables."""
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique ordering.
+
+    The ordering is taken from the queryset (as set by `OrderingFilter`), then
+    the view's ``ordering`` attribute, then ``-pk``; the primary key is always
+    appended as a tie-breaker. Only concrete fields on the model can be keyset
+    columns — any other ordering falls back to the next candidate. NULLs in
+    nullable columns sort after every value.
+    The cursor is an opaque token carrying the boundary row's ordering values.
+    """
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    ordering = ("-pk",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.fields = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self._beyond(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                size = int(value)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """Return ``[(field_name, descending)]`` ending with the primary key."""
+        model = queryset.model
+        candidates = [
+            [o for o in queryset.query.order_by if isinstance(o, str)],
+            getattr(view, "ordering", None),
+            self.ordering,
+        ]
+        for candidate in candidates:
+            if isinstance(candidate, str):
+                candidate = [candidate]
+            fields = self._resolve(model, candidate or [])
+            if fields:
+                return fields
+        return [(model._meta.pk.name, True)]
+
+    @staticmethod
+    def _resolve(model, ordering):
+        fields = []
+        pk_name = model._meta.pk.name
+        for item in ordering:
+            desc = item.startswith("-")
+            name = item.lstrip("-+")
+            if name == "pk":
+                name = pk_name
+            if "__" in name or name == "?":
+                return None
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+            if field.is_relation:
+                name = field.attname
+            if all(name != seen for seen, _ in fields):
+                fields.append((name, desc))
+            if name == pk_name:
+                break
+        if fields and fields[-1][0] != pk_name:
+            fields.append((pk_name, fields[-1][1]))
+        return fields
+
+    def _nullable(self, name):
+        return self.model._meta.get_field(name).null
+
+    def _order_by(self, reverse):
+        # NULLs sort last going forward, so they come first when paging back.
+        order = []
+        for name, desc in self.fields:
+            expression = F(name).desc if desc != reverse else F(name).asc
+            order.append(expression(nulls_first=True) if reverse else expression(nulls_last=True))
+        return order
+
+    def _beyond(self, position, reverse):
+        """Lexicographic "strictly after the boundary row" predicate."""
+        condition = Q()
+        equal = Q()
+        for (name, desc), value in zip(self.fields, position):
+            lookup = "lt" if desc != reverse else "gt"
+            if value is None:
+                # Only non-null values follow a NULL, and only when paging back.
+                if reverse:
+                    condition |= equal & Q(**{f"{name}__isnull": False})
+                equal &= Q(**{f"{name}__isnull": True})
+                continue
+            after = Q(**{f"{name}__{lookup}": value})
+            if not reverse and self._nullable(name):
+                after |= Q(**{f"{name}__isnull": True})
+            condition |= equal & after
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+            values, reverse = payload["p"], bool(payload.get("r"))
+            if len(values) != len(self.fields):
+                raise ValueError
+            meta = self.model._meta
+            position = [
+                None if value is None else meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, row, reverse):
+        meta = self.model._meta
+        values = [
+            None if getattr(row, name) is None else meta.get_field(name).value_to_string(row)
+            for name, _ in self.fields
+        ]
+        payload = json.dumps({"p": values, "r": int(reverse)}, separators=(",", ":"))
+        token = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
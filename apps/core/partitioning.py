@@ -0,0 +1,231 @@
+"""
+Monthly range partitioning for append-only log tables (PostgreSQL only).
+
+`convert_table` turns an existing table into one partitioned by month on its
+timestamp column: the primary key becomes ``(id, <timestamp>)`` and each
+month lives in ``<table>_pYYYYMM``, with ``<table>_default`` catching
+anything outside the pre-created range. The Django models are unchanged; the
+ORM reads and writes the parent table and PostgreSQL prunes partitions for
+timestamp filters and keyset pages.
+
+`ensure_partitions` pre-creates upcoming months and `archive_partitions`
+detaches months past the retention window, optionally writes them to
+``<archive_dir>/<partition>.csv.gz`` and drops them, so pruning is a
+metadata change instead of a long ``DELETE``.
+"""
+
+import datetime
+import gzip
+import logging
+import os
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_MODELS = {
+    "reporting.AuditLog": "timestamp",
+    "integrations.WebhookLog": "received_at",
+}
+
+
+class PartitioningError(Exception):
+    """Raised when a table cannot be partitioned or maintained."""
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return datetime.date(month.year + years, index + 1, 1)
+
+
+def _bound(month):
+    # Literal UTC bound; every value is a date we built, never user input.
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def _table(model_label):
+    model = apps.get_model(model_label)
+    column = model._meta.get_field(PARTITIONED_MODELS[model_label]).column
+    return model, model._meta.db_table, column
+
+
+def _require_postgres():
+    if connection.vendor != "postgresql":
+        raise PartitioningError("Table partitioning needs PostgreSQL.")
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(table):
+    """``{month: partition_name}`` for the month partitions of ``table``."""
+    prefix = f"{table}_p"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            months[datetime.date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return months
+
+
+def create_partition(table, column, month):
+    """Create the partition for ``month``, moving matching rows out of the default partition."""
+    name = f"{table}_p{month:%Y%m}"
+    default = f"{table}_default"
+    bounds = f"FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    in_range = f"{_qn(column)} >= {_bound(month)} AND {_qn(column)} < {_bound(add_months(month, 1))}"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {_qn(default)} WHERE {in_range})")
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(table)} FOR VALUES {bounds}")
+            return name
+        cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(default)}")
+        cursor.execute(f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(table)} FOR VALUES {bounds}")
+        cursor.execute(f"INSERT INTO {_qn(name)} SELECT * FROM {_qn(default)} WHERE {in_range}")
+        cursor.execute(f"DELETE FROM {_qn(default)} WHERE {in_range}")
+        cursor.execute(f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(default)} DEFAULT")
+    return name
+
+
+def convert_table(model_label, months_ahead=3):
+    """
+    Rebuild ``model_label``'s table as a partitioned table, copying its rows.
+    Runs in one transaction holding an exclusive lock; a no-op when the table
+    is already partitioned. Returns the number of rows copied or None.
+    """
+    _require_postgres()
+    model, table, column = _table(model_label)
+    if is_partitioned(table):
+        return None
+    pk = model._meta.pk.column
+    legacy = f"{table}_unpartitioned"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {_qn(table)} IN ACCESS EXCLUSIVE MODE")
+        # Fire deferred FK checks now; pending ones would block the DROP below.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('f', 'p', 'u')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        if any(kind == "u" for _, kind, _ in constraints):
+            raise PartitioningError(f"{table} has unique constraints that do not include {column}.")
+        constraint_names = {name for name, _, _ in constraints}
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == "f"]
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()",
+            [table],
+        )
+        indexes = [definition for name, definition in cursor.fetchall() if name not in constraint_names]
+        cursor.execute(f"SELECT min({_qn(column)}), max({_qn(column)}), count(*) FROM {_qn(table)}")
+        oldest, newest, rows = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {_qn(table)} RENAME TO {_qn(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {_qn(table)} (LIKE {_qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY "
+            f"INCLUDING CONSTRAINTS) PARTITION BY RANGE ({_qn(column)})"
+        )
+        cursor.execute(f"ALTER TABLE {_qn(table)} ADD PRIMARY KEY ({_qn(pk)}, {_qn(column)})")
+        cursor.execute(f"CREATE TABLE {_qn(table + '_default')} PARTITION OF {_qn(table)} DEFAULT")
+        current = month_start(timezone.now())
+        month = min(month_start(oldest), current) if oldest else current
+        last = max(month_start(newest), current) if newest else current
+        while month <= add_months(last, months_ahead):
+            cursor.execute(
+                f"CREATE TABLE {_qn(f'{table}_p{month:%Y%m}')} PARTITION OF {_qn(table)} "
+                f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+            )
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {_qn(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {_qn(legacy)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(max({_qn(pk)}), 0) + 1, false) "
+            f"FROM {_qn(table)}",
+            [table, pk],
+        )
+        cursor.execute(f"DROP TABLE {_qn(legacy)}")
+        # Names are free again now the old table is gone.
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(name)} {definition}")
+    logger.info("Partitioned %s by month on %s (%s rows)", table, column, rows)
+    return rows
+
+
+def ensure_partitions(model_label, months_ahead=3, now=None):
+    """Create missing partitions from this month to ``months_ahead`` months out."""
+    _require_postgres()
+    _, table, column = _table(model_label)
+    if not is_partitioned(table):
+        raise PartitioningError(f"{table} is not partitioned; run partition_logs --convert first.")
+    existing = monthly_partitions(table)
+    month = month_start(now or timezone.now())
+    created = []
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            created.append(create_partition(table, column, month))
+        month = add_months(month, 1)
+    return created
+
+
+def _copy_out(cursor, sql, handle):
+    raw = cursor.cursor
+    if hasattr(raw, "copy_expert"):  # psycopg2
+        raw.copy_expert(sql, handle)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            for block in copy:
+                handle.write(bytes(block))
+
+
+def archive_partitions(model_label, retain_months, archive_dir=None, now=None):
+    """
+    Drop month partitions entirely older than ``retain_months``, writing each
+    to a gzipped CSV in ``archive_dir`` first when one is given. Each
+    partition is handled in its own transaction. Returns the dropped names.
+    """
+    _require_postgres()
+    _, table, _ = _table(model_label)
+    cutoff = add_months(month_start(now or timezone.now()), -retain_months)
+    dropped = []
+    for month, name in sorted(monthly_partitions(table).items()):
+        if month >= cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(name)}")
+            if archive_dir:
+                os.makedirs(archive_dir, exist_ok=True)
+                path = os.path.join(archive_dir, f"{name}.csv.gz")
+                with gzip.open(path, "wb") as handle:
+                    _copy_out(cursor, f"COPY {_qn(name)} TO STDOUT WITH (FORMAT csv, HEADER)", handle)
+            cursor.execute(f"DROP TABLE {_qn(name)}")
+        dropped.append(name)
+        logger.info("Dropped partition %s%s", name, f" (archived to {archive_dir})" if archive_dir else "")
+    return dropped
@@ -0,0 +1,55 @@
+"""
+Test helpers shared across apps.
+
+`QueryBudgetMixin.assertMaxQueries` is an upper-bound version of
+``assertNumQueries`` for endpoint query budgets: a page must stay within
+its budget however many rows it renders.
+
+    class PaymentQueryTests(QueryBudgetMixin, APITestCase):
+        def test_list(self):
+            with self.assertMaxQueries(3):
+                self.client.get('/api/finance/payments/')
+
+`SharedCacheMixin` runs each test against a file-based cache, which every
+process shares, for code that only uses the cache when it is shared (see
+`apps.core.caching`).
+"""
+
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+class QueryBudgetMixin:
+    @contextmanager
+    def assertMaxQueries(self, limit, using="default"):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > limit:
+            queries = "\n".join(
+                f"{index}. {query['sql']}" for index, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f"{executed} queries executed, at most {limit} expected. Captured queries were:\n{queries}")
+
+    def assertQueryBudget(self, method, url, limit, status_code=200, **kwargs):
+        """Request ``url`` with ``self.client`` within ``limit`` queries; returns the response."""
+        with self.assertMaxQueries(limit):
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, status_code, getattr(response, "data", None))
+        return response
+
+
+class SharedCacheMixin:
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
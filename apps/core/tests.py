@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase
+
+from apps.academic.models import Course
+from apps.finance.models import Invoice
+from .benchmark import compare, discover_endpoints
+
+
+def _row(**overrides):
+    return {"status": 200, "queries": 3, "p50_ms": 10.0, "p95_ms": 14.0, "peak_kb": 300.0, "full_scans": [], **overrides}
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    def test_noise_within_tolerance_passes(self):
+        baseline = {"/api/a/": _row()}
+        self.assertEqual(compare({"/api/a/": _row(p50_ms=19.0, p95_ms=30.0, peak_kb=600.0)}, baseline), [])
+        # Endpoints added since the baseline are not regressions.
+        self.assertEqual(compare({"/api/a/": _row(), "/api/new/": _row(status=500)}, baseline), [])
+
+    def test_queries_status_and_scans_always_count(self):
+        regressions = compare(
+            {"/api/a/": _row(queries=4, status=500, full_scans=["grades"])},
+            {"/api/a/": _row(full_scans=["students"])},
+        )
+        self.assertEqual(regressions, [
+            "/api/a/: status 500 (was 200)",
+            "/api/a/: 4 queries (was 3)",
+            "/api/a/: new full scans of grades",
+        ])
+
+    def test_latency_and_memory_past_tolerance(self):
+        regressions = compare({"/api/a/": _row(p50_ms=21.0, p95_ms=40.0, peak_kb=800.0)}, {"/api/a/": _row()}, tolerance=0.5)
+        self.assertEqual([line.split(": ")[1].split()[0] for line in regressions], ["p50", "p95", "peak"])
+
+    def test_endpoints_missing_from_the_run_are_regressions(self):
+        baseline = {"/api/a/": _row(), "/api/b/(?P<pk>[^/.]+)/": _row()}
+        self.assertEqual(
+            compare({"/api/a/": _row()}, baseline), ["/api/b/(?P<pk>[^/.]+)/: not measured (in the baseline)"]
+        )
+
+
+class DiscoverEndpointsTests(SimpleTestCase):
+    def test_lists_and_one_detail_route_per_router_view(self):
+        endpoints = {endpoint.path: endpoint for endpoint in discover_endpoints()}
+        courses = endpoints["/api/academic/courses/"]
+        self.assertEqual((courses.name, courses.model, courses.detail), ("course-list", Course, False))
+        course = endpoints["/api/academic/courses/(?P<pk>[^/.]+)/"]
+        self.assertEqual((course.name, course.model, course.detail), ("course-detail", Course, True))
+        self.assertIs(endpoints["/api/finance/invoices/"].model, Invoice)
+        self.assertIn("/api/admissions/applications/funnel-history/", endpoints)
+
+    def test_skips_exports_format_suffixes_and_non_api_routes(self):
+        paths = [endpoint.path for endpoint in discover_endpoints()]
+        self.assertEqual(len(paths), len(set(paths)))
+        for path in paths:
+            self.assertTrue(path.startswith("/api/"), path)
+            self.assertNotIn("/export/", path)
+            self.assertNotIn("(?P<format>", path)
@@ -1,18 +1,13 @@
-from django.utils import timezone
-from .models import AuditLog
+from .audit import record
 
 def log_action(user, action, details=None):
     """
-    Log an action to AuditLog.
+    Log an action to AuditLog. The row is queued and written in a batch by
+    the audit writer (see apps.core.audit).
     
     Args:
         user: The user performing the action (instance of users.User).
         action: A string describing the action (e.g., 'created_ledger').
         details: Optional dictionary with additional details.
     """
-    AuditLog.objects.create(
-        user=user,
-        action=action,
-        details=details or {},
-        timestamp=timezone.now()
-    )
\ No newline at end of file
+    record('core.AuditLog', user_id=user.pk, action=action, details=details or {})
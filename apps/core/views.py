@@ -4,15 +4,18 @@ from rest_framework.response import Response
 from .models import College, Department
 from .serializers import CollegeSerializer, DepartmentSerializer
 from .permissions import IsAdminOrReadOnly
+from .pagination import LookupPagination
 
 class CollegeViewSet(viewsets.ModelViewSet):
     queryset = College.objects.all()
     serializer_class = CollegeSerializer
+    pagination_class = LookupPagination
     permission_classes = [IsAdminOrReadOnly]
 
 class DepartmentViewSet(viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
+    pagination_class = LookupPagination
     permission_classes = [IsAdminOrReadOnly]
 
     @action(detail=False, methods=['get'])
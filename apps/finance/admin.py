@@ -1,9 +1,10 @@
 from django.contrib import admin
-from .models import Ledger, Invoice, Payment
+from .models import BillingRun, FeeSchedule, Ledger, LedgerReconciliation, Invoice, Payment
 
 @admin.register(Ledger)
 class LedgerAdmin(admin.ModelAdmin):
-    list_display = ('student', 'balance_cents', 'created_at', 'updated_at')
+    list_display = ('student', 'balance_cents', 'opening_balance_cents', 'created_at', 'updated_at')
+    readonly_fields = ('opening_balance_cents',)
     list_filter = ('created_at',)
     search_fields = ('student__user__login_id',)
 
@@ -17,4 +18,21 @@ class InvoiceAdmin(admin.ModelAdmin):
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('id', 'invoice', 'amount_cents', 'payment_method', 'paid_at')
     list_filter = ('payment_method', 'paid_at')
-    search_fields = ('invoice__ledger__student__user__login_id',)
\ No newline at end of file
+    search_fields = ('invoice__ledger__student__user__login_id',)
+
+@admin.register(FeeSchedule)
+class FeeScheduleAdmin(admin.ModelAdmin):
+    list_display = ('program', 'academic_year', 'amount_cents', 'due_date')
+    list_filter = ('academic_year',)
+
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = ('run_id', 'academic_year', 'program', 'status', 'invoices_created', 'amount_cents', 'created_at')
+    list_filter = ('status', 'academic_year')
+    readonly_fields = ('last_student_id', 'students_total', 'invoices_created', 'amount_cents', 'task_id', 'error')
+
+@admin.register(LedgerReconciliation)
+class LedgerReconciliationAdmin(admin.ModelAdmin):
+    list_display = ('checked_at', 'fixed')
+    list_filter = ('fixed',)
+    readonly_fields = ('checked_at', 'fixed', 'report')
@@ -0,0 +1,137 @@
+"""
+Bulk fee invoicing.
+
+A `BillingRun` invoices every student of the programs that have a
+`FeeSchedule` for its academic year (or of a single program). Students are
+walked in primary-key chunks; each chunk is one transaction that locks the
+run row, creates missing ledgers and the invoices with ``bulk_create``,
+posts the whole chunk to the ledger balances with one UPDATE and advances
+the run's ``last_student_id`` cursor. An interrupted or failed run resumes
+from its cursor, and the ``(billing_run, ledger)`` unique constraint keeps a
+run from invoicing a ledger twice.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.academic.models import Student
+from .models import BillingRun, FeeSchedule, Invoice, Ledger
+from .posting import post_invoices
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, "BILLING_CHUNK_SIZE", 500)
+
+
+class BillingError(Exception):
+    """Raised when a billing run cannot be created or resumed."""
+
+
+def create_run(run_id, academic_year, program=None, user=None):
+    """
+    Return ``(run, created)`` for ``run_id``. Repeating a run id with the same
+    parameters returns the existing run; different parameters are an error.
+    """
+    run, created = BillingRun.objects.get_or_create(
+        run_id=run_id,
+        defaults={"academic_year": academic_year, "program": program, "created_by": user},
+    )
+    if not created and (run.academic_year_id, run.program_id) != (academic_year.pk, getattr(program, "pk", None)):
+        raise BillingError(f"Billing run {run_id!r} already exists for a different year or program.")
+    return run, created
+
+
+def _schedules(run):
+    schedules = FeeSchedule.objects.filter(academic_year_id=run.academic_year_id)
+    if run.program_id:
+        schedules = schedules.filter(program_id=run.program_id)
+    return schedules
+
+
+def billable_students(run):
+    return Student.objects.filter(program_id__in=_schedules(run).values("program_id"))
+
+
+def bill_chunk(run, chunk_size=None):
+    """Invoice the next chunk of students; returns the refreshed run."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    with transaction.atomic():
+        run = BillingRun.objects.select_for_update().get(pk=run.pk)
+        if run.status == "completed":
+            return run
+        students = list(
+            billable_students(run).filter(pk__gt=run.last_student_id)
+            .order_by("pk").values_list("pk", "program_id")[:chunk_size]
+        )
+        if not students:
+            run.status, run.finished_at = "completed", timezone.now()
+            run.save(update_fields=["status", "finished_at"])
+            return run
+
+        student_ids = [pk for pk, _ in students]
+        ledgers = {}
+        for student_id, ledger_id in Ledger.objects.filter(student_id__in=student_ids).order_by("pk").values_list("student_id", "pk"):
+            ledgers.setdefault(student_id, ledger_id)
+        missing = [Ledger(student_id=pk, opening_balance_cents=0) for pk in student_ids if pk not in ledgers]
+        for ledger in Ledger.objects.bulk_create(missing):
+            ledgers[ledger.student_id] = ledger.pk
+
+        billed = set(Invoice.objects.filter(billing_run=run, ledger_id__in=ledgers.values()).values_list("ledger_id", flat=True))
+        schedules = {schedule.program_id: schedule for schedule in _schedules(run)}
+        invoices = []
+        for student_id, program_id in students:
+            schedule = schedules[program_id]
+            if ledgers[student_id] in billed:
+                continue
+            invoices.append(Invoice(
+                ledger_id=ledgers[student_id], billing_run=run, amount_cents=schedule.amount_cents,
+                description=schedule.description, due_date=schedule.due_date,
+            ))
+        Invoice.objects.bulk_create(invoices)
+        post_invoices(invoices)
+
+        run.last_student_id = student_ids[-1]
+        run.invoices_created += len(invoices)
+        run.amount_cents += sum(invoice.amount_cents for invoice in invoices)
+        run.save(update_fields=["last_student_id", "invoices_created", "amount_cents"])
+    return run
+
+
+def run_progress(run):
+    """The run's counters, as reported in the Celery task result."""
+    return {
+        "run_id": run.run_id,
+        "status": run.status,
+        "students_total": run.students_total,
+        "invoices_created": run.invoices_created,
+        "amount_cents": run.amount_cents,
+        "last_student_id": run.last_student_id,
+    }
+
+
+def execute_run(run, chunk_size=None, progress=None):
+    """
+    Bill ``run`` to completion, resuming from its cursor. ``progress`` is
+    called with the run after every chunk. A failure marks the run failed
+    (committed chunks stay) and re-raises.
+    """
+    if run.status == "completed":
+        return run
+    run.status, run.error = "running", ""
+    run.started_at = run.started_at or timezone.now()
+    run.students_total = billable_students(run).count()
+    run.save(update_fields=["status", "error", "started_at", "students_total"])
+    try:
+        while run.status != "completed":
+            run = bill_chunk(run, chunk_size)
+            if progress:
+                progress(run)
+    except Exception as exc:
+        BillingRun.objects.filter(pk=run.pk).update(status="failed", error=str(exc))
+        logger.exception("Billing run %s failed after student %s", run.run_id, run.last_student_id)
+        raise
+    logger.info("Billing run %s: %s invoices, %s cents", run.run_id, run.invoices_created, run.amount_cents)
+    return run
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.finance.posting import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute ledger balances from invoices and payments and report (or fix) drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Correct drifted balances.")
+        parser.add_argument("--chunk-size", type=int, help="Ledgers per chunk (default LEDGER_RECONCILE_CHUNK_SIZE).")
+        parser.add_argument("--workers", type=int, help="Parallel chunks (default LEDGER_RECONCILE_WORKERS).")
+
+    def handle(self, *args, **options):
+        report = reconcile(options["chunk_size"], options["workers"], fix=options["fix"])
+        for row in report["sample"]:
+            self.stdout.write(
+                f"ledger {row['ledger_id']}: balance {row['balance_cents']}, "
+                f"expected {row['expected_cents']} ({row['drift_cents']:+})"
+            )
+        style = self.style.WARNING if report["drifted"] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{report['ledgers']} ledgers checked, {report['drifted']} drifted "
+            f"({report['drift_cents']} cents){', fixed' if report['fixed'] else ''}."
+        ))
+        if report["legacy"]:
+            self.stdout.write(self.style.WARNING(
+                f"{report['legacy']} ledgers predate posting and "
+                + ("were baselined at their current balance." if report["fixed"] else "were not checked; run with --fix to baseline them.")
+            ))
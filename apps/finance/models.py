@@ -1,14 +1,53 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from apps.users.models import User
-from apps.academic.models import Student
+from apps.academic.models import AcademicYear, Program, Student
 
 class Ledger(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='ledgers')
+    # Maintained by apps.finance.posting: opening balance + invoices - payments.
     balance_cents = models.IntegerField(default=0)
+    # The part of the balance not explained by invoices and payments
+    # (the balance given at creation plus manual adjustments). NULL on ledgers
+    # that predate posting until reconciliation baselines them.
+    opening_balance_cents = models.IntegerField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    _loaded_balance = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_balance = instance.__dict__.get('balance_cents')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.opening_balance_cents = self.balance_cents
+            super().save(*args, **kwargs)
+            self._loaded_balance = self.balance_cents
+            return
+        # Never write the stored balance back: postings may have moved it since
+        # this row was loaded. An edited balance is applied as an adjustment.
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+        update_fields = [f for f in update_fields if f not in ('balance_cents', 'opening_balance_cents')]
+        adjustment = 0
+        if self._loaded_balance is not None:
+            adjustment = self.balance_cents - self._loaded_balance
+        with transaction.atomic():
+            if update_fields:
+                super().save(*args, update_fields=update_fields, **kwargs)
+            if adjustment:
+                Ledger.objects.filter(pk=self.pk).update(
+                    balance_cents=F('balance_cents') + adjustment,
+                    opening_balance_cents=F('opening_balance_cents') + adjustment,
+                )
+        self._loaded_balance = self.balance_cents
+
     class Meta:
         verbose_name = 'Ledger'
         verbose_name_plural = 'Ledgers'
@@ -16,6 +55,75 @@ class Ledger(models.Model):
     def __str__(self):
         return f"Ledger for {self.student} - Balance: {self.balance_cents / 100:.2f}"
 
+class FeeSchedule(models.Model):
+    """The fee billed to each student of a program for an academic year."""
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='fee_schedules')
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, related_name='fee_schedules')
+    amount_cents = models.PositiveIntegerField()
+    description = models.CharField(max_length=255, blank=True)
+    due_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Fee Schedule'
+        verbose_name_plural = 'Fee Schedules'
+        constraints = [
+            models.UniqueConstraint(fields=['program', 'academic_year'], name='fee_schedule_program_year_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.program} {self.academic_year} - {self.amount_cents / 100:.2f}"
+
+class BillingRun(models.Model):
+    """
+    One invoicing run over the students of an academic year's fee schedules
+    (optionally a single program). ``run_id`` is the caller's idempotency
+    key; ``last_student_id`` is the resume cursor (see apps.finance.billing).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    run_id = models.CharField(max_length=64, unique=True)
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.PROTECT, related_name='billing_runs')
+    program = models.ForeignKey(Program, on_delete=models.PROTECT, related_name='billing_runs', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    task_id = models.CharField(max_length=255, blank=True)
+    last_student_id = models.BigIntegerField(default=0)
+    students_total = models.PositiveIntegerField(default=0)
+    invoices_created = models.PositiveIntegerField(default=0)
+    amount_cents = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='billing_runs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Billing Run'
+        verbose_name_plural = 'Billing Runs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Billing run {self.run_id} ({self.status})"
+
+class LedgerReconciliation(models.Model):
+    """One `apps.finance.posting.reconcile` report; the newest is served by the API."""
+    checked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    fixed = models.BooleanField(default=False)
+    report = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = 'Ledger Reconciliation'
+        verbose_name_plural = 'Ledger Reconciliations'
+        ordering = ['-checked_at']
+
+    def __str__(self):
+        return f"Reconciliation at {self.checked_at:%Y-%m-%d %H:%M}"
+
 class Invoice(models.Model):
     ledger = models.ForeignKey(Ledger, on_delete=models.CASCADE, related_name='invoices')
     amount_cents = models.PositiveIntegerField()
@@ -26,12 +134,43 @@ class Invoice(models.Model):
         ('paid', 'Paid'),
         ('overdue', 'Overdue'),
     ], default='pending')
+    billing_run = models.ForeignKey(BillingRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoices')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    _loaded_state = (None, 0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('ledger_id'), instance.__dict__.get('amount_cents'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .posting import post_invoice_change, saved_state
+
+        old = self._loaded_state
+        new = saved_state(self, old, ('ledger_id', 'amount_cents'), kwargs.get('update_fields'))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if new != old:
+                post_invoice_change(self.pk, old, new)
+        self._loaded_state = new
+
     class Meta:
         verbose_name = 'Invoice'
         verbose_name_plural = 'Invoices'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='invoice_created_keyset_idx'),
+            models.Index(fields=['status', 'due_date', 'id'], name='invoice_status_due_idx'),
+        ]
+        constraints = [
+            # A billing run invoices each ledger at most once.
+            models.UniqueConstraint(
+                fields=['billing_run', 'ledger'], condition=models.Q(billing_run__isnull=False),
+                name='invoice_billing_run_ledger_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"Invoice {self.id} - {self.ledger.student} - {self.amount_cents / 100:.2f}"
@@ -47,9 +186,31 @@ class Payment(models.Model):
     paid_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    _loaded_state = (None, 0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('invoice_id'), instance.__dict__.get('amount_cents'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .posting import post_payment_change, saved_state
+
+        old = self._loaded_state
+        new = saved_state(self, old, ('invoice_id', 'amount_cents'), kwargs.get('update_fields'))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if new != old:
+                post_payment_change(old, new)
+        self._loaded_state = new
+
     class Meta:
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='payment_created_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Payment {self.id} - {self.invoice} - {self.amount_cents / 100:.2f}"
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+Ledger posting engine.
+
+`Ledger.balance_cents` is what a student owes: the ledger's opening balance
+plus its invoices minus the payments against them. Saving or deleting an
+`Invoice` or `Payment` posts the difference to the affected ledgers with a
+single ``F()`` UPDATE inside the same transaction, so concurrent postings
+never overwrite each other and reading a balance is one row. Bulk writers
+(``bulk_create`` skips `save`) call `post_invoices` / `post_payments`;
+``QuerySet.update`` of amounts bypasses posting and shows up as drift.
+
+`reconcile` recomputes balances from invoices and payments, a chunk of
+ledgers at a time across a few worker threads, and reports the ledgers that
+drifted. With ``fix=True`` each chunk is re-checked and corrected while its
+ledger rows are locked. Every report is stored as a `LedgerReconciliation`
+row, so the API sees runs made by the command or a worker.
+
+Ledgers created before posting existed have no opening balance (NULL), so
+their balance cannot be recomputed. Reconciliation counts them as
+``legacy`` and leaves them alone; with ``fix=True`` it first baselines them
+(`baseline_ledgers`), taking their current balance as correct.
+"""
+
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Invoice, Ledger, LedgerReconciliation, Payment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, "LEDGER_RECONCILE_CHUNK_SIZE", 1000)
+WORKERS = getattr(settings, "LEDGER_RECONCILE_WORKERS", 4)
+SAMPLE_SIZE = 50
+
+
+def saved_state(instance, old, attnames, update_fields):
+    """The posted values after a save; fields left out of ``update_fields`` keep their old value."""
+    if update_fields is None:
+        return tuple(getattr(instance, attname) for attname in attnames)
+    names = set(update_fields)
+    return tuple(
+        getattr(instance, attname) if attname in names or attname.removesuffix("_id") in names else value
+        for attname, value in zip(attnames, old)
+    )
+
+
+def post(deltas):
+    """Apply ``{ledger_id: cents}`` to ledger balances in one UPDATE."""
+    deltas = {ledger_id: cents for ledger_id, cents in deltas.items() if ledger_id and cents}
+    if not deltas:
+        return
+    Ledger.objects.filter(pk__in=deltas).update(
+        balance_cents=Case(
+            *[When(pk=ledger_id, then=F("balance_cents") + cents) for ledger_id, cents in deltas.items()],
+            default=F("balance_cents"),
+            output_field=IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def _ledgers_of(invoice_ids):
+    invoice_ids = {pk for pk in invoice_ids if pk}
+    if not invoice_ids:
+        return {}
+    return dict(Invoice.objects.filter(pk__in=invoice_ids).values_list("pk", "ledger_id"))
+
+
+def post_invoice_change(invoice_id, old, new):
+    """Post an invoice moving from ``(ledger_id, amount)`` ``old`` to ``new``."""
+    (old_ledger, old_amount), (new_ledger, new_amount) = old, new
+    deltas = Counter({new_ledger: new_amount})
+    if old_ledger:
+        deltas[old_ledger] -= old_amount
+        if new_ledger and old_ledger != new_ledger:
+            # Payments against the invoice follow it to the new ledger.
+            paid = Payment.objects.filter(invoice_id=invoice_id).aggregate(total=Sum("amount_cents"))["total"] or 0
+            deltas[old_ledger] += paid
+            deltas[new_ledger] -= paid
+    post(deltas)
+
+
+def post_payment_change(old, new):
+    """Post a payment moving from ``(invoice_id, amount)`` ``old`` to ``new``."""
+    (old_invoice, old_amount), (new_invoice, new_amount) = old, new
+    ledgers = _ledgers_of([old_invoice, new_invoice])
+    deltas = Counter()
+    if old_invoice in ledgers:
+        deltas[ledgers[old_invoice]] += old_amount
+    if new_invoice in ledgers:
+        deltas[ledgers[new_invoice]] -= new_amount
+    post(deltas)
+
+
+def post_invoices(invoices, sign=1):
+    """Post invoices written without `Invoice.save` (``sign=-1`` reverses them)."""
+    deltas = Counter()
+    for invoice in invoices:
+        deltas[invoice.ledger_id] += sign * invoice.amount_cents
+    post(deltas)
+
+
+def post_payments(payments, sign=1):
+    """Post payments written without `Payment.save` (``sign=-1`` reverses them)."""
+    payments = list(payments)
+    ledgers = _ledgers_of(payment.invoice_id for payment in payments)
+    deltas = Counter()
+    for payment in payments:
+        deltas[ledgers.get(payment.invoice_id)] -= sign * payment.amount_cents
+    post(deltas)
+
+
+def _net_postings():
+    """Per-ledger expression: invoiced minus paid, from the source rows."""
+    invoiced = (
+        Invoice.objects.filter(ledger_id=OuterRef("pk")).order_by()
+        .values("ledger_id").annotate(total=Sum("amount_cents")).values("total")
+    )
+    paid = (
+        Payment.objects.filter(invoice__ledger_id=OuterRef("pk")).order_by()
+        .values("invoice__ledger_id").annotate(total=Sum("amount_cents")).values("total")
+    )
+    zero = Value(0, output_field=IntegerField())
+    return (
+        Coalesce(Subquery(invoiced, output_field=IntegerField()), zero)
+        - Coalesce(Subquery(paid, output_field=IntegerField()), zero)
+    )
+
+
+def expected_balances(ledgers):
+    """``ledgers`` annotated with ``expected_cents``, the balance recomputed from source rows."""
+    return ledgers.annotate(expected_cents=F("opening_balance_cents") + _net_postings())
+
+
+def baseline_ledgers(ledgers):
+    """
+    Give ledgers without an opening balance the one that explains their
+    current balance (balance minus invoices plus payments); returns how many.
+    """
+    return ledgers.filter(opening_balance_cents__isnull=True).update(
+        opening_balance_cents=F("balance_cents") - _net_postings()
+    )
+
+
+def reconcile_chunk(first_pk, last_pk, fix=False):
+    """
+    Check ledgers with ``first_pk <= pk <= last_pk``; returns the drifted
+    ones and the number of legacy ledgers (baselined with ``fix``).
+    """
+    ledgers = Ledger.objects.filter(pk__gte=first_pk, pk__lte=last_pk)
+    with transaction.atomic():
+        if fix:
+            # Hold the rows so no posting lands between the check and the fix.
+            list(ledgers.select_for_update().values_list("pk", flat=True))
+            legacy = baseline_ledgers(ledgers)
+        else:
+            legacy = ledgers.filter(opening_balance_cents__isnull=True).count()
+        rows = (
+            expected_balances(ledgers.filter(opening_balance_cents__isnull=False))
+            .values_list("pk", "balance_cents", "expected_cents")
+        )
+        drifted = [
+            {"ledger_id": pk, "balance_cents": balance, "expected_cents": expected, "drift_cents": balance - expected}
+            for pk, balance, expected in rows
+            if balance != expected
+        ]
+        if fix:
+            for row in drifted:
+                Ledger.objects.filter(pk=row["ledger_id"]).update(
+                    balance_cents=row["expected_cents"], updated_at=timezone.now()
+                )
+    return drifted, legacy
+
+
+def _chunks(chunk_size):
+    last = 0
+    while True:
+        pks = list(Ledger.objects.filter(pk__gt=last).order_by("pk").values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield pks[0], pks[-1], len(pks)
+        last = pks[-1]
+
+
+def _run_chunk(chunk, fix):
+    try:
+        return reconcile_chunk(chunk[0], chunk[1], fix)
+    finally:
+        connection.close()
+
+
+def reconcile(chunk_size=None, workers=None, fix=False):
+    """
+    Compare every ledger's balance with its invoices and payments. Returns a
+    report with the number of ledgers checked, how many drifted, the total
+    absolute drift, a sample of drifted ledgers and the number of legacy
+    ledgers; the report is also stored (`last_report`).
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    workers = workers or WORKERS
+    chunks = list(_chunks(chunk_size))
+    if workers > 1 and len(chunks) > 1:
+        # Each thread uses (and closes) its own database connection.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda chunk: _run_chunk(chunk, fix), chunks))
+    else:
+        results = [reconcile_chunk(first, last, fix) for first, last, _ in chunks]
+    drifted = [row for rows, _ in results for row in rows]
+    checked_at = timezone.now()
+    report = {
+        "checked_at": checked_at.isoformat(),
+        "ledgers": sum(count for _, _, count in chunks),
+        "drifted": len(drifted),
+        "drift_cents": sum(abs(row["drift_cents"]) for row in drifted),
+        "fixed": fix,
+        "legacy": sum(legacy for _, legacy in results),
+        "sample": drifted[:SAMPLE_SIZE],
+    }
+    LedgerReconciliation.objects.create(checked_at=checked_at, fixed=fix, report=report)
+    if drifted:
+        logger.warning(
+            "Ledger reconciliation: %s of %s ledgers drifted by %s cents in total%s",
+            report["drifted"], report["ledgers"], report["drift_cents"], " (fixed)" if fix else "",
+        )
+    else:
+        logger.info("Ledger reconciliation: %s ledgers, no drift", report["ledgers"])
+    if report["legacy"] and not fix:
+        logger.warning("Ledger reconciliation: %s ledgers predate posting and were not checked", report["legacy"])
+    return report
+
+
+def last_report():
+    return LedgerReconciliation.objects.order_by("-checked_at", "-pk").values_list("report", flat=True).first()
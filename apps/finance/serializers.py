@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import Ledger, Invoice, Payment
-from apps.academic.models import Student
+from apps.core.expansion import ExpandableSerializerMixin
+from .models import BillingRun, FeeSchedule, Ledger, Invoice, Payment
+from apps.academic.models import AcademicYear, Program, Student
 
 class LedgerSerializer(serializers.ModelSerializer):
     student = serializers.StringRelatedField(read_only=True)
@@ -10,8 +11,8 @@ class LedgerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ledger
-        fields = ['id', 'student', 'student_id', 'balance_cents', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'student', 'student_id', 'balance_cents', 'opening_balance_cents', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'opening_balance_cents', 'created_at', 'updated_at']
 
 class InvoiceSerializer(serializers.ModelSerializer):
     ledger = LedgerSerializer(read_only=True)
@@ -33,4 +34,54 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'invoice', 'invoice_id', 'amount_cents', 'payment_method', 'paid_at', 'created_at']
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+class LedgerListSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    """Flat ledger rows for list responses; ``?expand=student``."""
+    expandable = {'student': (serializers.StringRelatedField, 'student__user')}
+
+    class Meta:
+        model = Ledger
+        fields = ['id', 'student_id', 'balance_cents', 'opening_balance_cents', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class InvoiceListSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    """Flat invoice rows for list responses; ``?expand=ledger``."""
+    expandable = {'ledger': (LedgerSerializer, 'ledger__student__user')}
+
+    class Meta:
+        model = Invoice
+        fields = ['id', 'ledger_id', 'amount_cents', 'description', 'due_date', 'status', 'billing_run_id', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class PaymentListSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    """Flat payment rows for list responses; ``?expand=invoice``."""
+    expandable = {'invoice': (InvoiceSerializer, 'invoice__ledger__student__user')}
+
+    class Meta:
+        model = Payment
+        fields = ['id', 'invoice_id', 'amount_cents', 'payment_method', 'paid_at', 'created_at']
+        read_only_fields = fields
+
+class FeeScheduleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FeeSchedule
+        fields = ['id', 'program', 'academic_year', 'amount_cents', 'description', 'due_date', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class BillingRunSerializer(serializers.ModelSerializer):
+    academic_year = serializers.PrimaryKeyRelatedField(queryset=AcademicYear.objects.all())
+    program = serializers.PrimaryKeyRelatedField(queryset=Program.objects.all(), required=False, allow_null=True)
+
+    class Meta:
+        model = BillingRun
+        fields = [
+            'id', 'run_id', 'academic_year', 'program', 'status', 'task_id', 'last_student_id', 'students_total',
+            'invoices_created', 'amount_cents', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'status', 'task_id', 'last_student_id', 'students_total', 'invoices_created',
+            'amount_cents', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+        # run_id is an idempotency key: repeating it returns the existing run.
+        extra_kwargs = {'run_id': {'validators': []}}
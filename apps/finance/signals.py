@@ -0,0 +1,22 @@
+"""
+Reverse the ledger postings of deleted invoices and payments (including
+cascades and queryset deletes). Creates and updates are posted in the
+models' `save`.
+"""
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Invoice, Payment
+from .posting import post_invoice_change, post_payment_change
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    # The invoice's payments were deleted (and reversed) just before it.
+    post_invoice_change(instance.pk, instance._loaded_state, (None, 0))
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    post_payment_change(instance._loaded_state, (None, 0))
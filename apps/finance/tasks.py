@@ -0,0 +1,16 @@
+from celery import shared_task
+from .billing import execute_run, run_progress
+from .models import BillingRun
+from .posting import reconcile
+
+@shared_task
+def reconcile_ledgers(fix=False):
+    """Nightly drift check of ledger balances against invoices and payments."""
+    return reconcile(fix=fix)
+
+@shared_task(bind=True)
+def run_billing(self, run_id):
+    """Bill a run to completion; progress is published as the PROGRESS task state."""
+    run = BillingRun.objects.get(run_id=run_id)
+    run = execute_run(run, progress=lambda run: self.update_state(state='PROGRESS', meta=run_progress(run)))
+    return run_progress(run)
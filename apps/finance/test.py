@@ -1,16 +1,20 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.db.models import F
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from unittest.mock import Mock
 from apps.users.models import User
-from apps.academic.models import Student, Program
+from apps.academic.models import AcademicYear, Student, Program
 from apps.hr.models import Department
-from apps.finance.models import Ledger, Invoice, Payment
+from apps.core.testing import QueryBudgetMixin
+from apps.finance.billing import BillingError, bill_chunk, create_run, execute_run
+from apps.finance.models import BillingRun, FeeSchedule, Ledger, LedgerReconciliation, Invoice, Payment
 from apps.finance.serializers import LedgerSerializer, InvoiceSerializer, PaymentSerializer
 from apps.finance.permissions import IsFinanceAdmin
+from apps.finance.posting import reconcile
 from datetime import date, timedelta
 import json
 
@@ -349,4 +353,228 @@ class FinancePermissionTests(APITestCase):
         """Test non-admin cannot access finance endpoints"""
         self.client.force_authenticate(user=self.student_user)
         response = self.client.get('/api/finance/ledgers/')
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class FinanceExportTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(login_id='financeexport', password='pass123', is_staff=True)
+        self.client.force_authenticate(user=self.admin_user)
+        student = Student.objects.create(user=User.objects.create_user(login_id='payer', password='pass123'), admission_number='ADM-EXP-1')
+        ledger = Ledger.objects.create(student=student)
+        self.invoice = Invoice.objects.create(ledger=ledger, amount_cents=10000, due_date=date.today())
+        for cents in (1000, 2000, 3000):
+            Payment.objects.create(invoice=self.invoice, amount_cents=cents, payment_method='cash')
+
+    def _body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_payment_csv_export_streams_all_rows(self):
+        response = self.client.get('/api/finance/payments/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="payment-', response['Content-Disposition'])
+        lines = self._body(response).decode().splitlines()
+        self.assertEqual(lines[0].split(','), ['id', 'invoice_id', 'invoice__ledger__student_id', 'amount_cents', 'payment_method', 'paid_at', 'created_at'])
+        self.assertEqual([line.split(',')[3] for line in lines[1:]], ['1000', '2000', '3000'])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/api/finance/invoices/export/?export_format=xlsx')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_finance_admin(self):
+        self.client.force_authenticate(user=User.objects.create_user(login_id='nostaff', password='pass123'))
+        response = self.client.get('/api/finance/payments/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_parquet_export(self):
+        from apps.core import exports
+        if exports.pyarrow is None:
+            self.skipTest('pyarrow is not installed')
+        import io
+        import pyarrow.parquet
+        response = self.client.get('/api/finance/payments/export/?export_format=parquet')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        table = pyarrow.parquet.read_table(io.BytesIO(self._body(response)))
+        self.assertEqual(table.column('amount_cents').to_pylist(), [1000, 2000, 3000])
+
+
+class LedgerPostingTests(TestCase):
+    def setUp(self):
+        self.student = Student.objects.create(
+            user=User.objects.create_user(login_id='poster', password='pass123'), admission_number='ADM-POST-1'
+        )
+        self.ledger = Ledger.objects.create(student=self.student, balance_cents=1500)
+        self.other = Ledger.objects.create(student=self.student)
+
+    def _balance(self, ledger):
+        return Ledger.objects.get(pk=ledger.pk).balance_cents
+
+    def test_invoices_and_payments_post_to_the_balance(self):
+        invoice = Invoice.objects.create(ledger=self.ledger, amount_cents=10000, due_date=date.today())
+        payment = Payment.objects.create(invoice=invoice, amount_cents=4000, payment_method='cash')
+        self.assertEqual(self._balance(self.ledger), 7500)
+
+        payment.amount_cents = 6000
+        payment.save()
+        invoice = Invoice.objects.get(pk=invoice.pk)
+        invoice.amount_cents = 12000
+        invoice.save(update_fields=['amount_cents'])
+        self.assertEqual(self._balance(self.ledger), 7500)
+
+        invoice.ledger = self.other
+        invoice.save()
+        self.assertEqual((self._balance(self.ledger), self._balance(self.other)), (1500, 6000))
+
+        invoice.delete()
+        self.assertEqual((self._balance(self.ledger), self._balance(self.other)), (1500, 0))
+
+    def test_stale_ledger_save_does_not_overwrite_postings(self):
+        stale = Ledger.objects.get(pk=self.ledger.pk)
+        Invoice.objects.create(ledger=self.ledger, amount_cents=2000, due_date=date.today())
+        stale.balance_cents += 500  # manual adjustment
+        stale.save()
+        ledger = Ledger.objects.get(pk=self.ledger.pk)
+        self.assertEqual((ledger.balance_cents, ledger.opening_balance_cents), (4000, 2000))
+        self.assertEqual(reconcile(chunk_size=1, workers=1)['drifted'], 0)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        invoice = Invoice.objects.create(ledger=self.other, amount_cents=3000, due_date=date.today())
+        Payment.objects.create(invoice=invoice, amount_cents=1000, payment_method='cash')
+        Invoice.objects.filter(pk=invoice.pk).update(amount_cents=3500)  # bypasses posting
+
+        report = reconcile(chunk_size=1, workers=1)
+        self.assertEqual((report['ledgers'], report['drifted'], report['drift_cents']), (2, 1, 500))
+        self.assertEqual(report['sample'][0]['ledger_id'], self.other.pk)
+        self.assertEqual(self._balance(self.other), 2000)
+
+        reconcile(chunk_size=1, workers=1, fix=True)
+        self.assertEqual(self._balance(self.other), 2500)
+        self.assertEqual(reconcile(workers=1)['drifted'], 0)
+
+    def test_latest_report_is_stored_for_the_api(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(login_id='reconciler', password='pass123', is_staff=True))
+        self.assertEqual(client.get('/api/finance/ledgers/reconciliation/').data, {'detail': 'No reconciliation has run yet.'})
+        reconcile(workers=1)
+        report = reconcile(workers=1, fix=True)
+        self.assertEqual(LedgerReconciliation.objects.count(), 2)
+        self.assertEqual(client.get('/api/finance/ledgers/reconciliation/').data, report)
+
+    def test_reconcile_baselines_ledgers_that_predate_posting(self):
+        Invoice.objects.create(ledger=self.other, amount_cents=3000, due_date=date.today())
+        # A balance carried over from before postings, with no opening balance recorded.
+        Ledger.objects.filter(pk=self.other.pk).update(opening_balance_cents=None, balance_cents=F('balance_cents') + 5000)
+
+        report = reconcile(chunk_size=1, workers=1)
+        self.assertEqual((report['drifted'], report['legacy']), (0, 1))
+        report = reconcile(chunk_size=1, workers=1, fix=True)
+        self.assertEqual((report['drifted'], report['legacy']), (0, 1))
+        ledger = Ledger.objects.get(pk=self.other.pk)
+        self.assertEqual((ledger.balance_cents, ledger.opening_balance_cents), (8000, 5000))
+        self.assertEqual(reconcile(workers=1)['legacy'], 0)
+
+
+# Audit rows are written inline, so the queued task is the only commit callback.
+@override_settings(AUDIT_ASYNC=False)
+class BillingRunTests(APITestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Billing Dept')
+        self.year = AcademicYear.objects.create(name='2026/2027', start_date=date(2026, 9, 1), end_date=date(2027, 6, 30))
+        self.programs = [Program.objects.create(name=f'Program {i}', department=department) for i in range(3)]
+        for program, cents in zip(self.programs[:2], (50000, 70000)):
+            FeeSchedule.objects.create(program=program, academic_year=self.year, amount_cents=cents, due_date=date(2026, 9, 30))
+        self.students = [
+            Student.objects.create(
+                user=User.objects.create_user(login_id=f'billed{i}', password='pass123'),
+                admission_number=f'ADM-BILL-{i}', program=self.programs[i % 3],
+            )
+            for i in range(7)
+        ]
+        self.existing = Ledger.objects.create(student=self.students[0], balance_cents=1000)
+
+    def test_run_invoices_every_scheduled_student_once(self):
+        run, created = create_run('2026-T1', self.year)
+        seen = []
+        run = execute_run(run, chunk_size=2, progress=lambda run: seen.append(run.invoices_created))
+        self.assertTrue(created)
+        self.assertEqual((run.status, run.students_total, run.invoices_created), ('completed', 5, 5))
+        self.assertEqual(run.amount_cents, 3 * 50000 + 2 * 70000)
+        self.assertEqual(seen, [2, 4, 5, 5])
+        self.assertEqual(Ledger.objects.get(pk=self.existing.pk).balance_cents, 51000)
+        self.assertEqual(Ledger.objects.get(student=self.students[1]).balance_cents, 70000)
+        self.assertFalse(Ledger.objects.filter(student=self.students[2]).exists())
+
+        again, created = create_run('2026-T1', self.year)
+        self.assertEqual((again.pk, created), (run.pk, False))
+        execute_run(again)
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 5)
+        self.assertEqual(reconcile(workers=1)['drifted'], 0)
+        with self.assertRaises(BillingError):
+            create_run('2026-T1', self.year, self.programs[0])
+
+    def test_interrupted_run_resumes_from_cursor(self):
+        run, _ = create_run('2026-T1-resume', self.year, self.programs[0])
+        run = bill_chunk(run, chunk_size=2)
+        self.assertEqual((run.status, run.invoices_created), ('pending', 2))
+        run = execute_run(run, chunk_size=2)
+        self.assertEqual((run.status, run.invoices_created), ('completed', 3))
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 3)
+
+    def test_api_starts_run_once_per_run_id(self):
+        self.client.force_authenticate(User.objects.create_user(login_id='bursar', password='pass123', is_staff=True))
+        payload = {'run_id': 'api-run', 'academic_year': self.year.pk}
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/finance/billing-runs/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(response.data['task_id'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/finance/billing-runs/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(callbacks), 0)
+        self.assertEqual(BillingRun.objects.count(), 1)
+
+
+class FinanceQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Finance endpoints stay within a fixed query budget however many rows a page holds."""
+    # Keyset pages issue no COUNT and force_authenticate skips the user lookup,
+    # so each page is a single SELECT.
+    BUDGETS = {
+        '/api/finance/ledgers/': 1,
+        '/api/finance/ledgers/?expand=student': 1,
+        '/api/finance/invoices/': 1,
+        '/api/finance/invoices/?expand=ledger': 1,
+        '/api/finance/payments/': 1,
+        '/api/finance/payments/?expand=invoice': 1,
+    }
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(login_id='auditor', password='pass123', is_staff=True))
+        for i in range(12):
+            student = Student.objects.create(
+                user=User.objects.create_user(login_id=f'budget{i}', password='pass123'), admission_number=f'ADM-Q-{i}'
+            )
+            invoice = Invoice.objects.create(ledger=Ledger.objects.create(student=student), amount_cents=1000, due_date=date.today())
+            Payment.objects.create(invoice=invoice, amount_cents=400, payment_method='cash')
+        self.payment = Payment.objects.first()
+
+    def test_list_endpoints_within_budget(self):
+        for url, budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                response = self.assertQueryBudget('get', url, budget)
+                self.assertEqual(len(response.data['results']), 12)
+
+    def test_list_is_flat_unless_expanded(self):
+        row = self.client.get('/api/finance/payments/').data['results'][0]
+        self.assertEqual(row['invoice_id'], Payment.objects.get(pk=row['id']).invoice_id)
+        self.assertNotIn('invoice', row)
+        row = self.client.get('/api/finance/payments/?expand=invoice').data['results'][0]
+        self.assertEqual(row['invoice']['ledger']['student'], str(Payment.objects.get(pk=row['id']).invoice.ledger.student))
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get('/api/finance/payments/?expand=ledger')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_within_budget(self):
+        response = self.assertQueryBudget('get', f'/api/finance/payments/{self.payment.pk}/', 1)
+        self.assertEqual(response.data['invoice']['ledger']['student'], str(self.payment.invoice.ledger.student))
@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LedgerViewSet, InvoiceViewSet, PaymentViewSet
+from .views import BillingRunViewSet, FeeScheduleViewSet, LedgerViewSet, InvoiceViewSet, PaymentViewSet
 
 router = DefaultRouter()
 router.register(r'ledgers', LedgerViewSet)
 router.register(r'invoices', InvoiceViewSet)
 router.register(r'payments', PaymentViewSet)
+router.register(r'fee-schedules', FeeScheduleViewSet)
+router.register(r'billing-runs', BillingRunViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,20 +1,97 @@
-from rest_framework import viewsets
+import uuid
+from django.db import transaction
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from .models import Ledger, Invoice, Payment
-from .serializers import LedgerSerializer, InvoiceSerializer, PaymentSerializer
+from rest_framework.response import Response
+from .models import BillingRun, FeeSchedule, Ledger, Invoice, Payment
+from .serializers import (
+    BillingRunSerializer, FeeScheduleSerializer, LedgerSerializer, InvoiceSerializer, PaymentSerializer,
+    LedgerListSerializer, InvoiceListSerializer, PaymentListSerializer,
+)
+from .billing import BillingError, create_run
 from .permissions import IsFinanceAdmin
+from .posting import last_report
+from apps.core.expansion import ExpandMixin
+from apps.core.exports import ExportMixin
 
-class LedgerViewSet(viewsets.ModelViewSet):
+class LedgerViewSet(ExpandMixin, viewsets.ModelViewSet):
     queryset = Ledger.objects.all()
     serializer_class = LedgerSerializer
+    list_serializer_class = LedgerListSerializer
+    detail_select_related = ('student__user',)
     permission_classes = [IsAuthenticated, IsFinanceAdmin]
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def reconciliation(self, request):
+        """The latest reconciliation report (see ``manage.py reconcile_ledgers``)."""
+        return Response(last_report() or {'detail': 'No reconciliation has run yet.'})
+
+class InvoiceViewSet(ExpandMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
+    list_serializer_class = InvoiceListSerializer
+    detail_select_related = ('ledger__student__user',)
     permission_classes = [IsAuthenticated, IsFinanceAdmin]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['ledger', 'status', 'billing_run']
+    ordering_fields = ['created_at', 'due_date']
+    ordering = ['-created_at']
+    export_fields = ['id', 'ledger_id', 'ledger__student_id', 'amount_cents', 'description', 'due_date', 'status', 'created_at', 'updated_at']
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ExpandMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
-    permission_classes = [IsAuthenticated, IsFinanceAdmin]
\ No newline at end of file
+    list_serializer_class = PaymentListSerializer
+    detail_select_related = ('invoice__ledger__student__user',)
+    permission_classes = [IsAuthenticated, IsFinanceAdmin]
+    ordering = ['-created_at']
+    export_fields = ['id', 'invoice_id', 'invoice__ledger__student_id', 'amount_cents', 'payment_method', 'paid_at', 'created_at']
+
+class FeeScheduleViewSet(viewsets.ModelViewSet):
+    queryset = FeeSchedule.objects.select_related('program', 'academic_year')
+    serializer_class = FeeScheduleSerializer
+    permission_classes = [IsAuthenticated, IsFinanceAdmin]
+    ordering = ['-created_at']
+
+class BillingRunViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Bulk invoicing runs. POSTing a ``run_id`` starts the run in the background;
+    POSTing the same ``run_id`` again returns the existing run. Progress is on
+    the run and in the Celery result for ``task_id``.
+    """
+    queryset = BillingRun.objects.all()
+    serializer_class = BillingRunSerializer
+    permission_classes = [IsAuthenticated, IsFinanceAdmin]
+    ordering = ['-created_at']
+
+    def _enqueue(self, run):
+        from .tasks import run_billing
+
+        run.task_id = str(uuid.uuid4())
+        run.save(update_fields=['task_id'])
+        transaction.on_commit(lambda: run_billing.apply_async(args=[run.run_id], task_id=run.task_id))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            with transaction.atomic():
+                run, created = create_run(data['run_id'], data['academic_year'], data.get('program'), request.user)
+                if created:
+                    self._enqueue(run)
+        except BillingError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(run).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Re-queue a failed or interrupted run; it continues from its cursor."""
+        run = self.get_object()
+        if run.status == 'completed':
+            return Response({'detail': 'Billing run already completed.'}, status=status.HTTP_409_CONFLICT)
+        with transaction.atomic():
+            self._enqueue(run)
+        return Response(self.get_serializer(run).data, status=status.HTTP_202_ACCEPTED)
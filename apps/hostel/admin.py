@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Hostel, Floor, Room, Bed, Student, Booking, Complaint
+from .models import Hostel, Floor, Room, Bed, BedAvailability, Student, Booking, Complaint
 
 @admin.register(Hostel)
 class HostelAdmin(admin.ModelAdmin):
@@ -30,6 +30,12 @@ class BedAdmin(admin.ModelAdmin):
     search_fields = ['number', 'room__number', 'room__floor__hostel__name']
     ordering = ['room__floor__hostel__name', 'room__number', 'number']
 
+@admin.register(BedAvailability)
+class BedAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ['hostel', 'floor', 'room_type', 'free_beds', 'total_beds', 'updated_at']
+    list_filter = ['hostel', 'room_type']
+    ordering = ['hostel__name', 'floor__number', 'room_type']
+
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['user', 'registration_number', 'phone_number', 'created_at']
@@ -0,0 +1,128 @@
+"""
+Bulk bed allocation.
+
+`allocate` places a ranked list of students in one transaction. Requests
+are grouped by preference (hostel, floor, room type); the beds for each
+preference are claimed with a single ``SELECT ... FOR UPDATE SKIP LOCKED
+LIMIT n``, so concurrent allocations pass over each other's beds instead of
+waiting and never claim the same bed. A single booking locks its bed
+without skipping: it waits for an allocation holding that bed to finish,
+then finds the bed taken and is refused. Beds, bookings and the
+`BedAvailability` index are then written with set-based statements —
+placing an intake of thousands costs a few queries per distinct preference
+rather than several per student.
+
+Within a preference, rank order is strict. Preferences are served in the
+order their best-ranked request appears, which is what decides who misses
+out when overlapping preferences (e.g. "any hostel" and "hostel A") compete
+for the last beds.
+"""
+
+import logging
+from collections import Counter, namedtuple
+
+from django.db import transaction
+
+from .models import Bed, BedAvailability, Booking
+from .occupancy import ACTIVE_STATUSES, adjust_availability, free_beds_q
+
+logger = logging.getLogger(__name__)
+
+AllocationRequest = namedtuple('AllocationRequest', 'student_id hostel_id floor_id room_type')
+AllocationRequest.__new__.__defaults__ = (None, None, None)
+
+
+def _index_free(request):
+    """Free beds the index reports for a preference; None if it has no rows for it."""
+    qs = BedAvailability.objects.all()
+    if request.hostel_id:
+        qs = qs.filter(hostel_id=request.hostel_id)
+    if request.floor_id:
+        qs = qs.filter(floor_id=request.floor_id)
+    if request.room_type:
+        qs = qs.filter(room_type=request.room_type)
+    counts = list(qs.values_list('free_beds', flat=True))
+    return sum(counts) if counts else None
+
+
+def _claim_beds(request, count, claimed):
+    """Lock up to ``count`` free beds matching ``request``, skipping locked rows."""
+    beds = Bed.objects.filter(
+        free_beds_q(), room__is_available=True, room__floor__hostel__is_active=True,
+    )
+    if request.hostel_id:
+        beds = beds.filter(room__floor__hostel_id=request.hostel_id)
+    if request.floor_id:
+        beds = beds.filter(room__floor_id=request.floor_id)
+    if request.room_type:
+        beds = beds.filter(room__room_type=request.room_type)
+    if claimed:
+        beds = beds.exclude(pk__in=claimed)
+    # Fill rooms one after another rather than scattering a cohort.
+    return list(
+        beds.select_for_update(skip_locked=True, of=('self',))
+        .order_by('room__floor__hostel_id', 'room__floor__number', 'room_id', 'number')
+        .values_list('pk', 'room__floor_id', 'room__room_type')[:count]
+    )
+
+
+def allocate(requests, start_date, end_date=None, status='confirmed'):
+    """
+    Assign beds to ``requests`` (an ordered iterable of `AllocationRequest`;
+    earlier entries have priority). Students that already hold an active
+    booking, repeat in the list or cannot be placed are reported in
+    ``unallocated`` with a reason. Returns ``{"allocated": [...],
+    "unallocated": [...]}``; allocated entries are ``(student_id, bed_id)``.
+    """
+    assert status in ACTIVE_STATUSES
+    requests = list(requests)
+    unallocated = []
+    allocated = []
+
+    with transaction.atomic():
+        booked = set(
+            Booking.objects.filter(student_id__in={r.student_id for r in requests}, status__in=ACTIVE_STATUSES)
+            .values_list('student_id', flat=True)
+        )
+        seen = set()
+        queue = []
+        for request in requests:
+            if request.student_id in booked:
+                unallocated.append({'student': request.student_id, 'reason': 'Student already has an active booking.'})
+            elif request.student_id in seen:
+                unallocated.append({'student': request.student_id, 'reason': 'Duplicate request.'})
+            else:
+                seen.add(request.student_id)
+                queue.append(request)
+
+        by_preference = {}
+        for rank, request in enumerate(queue):
+            by_preference.setdefault(request[1:], []).append((rank, request))
+
+        claimed = []
+        freed = Counter()
+        placed = []
+        for group in by_preference.values():
+            preference = group[0][1]
+            beds = _claim_beds(preference, len(group), claimed) if _index_free(preference) != 0 else []
+            for (rank, request), (bed_id, floor_id, room_type) in zip(group, beds):
+                placed.append((rank, request.student_id, bed_id))
+                claimed.append(bed_id)
+                freed[(floor_id, room_type)] -= 1
+            for _, request in group[len(beds):]:
+                unallocated.append({'student': request.student_id, 'reason': 'No free bed matches the request.'})
+        allocated = [(student_id, bed_id) for _, student_id, bed_id in sorted(placed)]
+
+        if allocated:
+            # A bed's previous, cancelled booking blocks the one-to-one link.
+            Booking.objects.filter(bed_id__in=claimed).exclude(status__in=ACTIVE_STATUSES).delete()
+            Booking.objects.bulk_create([
+                Booking(student_id=student_id, bed_id=bed_id, start_date=start_date, end_date=end_date, status=status)
+                for student_id, bed_id in allocated
+            ], batch_size=1000)
+            if status == 'confirmed':
+                Bed.objects.filter(pk__in=claimed).update(is_occupied=True)
+            adjust_availability(freed)
+
+    logger.info("Allocated %s beds, %s requests unplaced", len(allocated), len(unallocated))
+    return {'allocated': allocated, 'unallocated': unallocated}
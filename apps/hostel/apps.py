@@ -5,4 +5,5 @@ class HostelConfig(AppConfig):
     name = 'apps.hostel'
     verbose_name = "Hostel Management"
 
-    
\ No newline at end of file
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.hostel.occupancy import rebuild_availability
+
+
+class Command(BaseCommand):
+    help = "Recompute the hostel bed availability index from the bed table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hostel", type=int, help="Only rebuild this hostel id.")
+
+    def handle(self, *args, **options):
+        rows = rebuild_availability(hostel_id=options.get("hostel"))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} availability rows."))
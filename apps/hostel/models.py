@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 class Hostel(models.Model):
@@ -48,6 +48,30 @@ class Bed(models.Model):
         unique_together = ['room', 'number']
         ordering = ['number']
 
+class BedAvailability(models.Model):
+    """
+    Denormalized free-bed counts per floor and room type (hostel copied in
+    for filtering), so allocation and occupancy queries never scan `Bed`.
+    Rebuilt from scratch by `apps.hostel.occupancy.rebuild_availability`.
+    """
+    hostel = models.ForeignKey(Hostel, on_delete=models.CASCADE, related_name='availability')
+    floor = models.ForeignKey(Floor, on_delete=models.CASCADE, related_name='availability')
+    room_type = models.CharField(max_length=20, choices=Room.ROOM_TYPES)
+    total_beds = models.PositiveIntegerField(default=0)
+    free_beds = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['floor', 'room_type']
+        ordering = ['hostel', 'floor', 'room_type']
+        verbose_name_plural = 'Bed availability'
+        indexes = [
+            models.Index(fields=['hostel', 'room_type'], name='bedavail_hostel_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.floor_id}/{self.room_type}: {self.free_beds}/{self.total_beds} free"
+
 class Student(models.Model):
     user = models.OneToOneField('users.User', on_delete=models.CASCADE)
     registration_number = models.CharField(max_length=20, unique=True)
@@ -66,24 +90,41 @@ class Booking(models.Model):
         ('confirmed', 'Confirmed'),
         ('cancelled', 'Cancelled'),
     ]
-    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='bookings')
+    # Indexed by booking_student_status_idx.
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='bookings', db_index=False)
     bed = models.OneToOneField(Bed, on_delete=models.CASCADE, related_name='booking')
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # (bed_id, status) as last loaded from or written to the database
+    _loaded_state = (None, None)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('bed_id'), instance.__dict__.get('status'))
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.status == 'confirmed':
-            self.bed.is_occupied = True
-            self.bed.save()
-        elif self.status == 'cancelled':
-            self.bed.is_occupied = False
-            self.bed.save()
-        super().save(*args, **kwargs)
+        from .occupancy import apply_booking_transition
+
+        old_bed_id, old_status = self._loaded_state
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if (old_bed_id, old_status) != (self.bed_id, self.status):
+                # Set-based bed update plus availability counters, same transaction.
+                occupied = apply_booking_transition(old_bed_id, old_status, self.bed_id, self.status)
+                if occupied is not None and Booking.bed.is_cached(self):
+                    self.bed.is_occupied = occupied
+        self._loaded_state = (self.bed_id, self.status)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', 'status', 'created_at', 'id'], name='booking_student_status_idx'),
+        ]
 
 class Complaint(models.Model):
     STATUS_CHOICES = [
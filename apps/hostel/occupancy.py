@@ -0,0 +1,173 @@
+"""
+Bed availability index.
+
+`BedAvailability` keeps free and total bed counts per floor and room type.
+Every change that can free or take a bed — booking status transitions,
+beds being added, removed or toggled, rooms changing floor or type — adjusts
+the counters with an ``F()`` update inside the same transaction, so
+occupancy reads never touch the `Bed` table. `rebuild_availability`
+recomputes everything from scratch for reconciliation.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+
+from .models import Bed, BedAvailability, Floor
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+OCCUPANCY_GROUPS = {
+    'hostel': ['hostel_id', 'hostel__name'],
+    'floor': ['hostel_id', 'hostel__name', 'floor_id', 'floor__number'],
+    'room_type': ['room_type'],
+    'hostel_room_type': ['hostel_id', 'hostel__name', 'room_type'],
+}
+
+
+def free_beds_q(prefix=''):
+    """Beds that are unoccupied and not held by a pending or confirmed booking."""
+    return Q(**{f'{prefix}is_occupied': False}) & (
+        Q(**{f'{prefix}booking__isnull': True}) | ~Q(**{f'{prefix}booking__status__in': ACTIVE_STATUSES})
+    )
+
+
+def rebuild_availability(hostel_id=None):
+    """Recompute the availability index from the bed table (reconciliation)."""
+    beds = Bed.objects.all()
+    floors = Floor.objects.all()
+    if hostel_id is not None:
+        beds = beds.filter(room__floor__hostel_id=hostel_id)
+        floors = floors.filter(hostel_id=hostel_id)
+    counts = (
+        beds.values('room__floor_id', 'room__floor__hostel_id', 'room__room_type')
+        .annotate(total=Count('pk', distinct=True), free=Count('pk', filter=free_beds_q(), distinct=True))
+    )
+    rows = [
+        BedAvailability(
+            hostel_id=row['room__floor__hostel_id'], floor_id=row['room__floor_id'],
+            room_type=row['room__room_type'], total_beds=row['total'], free_beds=row['free'],
+        )
+        for row in counts
+    ]
+    with transaction.atomic():
+        BedAvailability.objects.filter(floor__in=floors).delete()
+        BedAvailability.objects.bulk_create(rows)
+    return len(rows)
+
+
+def adjust_availability(deltas, total_deltas=None):
+    """
+    Apply ``{(floor_id, room_type): change}`` to ``free_beds`` (and optionally
+    ``total_beds``) in one UPDATE, creating missing index rows first.
+    """
+    deltas = {key: value for key, value in deltas.items() if value}
+    total_deltas = {key: value for key, value in (total_deltas or {}).items() if value}
+    keys = set(deltas) | set(total_deltas)
+    if not keys:
+        return
+    floor_ids = {floor_id for floor_id, _ in keys}
+    existing = set(
+        BedAvailability.objects.filter(floor_id__in=floor_ids).values_list('floor_id', 'room_type')
+    )
+    missing = keys - existing
+    if missing:
+        hostels = dict(Floor.objects.filter(pk__in={f for f, _ in missing}).values_list('pk', 'hostel_id'))
+        BedAvailability.objects.bulk_create(
+            [BedAvailability(hostel_id=hostels[f], floor_id=f, room_type=t) for f, t in missing if f in hostels],
+            ignore_conflicts=True,
+        )
+
+    def case(field, changes):
+        return Case(
+            *[When(floor_id=f, room_type=t, then=F(field) + change) for (f, t), change in changes.items()],
+            default=F(field),
+            output_field=IntegerField(),
+        )
+
+    updates = {}
+    if deltas:
+        updates['free_beds'] = case('free_beds', deltas)
+    if total_deltas:
+        updates['total_beds'] = case('total_beds', total_deltas)
+    match = Q()
+    for floor_id, room_type in keys:
+        match |= Q(floor_id=floor_id, room_type=room_type)
+    BedAvailability.objects.filter(match).update(**updates)
+
+
+def bed_state(bed_id):
+    """``(floor_id, room_type, is_occupied)`` of a bed, or None if it is gone."""
+    return Bed.objects.filter(pk=bed_id).values_list('room__floor_id', 'room__room_type', 'is_occupied').first()
+
+
+def is_free(is_occupied, booking_status):
+    """A bed is free when it is unoccupied and no pending/confirmed booking holds it."""
+    return not is_occupied and booking_status not in ACTIVE_STATUSES
+
+
+def _occupied_after(status, is_occupied):
+    # Confirming a booking occupies the bed, cancelling releases it,
+    # anything else leaves the flag alone.
+    return {'confirmed': True, 'cancelled': False}.get(status, is_occupied)
+
+
+def apply_booking_transition(old_bed_id, old_status, new_bed_id, new_status):
+    """
+    Bring ``Bed.is_occupied`` and the index in line with a booking that moved
+    from ``(old_bed_id, old_status)`` to ``(new_bed_id, new_status)``; a new
+    booking has ``None`` for both old values. Must run inside the booking's
+    transaction. Returns the new bed's occupied flag if it changed.
+    """
+    deltas = Counter()
+    flags = {}
+    if old_bed_id and old_bed_id != new_bed_id:
+        state = bed_state(old_bed_id)
+        if state:
+            floor_id, room_type, occupied = state
+            after = False if old_status == 'confirmed' else occupied
+            deltas[(floor_id, room_type)] += is_free(after, None) - is_free(occupied, old_status)
+            if after != occupied:
+                flags[old_bed_id] = after
+        old_status = None
+    state = bed_state(new_bed_id) if new_bed_id else None
+    if state:
+        floor_id, room_type, occupied = state
+        after = _occupied_after(new_status, occupied)
+        deltas[(floor_id, room_type)] += is_free(after, new_status) - is_free(occupied, old_status)
+        if after != occupied:
+            flags[new_bed_id] = after
+    for bed_id, occupied in flags.items():
+        Bed.objects.filter(pk=bed_id).update(is_occupied=occupied)
+    adjust_availability(deltas)
+    return flags.get(new_bed_id)
+
+
+def apply_booking_removal(bed_id, status):
+    """Release the bed of a deleted booking; a confirmed booking's bed is vacated."""
+    state = bed_state(bed_id)
+    if not state:
+        return
+    floor_id, room_type, occupied = state
+    after = False if status == 'confirmed' else occupied
+    if after != occupied:
+        Bed.objects.filter(pk=bed_id).update(is_occupied=after)
+    adjust_availability({(floor_id, room_type): is_free(after, None) - is_free(occupied, status)})
+
+
+def occupancy(group_by='hostel', hostel_id=None):
+    """Aggregate the index into occupancy rows; cost is O(index rows)."""
+    fields = OCCUPANCY_GROUPS[group_by]
+    rows = BedAvailability.objects.all()
+    if hostel_id is not None:
+        rows = rows.filter(hostel_id=hostel_id)
+    rows = rows.values(*fields).annotate(total_beds=Sum('total_beds'), free_beds=Sum('free_beds')).order_by(*fields)
+    result = []
+    for row in rows:
+        total, free = row['total_beds'] or 0, row['free_beds'] or 0
+        row['total_beds'], row['free_beds'] = total, free
+        row['occupied_beds'] = total - free
+        row['occupancy_rate'] = round(100.0 * (total - free) / total, 2) if total else 0.0
+        result.append(row)
+    return result
@@ -1,10 +1,13 @@
 from rest_framework import permissions
+from apps.users.roles import get_roles
+
+HOSTEL_ADMIN_GROUPS = ('HostelAdmin', 'SuperAdmin')
 
 class IsHostelAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and (
-            request.user.is_superuser or
-            request.user.groups.filter(name__in=['HostelAdmin', 'SuperAdmin']).exists()
+        roles = get_roles(request.user)
+        return roles.is_authenticated and (
+            roles.is_superuser or roles.in_group(*HOSTEL_ADMIN_GROUPS)
         )
 
 class IsStudentOrHostelAdmin(permissions.BasePermission):
@@ -12,8 +15,9 @@ class IsStudentOrHostelAdmin(permissions.BasePermission):
         return request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
+        roles = get_roles(request.user)
         return (
             hasattr(obj, 'student') and obj.student.user == request.user or
-            request.user.is_superuser or
-            request.user.groups.filter(name__in=['HostelAdmin', 'SuperAdmin']).exists()
+            roles.is_superuser or
+            roles.in_group(*HOSTEL_ADMIN_GROUPS)
         )
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import Hostel, Floor, Room, Bed, Student, Booking, Complaint
+from .occupancy import ACTIVE_STATUSES, free_beds_q
+from django.db import transaction
 from django.utils import timezone
 from apps.users.models import User  # This import is necessary for the ReadOnlyField source
 
@@ -50,16 +52,25 @@ class CreateBookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ['bed', 'start_date', 'end_date']
+        # Availability is checked below; a cancelled booking does not keep the bed.
+        extra_kwargs = {'bed': {'validators': []}}
 
     def validate(self, data):
-        bed = data['bed']
-        if bed.is_occupied:
-            raise serializers.ValidationError("This bed is already occupied.")
+        if not Bed.objects.filter(free_beds_q(), pk=data['bed'].pk).exists():
+            raise serializers.ValidationError("This bed is already taken.")
         return data
 
     def save(self, **kwargs):
         student = self.context['student']
-        return super().save(student=student, status='pending', **kwargs)
+        bed = self.validated_data['bed']
+        with transaction.atomic():
+            # Waits for an allocation or booking holding the bed, then re-checks.
+            list(Bed.objects.select_for_update().filter(pk=bed.pk).values_list('pk', flat=True))
+            if not Bed.objects.filter(free_beds_q(), pk=bed.pk).exists():
+                raise serializers.ValidationError("This bed is already taken.")
+            # A cancelled booking still holds the bed's one-to-one link.
+            Booking.objects.filter(bed=bed).exclude(status__in=ACTIVE_STATUSES).delete()
+            return super().save(student=student, status='pending', **kwargs)
 
 class ResolveComplaintSerializer(serializers.ModelSerializer):
     class Meta:
@@ -73,4 +84,27 @@ class ResolveComplaintSerializer(serializers.ModelSerializer):
         complaint.status = 'resolved'
         complaint.resolved_at = timezone.now()
         complaint.save()
-        return complaint
\ No newline at end of file
+        return complaint
+
+class AllocationRequestSerializer(serializers.Serializer):
+    student = serializers.IntegerField(min_value=1)
+    hostel = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    floor = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    room_type = serializers.ChoiceField(choices=Room.ROOM_TYPES, required=False, allow_null=True)
+
+class BulkAllocationSerializer(serializers.Serializer):
+    """A ranked intake list; earlier requests are placed first."""
+    requests = AllocationRequestSerializer(many=True, allow_empty=False, max_length=10000)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=['pending', 'confirmed'], default='confirmed')
+
+    def validate_requests(self, value):
+        # One query for the whole list instead of a lookup per row.
+        ids = {item['student'] for item in value}
+        known = set(Student.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        unknown = sorted(ids - known)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown students: {', '.join(map(str, unknown[:50]))}.")
+        return value
+
@@ -0,0 +1,95 @@
+"""
+Keep the bed availability index in step with beds, rooms and booking deletes.
+Booking status transitions are handled in `Booking.save`.
+"""
+
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Bed, Booking, Room
+from .occupancy import adjust_availability, apply_booking_removal, free_beds_q, is_free
+
+
+def _booking_status(bed_id):
+    return Booking.objects.filter(bed_id=bed_id).values_list('status', flat=True).first()
+
+
+@receiver(pre_save, sender=Bed)
+def remember_bed_state(sender, instance, raw=False, **kwargs):
+    instance._index_before = None
+    if instance.pk and not raw:
+        instance._index_before = (
+            Bed.objects.filter(pk=instance.pk)
+            .values_list('room__floor_id', 'room__room_type', 'is_occupied')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Bed)
+def bed_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    key = Room.objects.filter(pk=instance.room_id).values_list('floor_id', 'room_type').first()
+    if key is None:
+        return
+    if created:
+        adjust_availability({key: int(not instance.is_occupied)}, {key: 1})
+        return
+    before = getattr(instance, '_index_before', None)
+    if before is None:
+        return
+    old_key, was_occupied = before[:2], before[2]
+    if old_key == key and was_occupied == instance.is_occupied:
+        return
+    status = _booking_status(instance.pk)
+    free_before, free_after = is_free(was_occupied, status), is_free(instance.is_occupied, status)
+    if old_key == key:
+        adjust_availability({key: free_after - free_before})
+    else:
+        adjust_availability({old_key: -free_before, key: free_after}, {old_key: -1, key: 1})
+
+
+@receiver(pre_delete, sender=Bed)
+def remember_deleted_bed(sender, instance, **kwargs):
+    # The bed's booking is deleted first (cascade) and vacates a confirmed bed,
+    # so record whether the bed will be free by the time the bed row goes.
+    status = _booking_status(instance.pk)
+    occupied = False if status == 'confirmed' else instance.is_occupied
+    instance._index_free_at_delete = not occupied
+    instance._index_key = Room.objects.filter(pk=instance.room_id).values_list('floor_id', 'room_type').first()
+
+
+@receiver(post_delete, sender=Bed)
+def bed_deleted(sender, instance, **kwargs):
+    key = getattr(instance, '_index_key', None)
+    if key:
+        adjust_availability({key: -int(instance._index_free_at_delete)}, {key: -1})
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    apply_booking_removal(instance.bed_id, instance.status)
+
+
+@receiver(pre_save, sender=Room)
+def remember_room_key(sender, instance, raw=False, **kwargs):
+    instance._index_before = None
+    if instance.pk and not raw:
+        instance._index_before = Room.objects.filter(pk=instance.pk).values_list('floor_id', 'room_type').first()
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, raw=False, **kwargs):
+    old_key = getattr(instance, '_index_before', None)
+    new_key = (instance.floor_id, instance.room_type)
+    if raw or created or old_key is None or old_key == new_key:
+        return
+    counts = Bed.objects.filter(room_id=instance.pk).aggregate(
+        total=Count('pk', distinct=True), free=Count('pk', filter=free_beds_q(), distinct=True)
+    )
+    if counts['total']:
+        adjust_availability(
+            {old_key: -counts['free'], new_key: counts['free']},
+            {old_key: -counts['total'], new_key: counts['total']},
+        )
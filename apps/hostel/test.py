@@ -6,7 +6,9 @@ from datetime import timedelta
 from rest_framework.test import APIClient
 from django.contrib.auth.models import Group
 from apps.users.models import User
-from .models import Hostel, Floor, Room, Bed, Student, Booking, Complaint
+from .models import Hostel, Floor, Room, Bed, BedAvailability, Student, Booking, Complaint
+from .allocation import AllocationRequest, allocate
+from .occupancy import occupancy, rebuild_availability
 from .filters import RoomFilter, BookingFilter
 
 logger = logging.getLogger(__name__)
@@ -189,6 +191,22 @@ class HostelAPITests(LiveServerTestCase):
         self.assertEqual(booking.student, self.student)
         self.assertEqual(booking.status, 'pending')
 
+    def test_booking_a_held_bed_is_refused(self):
+        url = reverse('booking-create-booking')
+        data = {'bed': self.bed.id, 'start_date': timezone.now().date().isoformat()}
+        other = Student.objects.create(
+            user=User.objects.create_user(login_id='other', password='testpass123'), registration_number='STU002',
+        )
+        held = Booking.objects.create(student=other, bed=self.bed, start_date=timezone.now().date())
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        held.status = 'cancelled'
+        held.save()
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.get(bed=self.bed).student, self.student)
+
     def test_create_complaint(self):
         logger.debug("Testing create complaint API")
         url = reverse('complaint-list')
@@ -221,4 +239,158 @@ class HostelAPITests(LiveServerTestCase):
         self.assertEqual(response.status_code, 200)
         complaint.refresh_from_db()
         self.assertEqual(complaint.status, 'resolved')
-        self.assertIsNotNone(complaint.resolved_at)
\ No newline at end of file
+        self.assertIsNotNone(complaint.resolved_at)
+
+
+class AllocationTests(TestCase):
+    def setUp(self):
+        self.hostel = Hostel.objects.create(name='Intake Hostel', address='Campus', capacity=5)
+        ground = Floor.objects.create(hostel=self.hostel, number=0)
+        upper = Floor.objects.create(hostel=self.hostel, number=1)
+        for number in ('G1', 'G2'):
+            room = Room.objects.create(floor=ground, number=number, room_type='double', capacity=2)
+            Bed.objects.bulk_create([Bed(room=room, number='A'), Bed(room=room, number='B')])
+        single = Room.objects.create(floor=upper, number='U1', room_type='single', capacity=1)
+        self.single_bed = Bed.objects.create(room=single, number='A')
+        self.students = [
+            Student.objects.create(
+                user=User.objects.create_user(login_id=f'fresher{i}', password='testpass123'),
+                registration_number=f'REG{i:03d}',
+            )
+            for i in range(6)
+        ]
+        rebuild_availability()
+
+    def _free(self, room_type):
+        return BedAvailability.objects.get(hostel=self.hostel, room_type=room_type).free_beds
+
+    def test_places_students_in_rank_order(self):
+        requests = [AllocationRequest(s.pk, room_type='double') for s in self.students[:5]]
+        result = allocate(requests, start_date=timezone.now().date())
+        self.assertEqual([student for student, _ in result['allocated']], [s.pk for s in self.students[:4]])
+        self.assertEqual(result['unallocated'], [{'student': self.students[4].pk, 'reason': 'No free bed matches the request.'}])
+        self.assertEqual(Bed.objects.filter(room__room_type='double', is_occupied=True).count(), 4)
+        self.assertEqual(Booking.objects.filter(status='confirmed').count(), 4)
+        self.assertEqual(self._free('double'), 0)
+        self.assertEqual(self._free('single'), 1)
+
+    def test_skips_booked_and_duplicate_students(self):
+        Booking.objects.create(student=self.students[0], bed=self.single_bed, start_date=timezone.now().date(), status='pending')
+        rebuild_availability()
+        requests = [AllocationRequest(self.students[0].pk), AllocationRequest(self.students[1].pk), AllocationRequest(self.students[1].pk)]
+        result = allocate(requests, start_date=timezone.now().date())
+        self.assertEqual(len(result['allocated']), 1)
+        self.assertEqual([u['reason'] for u in result['unallocated']], ['Student already has an active booking.', 'Duplicate request.'])
+
+    def test_reuses_bed_after_cancelled_booking(self):
+        booking = Booking.objects.create(student=self.students[0], bed=self.single_bed, start_date=timezone.now().date(), status='confirmed')
+        booking.status = 'cancelled'
+        booking.save()
+        rebuild_availability()
+        result = allocate([AllocationRequest(self.students[1].pk, room_type='single')], start_date=timezone.now().date())
+        self.assertEqual(result['allocated'], [(self.students[1].pk, self.single_bed.pk)])
+        self.assertEqual(Booking.objects.get(bed=self.single_bed).student, self.students[1])
+
+    def test_rebuild_matches_incremental_index(self):
+        allocate([AllocationRequest(s.pk) for s in self.students[:3]], start_date=timezone.now().date())
+        before = set(BedAvailability.objects.values_list('floor_id', 'room_type', 'free_beds', 'total_beds'))
+        rebuild_availability()
+        after = set(BedAvailability.objects.values_list('floor_id', 'room_type', 'free_beds', 'total_beds'))
+        self.assertEqual(before, after)
+
+    def test_allocate_endpoint_requires_hostel_admin(self):
+        client = APIClient()
+        payload = {'start_date': str(timezone.now().date()), 'requests': [{'student': self.students[0].pk, 'room_type': 'single'}]}
+        client.force_authenticate(user=User.objects.create_user(login_id='plainuser', password='testpass123'))
+        self.assertEqual(client.post('/api/hostel/bookings/allocate/', payload, format='json').status_code, 403)
+
+        admin = User.objects.create_user(login_id='warden', password='testpass123')
+        admin.groups.add(Group.objects.get_or_create(name='HostelAdmin')[0])
+        client.force_authenticate(user=admin)
+        response = client.post('/api/hostel/bookings/allocate/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['allocated'], [{'student': self.students[0].pk, 'bed': self.single_bed.pk}])
+
+
+
+class OccupancyTests(TestCase):
+    def setUp(self):
+        self.hostel = Hostel.objects.create(name='Counter Hostel', address='Campus', capacity=3)
+        self.floor = Floor.objects.create(hostel=self.hostel, number=0)
+        self.room = Room.objects.create(floor=self.floor, number='R1', room_type='triple', capacity=3)
+        self.beds = [Bed.objects.create(room=self.room, number=n) for n in 'ABC']
+        self.student = Student.objects.create(
+            user=User.objects.create_user(login_id='boarder', password='testpass123'),
+            registration_number='REG900',
+        )
+
+    def _counts(self):
+        row = BedAvailability.objects.get(floor=self.floor, room_type='triple')
+        return row.total_beds, row.free_beds
+
+    def _assert_matches_rebuild(self):
+        # Emptied rows linger until a rebuild drops them.
+        rows = lambda: set(BedAvailability.objects.exclude(total_beds=0).values_list('floor_id', 'room_type', 'free_beds', 'total_beds'))
+        incremental = rows()
+        rebuild_availability()
+        self.assertEqual(incremental, rows())
+
+    def test_new_beds_are_counted(self):
+        self.assertEqual(self._counts(), (3, 3))
+        self._assert_matches_rebuild()
+
+    def test_booking_transitions_move_counters(self):
+        booking = Booking.objects.create(student=self.student, bed=self.beds[0], start_date=timezone.now().date())
+        self.assertEqual(self._counts(), (3, 2))
+        booking.status = 'confirmed'
+        booking.save()
+        self.assertEqual(self._counts(), (3, 2))
+        self.assertTrue(Bed.objects.get(pk=self.beds[0].pk).is_occupied)
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self._counts(), (3, 3))
+        self.assertFalse(Bed.objects.get(pk=self.beds[0].pk).is_occupied)
+        self._assert_matches_rebuild()
+
+    def test_reloaded_booking_and_moves_between_beds(self):
+        booking = Booking.objects.create(student=self.student, bed=self.beds[0], start_date=timezone.now().date(), status='confirmed')
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.bed = self.beds[1]
+        booking.save()
+        self.assertFalse(Bed.objects.get(pk=self.beds[0].pk).is_occupied)
+        self.assertTrue(Bed.objects.get(pk=self.beds[1].pk).is_occupied)
+        self.assertEqual(self._counts(), (3, 2))
+        self._assert_matches_rebuild()
+
+    def test_deletes_release_beds(self):
+        booking = Booking.objects.create(student=self.student, bed=self.beds[0], start_date=timezone.now().date(), status='confirmed')
+        booking.delete()
+        self.assertEqual(self._counts(), (3, 3))
+        Booking.objects.create(student=self.student, bed=self.beds[1], start_date=timezone.now().date(), status='confirmed')
+        self.beds[1].delete()
+        self.assertEqual(self._counts(), (2, 2))
+        self._assert_matches_rebuild()
+
+    def test_room_type_change_moves_beds(self):
+        self.beds[2].is_occupied = True
+        self.beds[2].save()
+        self.room.room_type = 'dormitory'
+        self.room.save()
+        row = BedAvailability.objects.get(floor=self.floor, room_type='dormitory')
+        self.assertEqual((row.total_beds, row.free_beds), (3, 2))
+        self.assertEqual(self._counts(), (0, 0))
+        self._assert_matches_rebuild()
+
+    def test_occupancy_endpoint(self):
+        Booking.objects.create(student=self.student, bed=self.beds[0], start_date=timezone.now().date(), status='confirmed')
+        self.assertEqual(occupancy()[0]['occupied_beds'], 1)
+        admin = User.objects.create_user(login_id='bursar', password='testpass123')
+        admin.groups.add(Group.objects.get_or_create(name='HostelAdmin')[0])
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.get('/api/hostel/hostels/occupancy/', {'group_by': 'room_type'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{
+            'room_type': 'triple', 'total_beds': 3, 'free_beds': 2, 'occupied_beds': 1, 'occupancy_rate': 33.33,
+        }])
+        self.assertEqual(client.get('/api/hostel/hostels/occupancy/', {'group_by': 'wing'}).status_code, 400)
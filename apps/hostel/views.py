@@ -7,24 +7,44 @@ from .models import Hostel, Floor, Room, Bed, Student, Booking, Complaint
 from .serializers import (
     HostelSerializer, FloorSerializer, RoomSerializer, BedSerializer,
     StudentSerializer, BookingSerializer, ComplaintSerializer,
-    CreateBookingSerializer, ResolveComplaintSerializer
+    CreateBookingSerializer, ResolveComplaintSerializer, BulkAllocationSerializer
 )
-from .permissions import IsHostelAdmin, IsStudentOrHostelAdmin
+from .allocation import AllocationRequest, allocate
+from .occupancy import OCCUPANCY_GROUPS, occupancy
+from .permissions import IsHostelAdmin, IsStudentOrHostelAdmin, HOSTEL_ADMIN_GROUPS
 from .filters import RoomFilter, BookingFilter
+from apps.users.roles import get_roles
+from apps.core.pagination import LookupPagination
 
 logger = logging.getLogger(__name__)
 
 class HostelViewSet(viewsets.ModelViewSet):
     queryset = Hostel.objects.all()
     serializer_class = HostelSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated, IsHostelAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'address']
     ordering = ['-created_at']
 
+    @action(detail=False, methods=['get'])
+    def occupancy(self, request):
+        """Occupancy from the availability index; ``?group_by=`` and ``?hostel=``."""
+        group_by = request.query_params.get('group_by', 'hostel')
+        if group_by not in OCCUPANCY_GROUPS:
+            return Response(
+                {'detail': f"group_by must be one of: {', '.join(OCCUPANCY_GROUPS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        hostel_id = request.query_params.get('hostel')
+        if hostel_id is not None and not hostel_id.isdigit():
+            return Response({'detail': 'hostel must be an id.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(occupancy(group_by, int(hostel_id) if hostel_id else None))
+
 class FloorViewSet(viewsets.ModelViewSet):
     queryset = Floor.objects.select_related('hostel').all()
     serializer_class = FloorSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated, IsHostelAdmin]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['hostel']
@@ -33,6 +53,7 @@ class FloorViewSet(viewsets.ModelViewSet):
 class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.select_related('floor__hostel').all()
     serializer_class = RoomSerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated, IsStudentOrHostelAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = RoomFilter
@@ -70,7 +91,8 @@ class BookingViewSet(viewsets.ModelViewSet):
         qs = super().get_queryset()
         user = self.request.user
         logger.debug(f"BookingViewSet.get_queryset for user: {user}")
-        if user.is_superuser or user.groups.filter(name__in=['HostelAdmin', 'SuperAdmin']).exists():
+        roles = get_roles(user)
+        if roles.is_superuser or roles.in_group(*HOSTEL_ADMIN_GROUPS):
             return qs
         try:
             student = Student.objects.get(user=user)
@@ -89,6 +111,23 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking = serializer.save()
         return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='allocate', permission_classes=[permissions.IsAuthenticated, IsHostelAdmin])
+    def allocate(self, request):
+        """Place a ranked list of students in one transaction."""
+        serializer = BulkAllocationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = allocate(
+            [AllocationRequest(r['student'], r.get('hostel'), r.get('floor'), r.get('room_type')) for r in data['requests']],
+            start_date=data['start_date'],
+            end_date=data.get('end_date'),
+            status=data['status'],
+        )
+        return Response({
+            'allocated': [{'student': student, 'bed': bed} for student, bed in result['allocated']],
+            'unallocated': result['unallocated'],
+        }, status=status.HTTP_201_CREATED if result['allocated'] else status.HTTP_200_OK)
+
 class ComplaintViewSet(viewsets.ModelViewSet):
     queryset = Complaint.objects.select_related('student__user').all()
     serializer_class = ComplaintSerializer
@@ -101,7 +140,8 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         qs = super().get_queryset()
         user = self.request.user
         logger.debug(f"ComplaintViewSet.get_queryset for user: {user}")
-        if user.is_superuser or user.groups.filter(name__in=['HostelAdmin', 'SuperAdmin']).exists():
+        roles = get_roles(user)
+        if roles.is_superuser or roles.in_group(*HOSTEL_ADMIN_GROUPS):
             return qs
         try:
             student = Student.objects.get(user=user)
@@ -1,12 +1,16 @@
 from rest_framework import permissions
+from apps.users.roles import get_roles
+
+HR_GROUPS = ('HR', 'SuperAdmin')
 
 class IsHRStaffOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user.is_authenticated and (
-            request.user.is_staff or
-            request.user.groups.filter(name__in=['HR', 'SuperAdmin']).exists()
+        roles = get_roles(request.user)
+        return roles.is_authenticated and (
+            roles.is_staff or
+            roles.in_group(*HR_GROUPS)
         )
 
 class IsHREmployeeOrHRStaff(permissions.BasePermission):
@@ -15,14 +19,16 @@ class IsHREmployeeOrHRStaff(permissions.BasePermission):
             return False
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user.is_staff or request.user.groups.filter(name__in=['HR', 'SuperAdmin']).exists() or hasattr(request.user, 'employee_profile')
+        roles = get_roles(request.user)
+        return roles.is_staff or roles.in_group(*HR_GROUPS) or hasattr(request.user, 'employee_profile')
 
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
         # HR staff or superusers can edit all leave requests; employees can edit their own
+        roles = get_roles(request.user)
         return (
-            request.user.is_staff or
-            request.user.groups.filter(name__in=['HR', 'SuperAdmin']).exists() or
+            roles.is_staff or
+            roles.in_group(*HR_GROUPS) or
             (hasattr(request.user, 'employee_profile') and obj.employee == request.user.employee_profile)
-        )
\ No newline at end of file
+        )
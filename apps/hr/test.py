@@ -224,7 +224,7 @@ class HRViewTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_token(self.user)}')
         response = self.client.get('/api/hr/employees/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_employee_create_hr_user(self):
         """Test HR user can create an employee."""
@@ -281,8 +281,8 @@ class HRViewTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_token(self.user)}')
         response = self.client.get('/api/hr/leaverequests/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['employee'], str(self.employee))
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['employee'], str(self.employee))
 
     def test_leave_request_list_hr_user(self):
         """Test HR user sees all leave requests."""
@@ -303,7 +303,7 @@ class HRViewTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_token(self.hr_user)}')
         response = self.client.get('/api/hr/leaverequests/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_leave_request_update_non_owner(self):
         """Test non-owner employee cannot update another's leave request."""
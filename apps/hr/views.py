@@ -1,7 +1,9 @@
 from rest_framework import viewsets
 from apps.hr.models import Department, Employee, LeaveRequest
 from apps.hr.serializers import DepartmentSerializer, EmployeeSerializer, LeaveRequestSerializer
-from apps.hr.permissions import IsHRStaffOrReadOnly, IsHREmployeeOrHRStaff
+from apps.hr.permissions import IsHRStaffOrReadOnly, IsHREmployeeOrHRStaff, HR_GROUPS
+from apps.users.roles import get_roles
+from apps.core.pagination import LookupPagination
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,6 +11,7 @@ logger = logging.getLogger(__name__)
 class DepartmentViewSet(viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
+    pagination_class = LookupPagination
     permission_classes = [IsHRStaffOrReadOnly]
 
 class EmployeeViewSet(viewsets.ModelViewSet):
@@ -26,7 +29,8 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         user = self.request.user
         logger.debug(f"User: {user}, Action: {self.action}, Authenticated: {user.is_authenticated}")
         if self.action in ['list']:
-            if user.is_authenticated and (user.is_staff or user.is_hr or user.groups.filter(name__in=['HR', 'SuperAdmin']).exists()):
+            roles = get_roles(user)
+            if roles.is_authenticated and (roles.is_staff or roles.is_hr or roles.in_group(*HR_GROUPS)):
                 logger.debug("Returning all leave requests for HR user")
                 return LeaveRequest.objects.all()
             logger.debug(f"Returning leave requests for user: {user}")
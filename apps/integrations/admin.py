@@ -4,6 +4,8 @@ from .models import (
     EmailService,
     PaymentGatewayIntegration,
     WebhookLog,
+    WebhookReceipt,
+    SyncCursor,
     ExternalLTIIntegration,
 )
 
@@ -11,4 +13,6 @@ admin.site.register(SMSGateway)
 admin.site.register(EmailService)
 admin.site.register(PaymentGatewayIntegration)
 admin.site.register(WebhookLog)
+admin.site.register(WebhookReceipt)
+admin.site.register(SyncCursor)
 admin.site.register(ExternalLTIIntegration)
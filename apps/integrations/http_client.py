@@ -0,0 +1,237 @@
+"""
+Shared outbound HTTP client for integration adapters.
+
+One `requests.Session` per process keeps a keep-alive connection pool per
+host, so repeated provider calls skip the TCP and TLS handshakes. Every call
+gets a (connect, read) timeout. Idempotent requests are retried on
+connection errors, timeouts and 429/502/503/504 with full-jitter
+exponential backoff. A per-host circuit breaker fails fast while a provider
+is down. Call counts, errors and latency buckets are kept per provider in
+the cache with atomic increments. They are only recorded when that cache is
+shared between processes (Redis); with the per-process default nothing is
+recorded and `get_metrics` returns None, since each process would only
+report its own slice.
+"""
+
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from apps.core.caching import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = getattr(settings, "HTTP_CONNECT_TIMEOUT", 3.05)
+READ_TIMEOUT = getattr(settings, "HTTP_READ_TIMEOUT", 10)
+RETRIES = getattr(settings, "HTTP_RETRIES", 2)
+BACKOFF = getattr(settings, "HTTP_BACKOFF", 0.2)
+BACKOFF_MAX = getattr(settings, "HTTP_BACKOFF_MAX", 5.0)
+POOL_SIZE = getattr(settings, "HTTP_POOL_SIZE", 10)
+CIRCUIT_FAILURES = getattr(settings, "HTTP_CIRCUIT_FAILURES", 5)
+CIRCUIT_RESET = getattr(settings, "HTTP_CIRCUIT_RESET", 30)
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+METRICS_KEY = "integrations:http-metrics"
+METRIC_FIELDS = ("calls", "errors", "retries", "rejected", "ms")
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without calling out while a host's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures; after ``reset_after``
+    seconds one trial call is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=CIRCUIT_FAILURES, reset_after=CIRCUIT_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+def _incr(key, value=1):
+    if not cache_is_shared():
+        return
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        cache.set(key, value, None)
+
+
+def _record(provider, elapsed_ms, error=False, retries=0):
+    prefix = f"{METRICS_KEY}:{provider}"
+    _incr(f"{prefix}:calls")
+    _incr(f"{prefix}:ms", int(round(elapsed_ms)))
+    if error:
+        _incr(f"{prefix}:errors")
+    if retries:
+        _incr(f"{prefix}:retries", retries)
+    bucket = next((str(b) for b in LATENCY_BUCKETS_MS if elapsed_ms <= b), "inf")
+    _incr(f"{prefix}:le:{bucket}")
+
+
+class HttpClient:
+    def __init__(self, pool_size=POOL_SIZE, retries=RETRIES, timeout=None):
+        self.retries = retries
+        self.timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.session = requests.Session()
+        # Retries are done here, with jitter and the breaker, not by urllib3.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._breakers = {}
+        self._providers = set()
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker()
+            return self._breakers[host]
+
+    def _note_provider(self, provider):
+        if provider not in self._providers and cache_is_shared():
+            self._providers.add(provider)
+            providers = set(cache.get(f"{METRICS_KEY}:providers") or ())
+            if provider not in providers:
+                cache.set(f"{METRICS_KEY}:providers", sorted(providers | {provider}), None)
+
+    def request(self, method, url, provider=None, timeout=None, retries=None, retry_unsafe=False, **kwargs):
+        """
+        Send a request through the pool. ``provider`` labels the metrics
+        (defaults to the host). Non-idempotent methods are only retried with
+        ``retry_unsafe=True``. Raises `CircuitOpenError` while the host's
+        breaker is open; HTTP error statuses are returned, not raised.
+        """
+        method = method.upper()
+        host = urlsplit(url).netloc
+        provider = provider or host
+        self._note_provider(provider)
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            _incr(f"{METRICS_KEY}:{provider}:rejected")
+            raise CircuitOpenError(f"Circuit open for {host}; not calling {provider}.")
+
+        retries = self.retries if retries is None else retries
+        if method not in IDEMPOTENT_METHODS and not retry_unsafe:
+            retries = 0
+        started = time.monotonic()
+        attempt = 0
+        failed = True
+        try:
+            while True:
+                transient = False
+                try:
+                    response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    response, error, transient = None, exc, True
+                except requests.RequestException as exc:
+                    # Not worth retrying (bad URL, redirect loop, broken body...).
+                    response, error = None, exc
+                else:
+                    error = None
+                failed = error is not None or response.status_code >= 500
+                if attempt < retries and (transient or (response is not None and response.status_code in RETRY_STATUSES)):
+                    attempt += 1
+                    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF * 2 ** attempt))
+                    logger.debug("Retrying %s %s in %.2fs (attempt %s)", method, url, delay, attempt)
+                    time.sleep(delay)
+                    continue
+                break
+        finally:
+            # Settled even on unexpected errors, so a half-open trial never sticks.
+            if failed:
+                breaker.failure()
+            else:
+                breaker.success()
+            _record(provider, (time.monotonic() - started) * 1000, error=failed, retries=attempt)
+        if error is not None:
+            raise error
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client (created on first use)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not cache_is_shared():
+                    logger.warning("Outbound HTTP metrics are off: the default cache is per-process (set REDIS_CACHE_URL).")
+                _client = HttpClient()
+    return _client
+
+
+def get_metrics():
+    """
+    Per-provider cumulative call counts, errors and latency buckets, or None
+    when the cache is per-process and nothing is recorded.
+    """
+    if not cache_is_shared():
+        return None
+    metrics = {}
+    for provider in cache.get(f"{METRICS_KEY}:providers") or ():
+        prefix = f"{METRICS_KEY}:{provider}"
+        row = {field: cache.get(f"{prefix}:{field}", 0) for field in METRIC_FIELDS}
+        row["avg_ms"] = round(row["ms"] / row["calls"], 1) if row["calls"] else 0.0
+        row["latency_ms"] = {
+            f"le_{bucket}": cache.get(f"{prefix}:le:{bucket}", 0)
+            for bucket in [str(b) for b in LATENCY_BUCKETS_MS] + ["inf"]
+        }
+        metrics[provider] = row
+    return metrics
@@ -6,40 +6,25 @@ This file offers:
  - placeholder LTI launch endpoint handler
 """
 
-import requests
 from django.conf import settings
-from apps.academic.models import Course, Section
-from django.utils import timezone
 import logging
+from .moodle import MoodleClient, sync
 
 logger = logging.getLogger(__name__)
 
-# Moodle REST API sync example
+# Moodle REST API sync
 def fetch_moodle_courses(moodle_base_url: str, token: str):
     """
-    Calls Moodle's core_course_get_courses or other endpoints.
-    Returns list of course dicts.
+    Calls Moodle's core_course_get_courses. Returns list of course dicts.
     """
-    url = f"{moodle_base_url}/webservice/rest/server.php"
-    params = {"wstoken": token, "wsfunction": "core_course_get_courses", "moodlewsrestformat": "json"}
-    resp = requests.get(url, params=params, timeout=10)
-    resp.raise_for_status()
-    return resp.json()
+    return MoodleClient(moodle_base_url, token).call("core_course_get_courses")
 
-def sync_moodle_courses(moodle_base_url: str, token: str):
-    courses = fetch_moodle_courses(moodle_base_url, token)
-    created = 0
-    updated = 0
-    for c in courses:
-        code = str(c.get("shortname") or c.get("idnumber") or c.get("id"))
-        title = c.get("fullname") or c.get("name")
-        # upsert Course
-        course_obj, created_flag = Course.objects.update_or_create(code=code, defaults={"title": title})
-        if created_flag:
-            created += 1
-        else:
-            updated += 1
-    return {"created": created, "updated": updated, "total": len(courses)}
+def sync_moodle_courses(moodle_base_url: str, token: str, full: bool = False):
+    """Incremental, batched course sync; see apps.integrations.moodle."""
+    return sync("courses", moodle_base_url, token, full=full)
+
+def sync_moodle_users(moodle_base_url: str, token: str, full: bool = False):
+    return sync("users", moodle_base_url, token, full=full)
 
 # Minimal placeholder for LTI launch validation -- **not production LTI**
 def validate_lti_launch(request):
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.integrations.moodle import SOURCES, sync
+
+
+class Command(BaseCommand):
+    help = "Incrementally sync Moodle courses and/or users into CERPS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kinds", nargs="*", choices=sorted(SOURCES), help="What to sync (default: everything).")
+        parser.add_argument("--full", action="store_true", help="Ignore the stored cursor and diff every record.")
+        parser.add_argument("--base-url", default=settings.MOODLE_BASE_URL)
+        parser.add_argument("--token", default=settings.MOODLE_TOKEN)
+
+    def handle(self, *args, **options):
+        if not options["base_url"] or not options["token"]:
+            raise CommandError("Set MOODLE_BASE_URL and MOODLE_TOKEN or pass --base-url/--token.")
+        for kind in options["kinds"] or sorted(SOURCES):
+            stats = sync(kind, options["base_url"], options["token"], full=options["full"])
+            self.stdout.write(self.style.SUCCESS(f"{kind}: {stats}"))
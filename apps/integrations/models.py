@@ -70,22 +70,71 @@ class PaymentGatewayIntegration(models.Model):
 
 class WebhookLog(models.Model):
     """
-    Logs webhook requests and responses for integrations.
+    Logs webhook requests and responses for integrations. Payment webhooks
+    are queued here as ``received`` and processed by `process_webhooks`.
     """
+    STATUS_CHOICES = [
+        ('received', 'Received'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
     source = models.CharField(max_length=100)
     event_type = models.CharField(max_length=100)
+    event_id = models.CharField(max_length=255, blank=True)
     payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='received')
+    attempts = models.PositiveSmallIntegerField(default=0)
     response = models.TextField(blank=True, null=True)
     status_code = models.IntegerField(blank=True, null=True)
     received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['received_at', 'id'], name='webhooklog_received_keyset_idx'),
+            models.Index(fields=['id'], name='webhooklog_pending_idx', condition=models.Q(status='received')),
+        ]
 
     def __str__(self):
         return f"{self.source} - {self.event_type} @ {self.received_at}"
 
 
+class WebhookReceipt(models.Model):
+    """
+    One row per provider event id, so retried deliveries are recognised by
+    a unique constraint. Kept apart from `WebhookLog` because a unique key on
+    a month-partitioned table would have to include the timestamp.
+    """
+    source = models.CharField(max_length=100)
+    event_id = models.CharField(max_length=255)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'event_id'], name='webhook_receipt_event_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.event_id}"
+
+
+class SyncCursor(models.Model):
+    """
+    How far an incremental sync has got for one source, e.g. the newest
+    Moodle ``timemodified`` applied.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    last_run_at = models.DateTimeField(blank=True, null=True)
+    last_stats = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.position}"
+
+
 class ExternalLTIIntegration(models.Model):
     """
     LTI integration model for connecting with external LMS platforms.
@@ -14,11 +14,16 @@ from django.conf import settings
 import hmac
 import hashlib
 import base64
-import requests
+from .http_client import READ_TIMEOUT, RETRIES, get_client
+
+PAYSTACK_API_URL = getattr(settings, "PAYSTACK_API_URL", "https://api.paystack.co")
 
 # STRIPE
 def init_stripe():
     stripe.api_key = settings.STRIPE_SECRET_KEY
+    # Stripe's SDK keeps its own retry logic; give it our pooled session.
+    stripe.default_http_client = stripe.RequestsClient(session=get_client().session, timeout=READ_TIMEOUT)
+    stripe.max_network_retries = RETRIES
 
 def verify_stripe_signature(payload: bytes, sig_header: str, endpoint_secret: str):
     """
@@ -51,8 +56,8 @@ def verify_paystack_signature(payload: bytes, secret: str, signature: str) -> bo
 
 def verify_paystack_event(reference: str) -> dict:
     secret = settings.PAYSTACK_SECRET_KEY
-    url = f"https://api.paystack.co/transaction/verify/{reference}"
-    resp = requests.get(url, headers={"Authorization": f"Bearer {secret}"})
+    url = f"{PAYSTACK_API_URL}/transaction/verify/{reference}"
+    resp = get_client().get(url, provider="paystack", headers={"Authorization": f"Bearer {secret}"})
     resp.raise_for_status()
     return resp.json()
 
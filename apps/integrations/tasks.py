@@ -1,37 +1,21 @@
 from celery import shared_task
 from django.conf import settings
-from .payment_providers import init_stripe
-from apps.finance.models import Invoice, Payment
+from .moodle import sync
+from .webhooks import process_pending
 import logging
 
 logger = logging.getLogger(__name__)
 
-@shared_task(bind=True, max_retries=3)
-def process_stripe_checkout_event(self, stripe_event):
+@shared_task
+def process_webhooks(batch_size=None, max_batches=None):
     """
-    Handle checkout.session.completed event payload (dict) asynchronously.
+    Verify queued payment webhooks and create their payments in batches.
+    Scheduled on demand by `webhooks.ingest`; also safe to run on a beat
+    schedule to pick up retries.
     """
-    try:
-        # Example: find invoice from metadata and create Payment record
-        data = stripe_event.get("data", {}).get("object", {})
-        metadata = data.get("metadata", {}) or {}
-        invoice_id = metadata.get("invoice_id")
-        if invoice_id:
-            try:
-                inv = Invoice.objects.get(pk=int(invoice_id))
-                amount_total = int(data.get("amount_total", 0))
-                Payment.objects.create(
-                    invoice=inv,
-                    provider="stripe",
-                    provider_payment_id=data.get("id"),
-                    amount_cents=amount_total,
-                    status="completed",
-                    raw=stripe_event
-                )
-                inv.status = "paid"
-                inv.save()
-            except Invoice.DoesNotExist:
-                logger.warning("Invoice %s not found for stripe event", invoice_id)
-    except Exception as exc:
-        logger.exception("Failed to process stripe event: %s", exc)
-        raise self.retry(exc=exc, countdown=10)
+    return process_pending(batch_size=batch_size, max_batches=max_batches)
+
+@shared_task
+def sync_moodle(kinds=("courses", "users"), full=False):
+    """Incremental Moodle sync for the configured site."""
+    return {kind: sync(kind, settings.MOODLE_BASE_URL, settings.MOODLE_TOKEN, full=full) for kind in kinds}
@@ -0,0 +1,195 @@
+import hashlib
+import hmac
+import json
+import re
+import time
+from datetime import date
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+import requests
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from apps.users.models import User
+from apps.academic.models import Course, Student
+from apps.finance.models import Ledger, Invoice, Payment
+from apps.core.testing import SharedCacheMixin
+from .http_client import CircuitOpenError, HttpClient, get_metrics
+from .models import SyncCursor, WebhookLog
+from .moodle import sync
+from .payment_providers import verify_paystack_event
+from .testing import StubServer
+from . import webhooks
+from .webhooks import process_pending
+
+SECRET = 'sk_test_webhooks'
+
+
+@override_settings(PAYSTACK_SECRET_KEY=SECRET)
+class PaystackWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        student = Student.objects.create(user=User.objects.create_user(login_id='payer', password='pass123'), admission_number='ADM-WH-1')
+        self.invoice = Invoice.objects.create(ledger=Ledger.objects.create(student=student), amount_cents=5000, due_date=date.today())
+
+    def _deliver(self, event):
+        body = json.dumps(event).encode()
+        signature = hmac.new(SECRET.encode(), body, hashlib.sha512).hexdigest()
+        return self.client.post('/api/integrations/paystack/webhook/', body, content_type='application/json',
+                                HTTP_X_PAYSTACK_SIGNATURE=signature)
+
+    def _charge(self, transaction_id):
+        return {'event': 'charge.success', 'data': {'id': transaction_id, 'reference': f'ref-{transaction_id}'}}
+
+    def test_retries_are_deduplicated_and_queued(self):
+        for _ in range(3):
+            self.assertEqual(self._deliver(self._charge(1)).status_code, 200)
+        self._deliver(self._charge(2))
+        self.assertEqual(list(WebhookLog.objects.order_by('pk').values_list('event_id', 'status')),
+                         [('charge.success:1', 'received'), ('charge.success:2', 'received')])
+        self.assertEqual(self.client.post('/api/integrations/paystack/webhook/', b'{}', content_type='application/json',
+                                          HTTP_X_PAYSTACK_SIGNATURE='forged').status_code, 400)
+
+    def test_worker_verifies_and_creates_payments(self):
+        for transaction_id in (1, 2, 3):
+            self._deliver(self._charge(transaction_id))
+        verified = {
+            'ref-1': {'data': {'status': 'success', 'amount': 2000, 'metadata': {'invoice_id': self.invoice.pk}}},
+            'ref-2': {'data': {'status': 'success', 'amount': 3000, 'channel': 'bank', 'metadata': {'invoice_id': self.invoice.pk}}},
+            'ref-3': {'data': {'status': 'abandoned'}},
+        }
+        depths = []
+
+        def verify(logs, real=webhooks._verify):
+            depths.append(len(connection.atomic_blocks))
+            return real(logs)
+
+        outside = len(connection.atomic_blocks)
+        with mock.patch('apps.integrations.webhooks.verify_paystack_event', side_effect=verified.__getitem__), \
+                mock.patch('apps.integrations.webhooks._verify', side_effect=verify):
+            result = process_pending(batch_size=2)
+        self.assertEqual(result, {'payments': 2, 'processed': 2, 'ignored': 1})
+        # The provider is called before each batch's locking transaction opens.
+        self.assertEqual(depths, [outside, outside])
+        self.assertEqual(sorted(Payment.objects.values_list('amount_cents', 'payment_method')), [(2000, 'card'), (3000, 'bank_transfer')])
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'paid')
+
+    def test_failed_verification_is_retried(self):
+        self._deliver(self._charge(1))
+        with mock.patch('apps.integrations.webhooks.verify_paystack_event', side_effect=ConnectionError('timeout')), \
+                mock.patch('apps.integrations.tasks.process_webhooks.apply_async') as apply_async, \
+                mock.patch.object(webhooks, 'RETRY_DELAY', 60):
+            with self.captureOnCommitCallbacks(execute=True):
+                process_pending()
+            apply_async.assert_called_once_with(countdown=60)
+            with self.captureOnCommitCallbacks(execute=True):
+                process_pending()
+            self.assertEqual(apply_async.call_args, mock.call(countdown=120))
+        log = WebhookLog.objects.get()
+        self.assertEqual((log.status, log.attempts), ('received', 2))
+        self.assertFalse(Payment.objects.exists())
+
+
+class HttpClientTests(SharedCacheMixin, TestCase):
+    def test_retries_transient_errors_over_one_connection(self):
+        client = HttpClient(retries=2)
+        with StubServer({'/courses': [(503, 'busy'), (200, [{'id': 1}])]}) as stub:
+            response = client.get(stub.url('/courses'), provider='stub-retry')
+        self.assertEqual(response.json(), [{'id': 1}])
+        self.assertEqual(len(stub.requests), 2)
+        metrics = get_metrics()['stub-retry']
+        self.assertEqual((metrics['calls'], metrics['retries'], metrics['errors']), (1, 1, 0))
+
+    def test_metrics_need_a_shared_cache(self):
+        admin = User.objects.create_user(login_id='metrics-admin', password='pass123', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        self.assertEqual(client.get('/api/integrations/http-metrics/').status_code, 200)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with StubServer({'/ping': (200, 'ok')}) as stub:
+                HttpClient().get(stub.url('/ping'), provider='stub-local')
+            self.assertEqual(client.get('/api/integrations/http-metrics/').status_code, 503)
+        self.assertNotIn('stub-local', get_metrics())
+
+    def test_post_is_not_retried_by_default(self):
+        with StubServer({'/charge': (503, 'busy')}) as stub:
+            response = HttpClient(retries=2).post(stub.url('/charge'), provider='stub-post')
+        self.assertEqual((response.status_code, len(stub.requests)), (503, 1))
+
+    def test_circuit_opens_after_repeated_failures(self):
+        client = HttpClient(retries=0)
+        with StubServer({'/down': (500, 'error')}) as stub:
+            for _ in range(5):
+                client.get(stub.url('/down'), provider='stub-down')
+            with self.assertRaises(CircuitOpenError):
+                client.get(stub.url('/down'), provider='stub-down')
+        self.assertEqual(len(stub.requests), 5)
+        self.assertEqual(get_metrics()['stub-down']['rejected'], 1)
+
+    def test_failed_half_open_trial_reopens_the_circuit(self):
+        client = HttpClient(retries=2)
+        breaker = client.breaker('provider.test')
+        breaker.opened_at = time.monotonic() - breaker.reset_after
+        with mock.patch.object(client.session, 'request', side_effect=requests.TooManyRedirects('loop')) as send:
+            with self.assertRaises(requests.TooManyRedirects):
+                client.get('https://provider.test/verify', provider='stub-redirects')
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(breaker.state, 'open')
+
+        breaker.opened_at = time.monotonic() - breaker.reset_after
+        with mock.patch.object(client.session, 'request', return_value=mock.Mock(status_code=200)):
+            client.get('https://provider.test/verify', provider='stub-redirects')
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(get_metrics()['stub-redirects']['errors'], 1)
+
+    @override_settings(PAYSTACK_SECRET_KEY=SECRET)
+    def test_paystack_adapter_uses_client(self):
+        with StubServer({'/transaction/verify/ref-9': (200, {'data': {'status': 'success'}})}) as stub, \
+                mock.patch('apps.integrations.payment_providers.PAYSTACK_API_URL', stub.url('').rstrip('/')):
+            self.assertEqual(verify_paystack_event('ref-9'), {'data': {'status': 'success'}})
+        self.assertEqual(stub.requests, [('GET', '/transaction/verify/ref-9')])
+
+
+class MoodleSyncTests(TestCase):
+    def setUp(self):
+        self.users = [
+            {'id': i, 'username': f'moodle{i}', 'firstname': f'First{i}', 'lastname': 'Learner',
+             'email': f'moodle{i}@example.com', 'timemodified': 1000 + i}
+            for i in range(1, 6)
+        ]
+        self.courses = [{'id': 7, 'fullname': 'Algebra I', 'timemodified': 500}]
+        User.objects.create_user(login_id='moodle1', password='pass123', first_name='Old')
+
+    def _moodle(self, handler):
+        params = {key: values[0] for key, values in parse_qs(urlsplit(handler.path).query).items()}
+        if params['wsfunction'] == 'core_user_get_users':
+            # No paging; only username and auth are matched exactly, the rest with LIKE.
+            if set(params) - {'wstoken', 'wsfunction', 'moodlewsrestformat', 'criteria[0][key]', 'criteria[0][value]'}:
+                return 200, {'exception': 'invalid_parameter_exception', 'message': 'Unexpected keys'}
+            key, value = params['criteria[0][key]'], params['criteria[0][value]']
+            pattern = re.escape(value) if key in ('username', 'auth') else re.escape(value).replace('%', '.*')
+            return 200, {'users': [user for user in self.users if re.fullmatch(pattern, str(user[key]))], 'warnings': []}
+        page, perpage = int(params['page']), int(params['perpage'])
+        return 200, {'total': len(self.courses), 'courses': self.courses[page * perpage:(page + 1) * perpage]}
+
+    def test_pages_diff_and_bulk_apply(self):
+        with StubServer({'/webservice/rest/server.php': self._moodle}) as stub:
+            with self.assertNumQueries(16):
+                stats = sync('users', stub.url(''), 'token', page_size=2)
+            self.assertEqual(sync('courses', stub.url(''), 'token')['created'], 1)
+        self.assertEqual(stats, {'fetched': 5, 'skipped': 0, 'created': 4, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(User.objects.get(login_id='moodle1').first_name, 'First1')
+        created = User.objects.get(login_id='moodle5')
+        self.assertTrue(created.is_student)
+        self.assertFalse(created.has_usable_password())
+        self.assertEqual(Course.objects.get(moodle_id=7).name, 'Algebra I')
+
+    def test_later_runs_only_apply_changes(self):
+        with StubServer({'/webservice/rest/server.php': self._moodle}) as stub:
+            sync('users', stub.url(''), 'token', page_size=2)
+            self.users[2].update(lastname='Renamed', timemodified=2000)
+            stats = sync('users', stub.url(''), 'token', page_size=2)
+        self.assertEqual((stats['skipped'], stats['updated'], stats['created']), (4, 1, 0))
+        self.assertEqual(User.objects.get(login_id='moodle3').last_name, 'Renamed')
+        self.assertEqual(SyncCursor.objects.get(source__startswith='moodle:users').position, 2000)
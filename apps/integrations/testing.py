@@ -0,0 +1,77 @@
+"""
+Local stub HTTP server for exercising integration adapters in tests.
+
+    with StubServer({"/transaction/verify/ref-1": (200, {"status": True})}) as stub:
+        get_client().get(stub.url("/transaction/verify/ref-1"))
+
+Routes map a path (query string ignored) to ``(status, body)``, to a list of
+those served in turn (the last one repeats), or to a callable taking the
+`BaseHTTPRequestHandler` and returning ``(status, body)``. Dict and list
+bodies are sent as JSON. Requests are recorded in ``stub.requests``.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class StubServer:
+    def __init__(self, routes=None):
+        self.routes = dict(routes or {})
+        self.requests = []
+        self._served = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def url(self, path="/"):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def _respond(self, handler):
+        path = urlsplit(handler.path).path
+        with self._lock:
+            self.requests.append((handler.command, handler.path))
+            route = self.routes.get(path, (404, {"detail": "no stub route"}))
+            if isinstance(route, list):
+                index = self._served.get(path, 0)
+                self._served[path] = index + 1
+                route = route[min(index, len(route) - 1)]
+        status, body = route(handler) if callable(route) else route
+        if isinstance(body, (dict, list)):
+            payload, content_type = json.dumps(body).encode(), "application/json"
+        else:
+            payload, content_type = (body or "").encode(), "text/plain"
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like real providers
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                stub._respond(self)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,31 +1,38 @@
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponse, HttpResponseBadRequest
 from django.conf import settings
 import json
 import stripe
-from .payment_providers import init_stripe, verify_paystack_signature, verify_paystack_event, verify_mpesa_callback
-from .tasks import process_stripe_checkout_event
+from .http_client import get_metrics
+from .payment_providers import init_stripe, verify_paystack_signature
+from .webhooks import ingest, mpesa_event_id, paystack_event_id
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
 import logging
 
 logger = logging.getLogger(__name__)
 init_stripe()
 
+# Each webhook is checked (signature only) and queued; verification with the
+# provider and payment creation run in the process_webhooks task. Retried
+# deliveries are deduplicated on the provider event id.
+
 @csrf_exempt
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def stripe_webhook(request):
     payload = request.body
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE", "")
-    endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
+    endpoint_secret = getattr(settings, "STRIPE_WEBHOOK_SECRET", "")
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+        stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
     except Exception as exc:
         logger.exception("Invalid stripe webhook: %s", exc)
         return HttpResponseBadRequest("invalid signature")
-    # Process asynchronously
-    process_stripe_checkout_event.delay(event)
+    event = json.loads(payload.decode("utf-8"))
+    ingest("stripe", event["id"], event.get("type"), event)
     return HttpResponse(status=200)
 
 @csrf_exempt
@@ -41,30 +48,35 @@ def paystack_webhook(request):
         return HttpResponseBadRequest("bad configuration")
     if not verify_paystack_signature(payload, secret, signature):
         return HttpResponseBadRequest("invalid signature")
-    data = json.loads(payload.decode("utf-8"))
-    # Example: handle charge.success
-    event = data.get("event")
-    if event == "charge.success":
-        reference = data.get("data", {}).get("reference")
-        # double-check with Paystack API
-        try:
-            result = verify_paystack_event(reference)
-            # process result -> create Payment etc.
-            logger.info("Paystack verified: %s", reference)
-        except Exception:
-            logger.exception("Failed paystack verify")
+    try:
+        data = json.loads(payload.decode("utf-8"))
+    except ValueError:
+        return HttpResponseBadRequest("invalid json")
+    ingest("paystack", paystack_event_id(data), data.get("event"), data)
     return HttpResponse(status=200)
 
 @csrf_exempt
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def mpesa_callback(request):
-    # M-Pesa callback handling depends on provider
+    # M-Pesa callback handling depends on provider; verified in the worker
     try:
         data = json.loads(request.body.decode("utf-8"))
     except Exception:
         return HttpResponseBadRequest("invalid json")
-    if verify_mpesa_callback(data):
-        # process payment
-        return HttpResponse(status=200)
-    return HttpResponseBadRequest("invalid callback")
+    if not isinstance(data, dict):
+        return HttpResponseBadRequest("invalid callback")
+    ingest("mpesa", mpesa_event_id(data), "stk_callback", data)
+    return HttpResponse(status=200)
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def http_metrics(request):
+    """Outbound call counts, errors and latency buckets per provider."""
+    metrics = get_metrics()
+    if metrics is None:
+        return Response(
+            {"detail": "HTTP metrics need a cache shared by all processes; set REDIS_CACHE_URL."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return Response(metrics)
@@ -0,0 +1,249 @@
+"""
+Payment webhook ingestion.
+
+The views only check the provider's signature (a local HMAC) and call
+`ingest`, which claims the provider event id in `WebhookReceipt` — a unique
+constraint, so a retried delivery costs one failed INSERT — and stores the
+raw event in `WebhookLog` as ``received``. The request returns 200 without
+calling out to the provider.
+
+`process_pending` (the ``process_webhooks`` Celery task) reads received rows
+in batches and verifies them with the provider over the pooled session in
+`payment_providers` before taking any lock. It then claims the batch with
+``SELECT ... FOR UPDATE SKIP LOCKED``, creates payments with one
+``bulk_create`` per batch, posts them to the ledgers and marks fully paid
+invoices. Rows whose verification failed go back to ``received`` and a
+delayed run is queued to retry them, backing off with each attempt.
+"""
+
+import hashlib
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.finance.models import Invoice, Payment
+from apps.finance.posting import post_payments
+from .models import WebhookLog, WebhookReceipt
+from .payment_providers import verify_mpesa_callback, verify_paystack_event
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "WEBHOOK_BATCH_SIZE", 100)
+VERIFY_WORKERS = getattr(settings, "WEBHOOK_VERIFY_WORKERS", 8)
+MAX_ATTEMPTS = getattr(settings, "WEBHOOK_MAX_ATTEMPTS", 5)
+SCHEDULE_DELAY = getattr(settings, "WEBHOOK_SCHEDULE_DELAY", 2)
+RETRY_DELAY = getattr(settings, "WEBHOOK_RETRY_DELAY", 60)
+SCHEDULE_KEY = "integrations:webhooks:scheduled"
+
+
+def payload_digest(payload):
+    """Stable id for payloads that carry no provider event id."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def paystack_event_id(data):
+    # Paystack has no event id; the event name plus transaction id is unique per delivery.
+    transaction_data = data.get("data") or {}
+    key = transaction_data.get("id") or transaction_data.get("reference")
+    return f"{data.get('event')}:{key}" if key else payload_digest(data)
+
+
+def mpesa_event_id(data):
+    callback = (data.get("Body") or {}).get("stkCallback") or {}
+    return callback.get("CheckoutRequestID") or payload_digest(data)
+
+
+def ingest(source, event_id, event_type, payload):
+    """
+    Queue a verified-signature webhook for processing. Returns the new
+    `WebhookLog`, or None when the event was already received.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                WebhookReceipt.objects.create(source=source, event_id=event_id[:255])
+        except IntegrityError:
+            logger.debug("Duplicate %s webhook %s ignored", source, event_id)
+            return None
+        log = WebhookLog.objects.create(
+            source=source, event_type=event_type or "", event_id=event_id[:255], payload=payload, status_code=200
+        )
+        schedule_processing()
+    return log
+
+
+def schedule_processing():
+    """Queue one processing run per delay window, however many events arrive."""
+    if cache.add(SCHEDULE_KEY, 1, SCHEDULE_DELAY):
+        from .tasks import process_webhooks
+        transaction.on_commit(lambda: process_webhooks.apply_async(countdown=SCHEDULE_DELAY))
+
+
+def schedule_retry(attempts):
+    """Queue a run for rows put back to ``received``; the delay doubles per attempt."""
+    from .tasks import process_webhooks
+    countdown = RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    transaction.on_commit(lambda: process_webhooks.apply_async(countdown=countdown))
+
+
+def _retry_or_fail(log, message):
+    log.response = message
+    log.status = "failed" if log.attempts >= MAX_ATTEMPTS else "received"
+
+
+def _stripe(logs, verified):
+    # Stripe events were verified against the signing secret on receipt.
+    for log in logs:
+        if log.event_type != "checkout.session.completed":
+            log.status, log.response = "ignored", f"Unhandled event {log.event_type}."
+            continue
+        session = (log.payload.get("data") or {}).get("object") or {}
+        yield log, (session.get("metadata") or {}).get("invoice_id"), session.get("amount_total"), "card"
+
+
+def _verify_paystack(reference):
+    try:
+        return verify_paystack_event(reference), None
+    except Exception as exc:
+        return None, str(exc)
+
+
+def _verify(logs):
+    """Verify Paystack charges with the provider concurrently; results by log pk."""
+    charges = [log for log in logs if log.source == "paystack" and log.event_type == "charge.success"]
+    if not charges:
+        return {}
+    references = [((log.payload.get("data") or {}).get("reference") or "") for log in charges]
+    with ThreadPoolExecutor(max_workers=min(VERIFY_WORKERS, len(charges))) as pool:
+        results = list(pool.map(_verify_paystack, references))
+    return {log.pk: result for log, result in zip(charges, results)}
+
+
+def _paystack(logs, verified):
+    for log in logs:
+        if log.event_type != "charge.success":
+            log.status, log.response = "ignored", f"Unhandled event {log.event_type}."
+            continue
+        result, error = verified[log.pk]
+        data = (result or {}).get("data") or {}
+        if error:
+            _retry_or_fail(log, f"Verification failed: {error}")
+        elif data.get("status") != "success":
+            log.status, log.response = "ignored", f"Transaction status is {data.get('status')!r}."
+        else:
+            method = "bank_transfer" if data.get("channel") == "bank" else "card"
+            yield log, (data.get("metadata") or {}).get("invoice_id"), data.get("amount"), method
+
+
+def _mpesa(logs, verified):
+    for log in logs:
+        callback = (log.payload.get("Body") or {}).get("stkCallback") or {}
+        if not verify_mpesa_callback(log.payload):
+            log.status, log.response = "failed", "Callback failed verification."
+        elif callback.get("ResultCode") not in (0, "0"):
+            log.status, log.response = "ignored", callback.get("ResultDesc") or "Payment not completed."
+        else:
+            # STK callbacks carry no invoice reference; recorded for reconciliation.
+            log.status = "processed"
+    return ()
+
+
+# Handlers take one source's logs and the `_verify` results for them.
+HANDLERS = {"stripe": _stripe, "paystack": _paystack, "mpesa": _mpesa}
+
+
+def _process(logs, verified):
+    """Run ``logs`` through their provider handlers and create the payments."""
+    by_source = {}
+    for log in logs:
+        log.attempts += 1
+        log.status = "processed"
+        log.response = None
+        by_source.setdefault(log.source, []).append(log)
+
+    candidates = []
+    for source, group in by_source.items():
+        handler = HANDLERS.get(source)
+        if handler is None:
+            for log in group:
+                log.status, log.response = "ignored", f"No handler for {source} webhooks."
+            continue
+        candidates.extend(handler(group, verified))
+
+    invoice_ids = set()
+    for _, invoice_id, _, _ in candidates:
+        try:
+            invoice_ids.add(int(invoice_id))
+        except (TypeError, ValueError):
+            pass
+    invoices = Invoice.objects.in_bulk(invoice_ids)
+    payments = []
+    for log, invoice_id, amount, method in candidates:
+        try:
+            invoice = invoices.get(int(invoice_id))
+            amount = int(amount)
+        except (TypeError, ValueError):
+            invoice = None
+        if invoice is None or amount <= 0:
+            log.status, log.response = "ignored", f"No invoice {invoice_id!r} or no amount to apply."
+            continue
+        payments.append(Payment(invoice=invoice, amount_cents=amount, payment_method=method))
+        log.response = f"Applied {amount} to invoice {invoice.pk}."
+
+    if payments:
+        Payment.objects.bulk_create(payments)
+        post_payments(payments)
+        settled = (
+            Invoice.objects.filter(pk__in={p.invoice_id for p in payments}).exclude(status="paid")
+            .annotate(paid=Sum("payments__amount_cents")).filter(paid__gte=F("amount_cents"))
+            .values_list("pk", flat=True)
+        )
+        Invoice.objects.filter(pk__in=list(settled)).update(status="paid", updated_at=timezone.now())
+    return len(payments)
+
+
+def process_pending(batch_size=None, max_batches=None):
+    """
+    Process received webhooks in batches. Rows due for a retry are left to a
+    delayed run rather than spun on. Returns a count per final status.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    cache.delete(SCHEDULE_KEY)
+    totals = Counter()
+    retry_attempts = []
+    last_pk = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        pending = list(WebhookLog.objects.filter(status="received", pk__gt=last_pk).order_by("pk")[:batch_size])
+        if not pending:
+            break
+        # Provider round trips happen here, so no row lock waits on the network.
+        verified = _verify(pending)
+        with transaction.atomic():
+            # Rows another worker claimed or finished meanwhile drop out here.
+            logs = list(
+                WebhookLog.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=[log.pk for log in pending], status="received").order_by("pk")
+            )
+            if logs:
+                totals["payments"] += _process(logs, verified)
+                now = timezone.now()
+                for log in logs:
+                    if log.status != "received":
+                        log.processed_at = now
+                WebhookLog.objects.bulk_update(logs, ["status", "attempts", "response", "processed_at"])
+        totals.update(log.status for log in logs)
+        retry_attempts.extend(log.attempts for log in logs if log.status == "received")
+        last_pk = pending[-1].pk
+        batches += 1
+    if retry_attempts:
+        schedule_retry(min(retry_attempts))
+    logger.info("Processed webhooks: %s", dict(totals))
+    return dict(totals)
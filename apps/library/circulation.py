@@ -0,0 +1,124 @@
+"""
+Library circulation service.
+
+Copy counters are only ever changed with conditional ``UPDATE`` statements
+(``copies_available = copies_available - n WHERE copies_available >= n``),
+so concurrent checkouts cannot oversell a title or lose an increment, and
+no book row is read into Python just to be saved back. Returns flip
+``returned_on`` with a conditional update first, so each loan is credited
+back exactly once.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import Book, BorrowRecord
+
+LOAN_PERIOD = timezone.timedelta(days=14)
+
+
+class CirculationError(Exception):
+    """Raised when a checkout or return cannot be carried out."""
+
+
+def _take_copies(wanted):
+    """
+    Reserve ``{book_id: copies}`` in one conditional UPDATE per title, in
+    id order so concurrent multi-title checkouts lock rows consistently.
+    Returns the ids that did not have enough copies; the caller rolls back.
+    """
+    short = []
+    for book_id, count in sorted(wanted.items()):
+        taken = Book.objects.filter(pk=book_id, copies_available__gte=count).update(
+            copies_available=F("copies_available") - count
+        )
+        if not taken:
+            short.append(book_id)
+    return short
+
+
+def _restore_copies(returned):
+    """Credit ``{book_id: copies}`` back in a single UPDATE, capped at copies_total."""
+    if not returned:
+        return
+    Book.objects.filter(pk__in=returned).update(
+        copies_available=Least(
+            Case(
+                *[When(pk=book_id, then=F("copies_available") + count) for book_id, count in returned.items()],
+                default=F("copies_available"),
+                output_field=IntegerField(),
+            ),
+            F("copies_total"),
+        )
+    )
+
+
+def checkout(member, book, due_date=None, borrowed_on=None):
+    """Lend one copy of ``book`` to ``member``; returns the new `BorrowRecord`."""
+    borrowed_on = borrowed_on or timezone.now()
+    with transaction.atomic():
+        if _take_copies({book.pk: 1}):
+            raise CirculationError(f"No copies of '{book.title}' available to borrow.")
+        # Mirror the UPDATE on the caller's instance without re-reading it.
+        book.copies_available -= 1
+        return BorrowRecord.objects.create(
+            member=member, book=book, borrowed_on=borrowed_on, due_date=due_date or borrowed_on + LOAN_PERIOD
+        )
+
+
+def bulk_checkout(loans, due_date=None, borrowed_on=None):
+    """
+    Lend a class set in one transaction. ``loans`` is a list of
+    ``(member, book)`` pairs; either every loan succeeds or none does.
+    """
+    if not loans:
+        return []
+    borrowed_on = borrowed_on or timezone.now()
+    due_date = due_date or borrowed_on + LOAN_PERIOD
+    with transaction.atomic():
+        short = _take_copies(Counter(book.pk for _, book in loans))
+        if short:
+            titles = sorted({book.title for _, book in loans if book.pk in short})
+            raise CirculationError(f"Not enough copies available: {', '.join(titles)}.")
+        for _, book in loans:
+            book.copies_available -= 1
+        return BorrowRecord.objects.bulk_create([
+            BorrowRecord(member=member, book=book, borrowed_on=borrowed_on, due_date=due_date)
+            for member, book in loans
+        ])
+
+
+def return_loan(record, returned_on=None):
+    """Mark ``record`` returned and credit its copy back."""
+    returned_on = returned_on or timezone.now()
+    with transaction.atomic():
+        closed = BorrowRecord.objects.filter(pk=record.pk, returned_on__isnull=True).update(returned_on=returned_on)
+        if not closed:
+            raise CirculationError("Book has already been returned.")
+        _restore_copies({record.book_id: 1})
+    record.returned_on = returned_on
+    return record
+
+
+def bulk_return(record_ids, returned_on=None):
+    """
+    Return many loans at once; loans already returned are ignored.
+    Returns the ids that were actually closed.
+    """
+    returned_on = returned_on or timezone.now()
+    with transaction.atomic():
+        open_loans = list(
+            BorrowRecord.objects.select_for_update()
+            .filter(pk__in=record_ids, returned_on__isnull=True)
+            .values_list("pk", "book_id")
+        )
+        if not open_loans:
+            return []
+        closed = [pk for pk, _ in open_loans]
+        BorrowRecord.objects.filter(pk__in=closed).update(returned_on=returned_on)
+        _restore_copies(Counter(book_id for _, book_id in open_loans))
+    return closed
@@ -0,0 +1,9 @@
+from django_filters import rest_framework as filters
+from .models import BorrowRecord
+
+class BorrowRecordFilter(filters.FilterSet):
+    open = filters.BooleanFilter(field_name='returned_on', lookup_expr='isnull')
+
+    class Meta:
+        model = BorrowRecord
+        fields = ['member', 'book', 'open']
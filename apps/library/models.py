@@ -59,6 +59,11 @@ class BorrowRecord(models.Model):
     class Meta:
         unique_together = ('member', 'book', 'borrowed_on')
         ordering = ['-borrowed_on']
+        indexes = [
+            models.Index(fields=['borrowed_on', 'id'], name='borrow_borrowed_keyset_idx'),
+            # Open loans by due date (overdue lists); returned loans are most of the table.
+            models.Index(fields=['due_date', 'id'], condition=models.Q(returned_on__isnull=True), name='borrow_open_due_idx'),
+        ]
         verbose_name = "Borrow Record"
         verbose_name_plural = "Borrow Records"
 
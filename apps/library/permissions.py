@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission
+from apps.users.roles import get_roles
 
 class IsLibraryStaffOrReadOnly(BasePermission):
     """
@@ -11,7 +12,7 @@ class IsLibraryStaffOrReadOnly(BasePermission):
             return user and user.is_authenticated
         
         # Write permissions for staff only
-        return user and user.is_authenticated and (user.is_staff or user.groups.filter(name='LibraryStaff').exists())
+        return user and user.is_authenticated and (user.is_staff or get_roles(user).in_group('LibraryStaff'))
 
 class IsLibraryStaff(BasePermission):
     """
@@ -19,4 +20,4 @@ class IsLibraryStaff(BasePermission):
     """
     def has_permission(self, request, view):
         user = request.user
-        return user and user.is_authenticated and (user.is_staff or user.groups.filter(name='LibraryStaff').exists())
\ No newline at end of file
+        return user and user.is_authenticated and (user.is_staff or get_roles(user).in_group('LibraryStaff'))
\ No newline at end of file
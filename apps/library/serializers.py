@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from django.utils import timezone
 from .models import Book, LibraryMember, BorrowRecord, Category
+from . import circulation
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -53,23 +53,41 @@ class BorrowRecordSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        book = validated_data['book']
-        book.copies_available -= 1
-        book.save()
-        return super().create(validated_data)
+        try:
+            return circulation.checkout(
+                validated_data['member'],
+                validated_data['book'],
+                due_date=validated_data.get('due_date'),
+                borrowed_on=validated_data.get('borrowed_on'),
+            )
+        except circulation.CirculationError as exc:
+            raise serializers.ValidationError(str(exc))
 
     def update(self, instance, validated_data):
         returned_on = validated_data.get('returned_on', None)
         if returned_on and not instance.returned_on:
-            instance.book.copies_available += 1
-            instance.book.save()
-            instance.returned_on = timezone.now()
-            instance.save()
-            return instance
+            try:
+                return circulation.return_loan(instance)
+            except circulation.CirculationError as exc:
+                raise serializers.ValidationError(str(exc))
         return super().update(instance, validated_data)
 
 class BorrowReturnSerializer(serializers.ModelSerializer):
     class Meta:
         model = BorrowRecord
         fields = ['returned_on']
-        read_only_fields = ['returned_on']
\ No newline at end of file
+        read_only_fields = ['returned_on']
+
+class BulkCheckoutSerializer(serializers.Serializer):
+    """Lend one title to a whole class, e.g. a set of course readers."""
+    book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all())
+    members = serializers.PrimaryKeyRelatedField(queryset=LibraryMember.objects.all(), many=True, allow_empty=False)
+    due_date = serializers.DateTimeField(required=False)
+
+    def validate_members(self, value):
+        if len({member.pk for member in value}) != len(value):
+            raise serializers.ValidationError("Members must not repeat.")
+        return value
+
+class BulkReturnSerializer(serializers.Serializer):
+    records = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
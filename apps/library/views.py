@@ -1,9 +1,14 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
 from .models import Book, LibraryMember, BorrowRecord
-from .serializers import BookSerializer, LibraryMemberSerializer, BorrowRecordSerializer
+from .serializers import (
+    BookSerializer, LibraryMemberSerializer, BorrowRecordSerializer, BulkCheckoutSerializer, BulkReturnSerializer
+)
+from . import circulation
+from .filters import BorrowRecordFilter
 from .permissions import IsLibraryStaffOrReadOnly, IsLibraryStaff
 
 class BookViewSet(viewsets.ModelViewSet):
@@ -20,6 +25,10 @@ class BorrowRecordViewSet(viewsets.ModelViewSet):
     queryset = BorrowRecord.objects.all()
     serializer_class = BorrowRecordSerializer
     permission_classes = [IsLibraryStaff]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = BorrowRecordFilter
+    ordering_fields = ['borrowed_on', 'due_date']
+    ordering = ['-borrowed_on']
 
     def perform_create(self, serializer):
         serializer.save(borrowed_on=timezone.now(), due_date=timezone.now() + timezone.timedelta(days=14))
@@ -27,13 +36,31 @@ class BorrowRecordViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='return-book')
     def return_book(self, request, pk=None):
         borrow_record = self.get_object()
-        if borrow_record.returned_on:
-            return Response({"detail": "Book has already been returned."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        borrow_record.returned_on = timezone.now()
-        borrow_record.book.copies_available += 1
-        borrow_record.book.save()
-        borrow_record.save()
-        
+        try:
+            circulation.return_loan(borrow_record)
+        except circulation.CirculationError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
         serializer = self.get_serializer(borrow_record)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-checkout')
+    def bulk_checkout(self, request):
+        """Lend one title to a list of members; all loans succeed or none do."""
+        ser = BulkCheckoutSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        book = ser.validated_data['book']
+        loans = [(member, book) for member in ser.validated_data['members']]
+        try:
+            records = circulation.bulk_checkout(loans, due_date=ser.validated_data.get('due_date'))
+        except circulation.CirculationError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response({"created": len(records), "records": [r.pk for r in records]}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-return')
+    def bulk_return(self, request):
+        """Return many loans at once; loans already returned are skipped."""
+        ser = BulkReturnSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        closed = circulation.bulk_return(ser.validated_data['records'])
+        return Response({"returned": len(closed), "records": closed})
\ No newline at end of file
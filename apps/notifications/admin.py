@@ -1,8 +1,13 @@
 from django.contrib import admin
-from .models import Notification
+from .models import DispatchMetrics, Notification
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('title', 'recipient', 'notif_type', 'sent', 'created_at', 'sent_at')
     search_fields = ('title', 'recipient__login_id', 'message')
     readonly_fields = ('sent', 'sent_at')
+
+@admin.register(DispatchMetrics)
+class DispatchMetricsAdmin(admin.ModelAdmin):
+    list_display = ('batches', 'claimed', 'sent', 'failed', 'skipped', 'seconds', 'updated_at')
+    readonly_fields = ('batches', 'claimed', 'sent', 'failed', 'skipped', 'seconds', 'last_run')
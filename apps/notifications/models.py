@@ -17,5 +17,35 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     sent_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notif_recipient_keyset_idx'),
+            # The dispatcher's queue and a recipient's unread list only ever touch unsent rows.
+            models.Index(fields=['id'], condition=models.Q(sent=False), name='notif_unsent_idx'),
+            models.Index(
+                fields=['recipient', 'created_at', 'id'], condition=models.Q(sent=False), name='notif_recipient_unsent_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} -> {self.recipient.login_id}"
+
+class DispatchMetrics(models.Model):
+    """
+    Cumulative dispatcher counters, one row shared by every worker
+    (see apps.notifications.dispatcher). Runs add to it with ``F()`` updates.
+    """
+    batches = models.BigIntegerField(default=0)
+    claimed = models.BigIntegerField(default=0)
+    sent = models.BigIntegerField(default=0)
+    failed = models.BigIntegerField(default=0)
+    skipped = models.BigIntegerField(default=0)
+    seconds = models.FloatField(default=0)
+    last_run = models.JSONField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Dispatch metrics'
+
+    def __str__(self):
+        return f"{self.sent} notifications sent in {self.batches} batches"
@@ -1,16 +1,7 @@
 from celery import shared_task
-from .models import Notification
-from .services import send_email, send_sms
-from django.utils import timezone
+from .dispatcher import BATCH_SIZE, dispatch_pending
 
 @shared_task
-def process_notifications():
-    notifications = Notification.objects.filter(sent=False)
-    for notif in notifications:
-        if notif.notif_type == 'EMAIL':
-            send_email(notif.recipient.email, notif.title, notif.message)
-        elif notif.notif_type == 'SMS':
-            send_sms(notif.recipient.phone_number, notif.message)
-        notif.sent = True
-        notif.sent_at = timezone.now()
-        notif.save()
+def process_notifications(batch_size=BATCH_SIZE, max_batches=None):
+    """Send pending notifications in locked batches; returns throughput metrics."""
+    return dispatch_pending(batch_size=batch_size, max_batches=max_batches)
@@ -15,4 +15,77 @@ class NotificationTests(TestCase):
     def test_list_notifications(self):
         response = self.client.get('/api/notifications/notifications/')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(login_id='std02', password='pass123', email='std02@example.com')
+        self.no_email = User.objects.create_user(login_id='std03', password='pass123')
+
+    def test_dispatch_sends_emails_in_batches(self):
+        from django.core import mail
+        from .dispatcher import dispatch_pending
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, title=f"N{i}", message="Hello", notif_type="EMAIL")
+            for i in range(25)
+        ])
+        run = dispatch_pending(batch_size=10)
+        self.assertEqual(run["batches"], 3)
+        self.assertEqual(run["sent"], 25)
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertFalse(Notification.objects.filter(sent=False).exists())
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_missing_address_is_skipped(self):
+        from .dispatcher import dispatch_pending
+        Notification.objects.create(recipient=self.no_email, title="A", message="m", notif_type="EMAIL")
+        Notification.objects.create(recipient=self.user, title="B", message="m", notif_type="PUSH")
+        run = dispatch_pending()
+        self.assertEqual(run["skipped"], 2)
+        self.assertFalse(Notification.objects.filter(sent=False).exists())
+
+    def test_failed_sms_stays_pending(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        from .dispatcher import _deliver
+        ok = Notification.objects.create(recipient=self.user, title="A", message="ok", notif_type="SMS")
+        bad = Notification.objects.create(recipient=self.user, title="B", message="fail", notif_type="SMS")
+        batch = list(Notification.objects.select_related('recipient').order_by('pk'))
+        for notif in batch:
+            notif.recipient.phone_number = '0700000000'
+
+        def fake_send(phone_number, message):
+            if message == "fail":
+                raise RuntimeError("gateway down")
+            return True
+
+        with mock.patch('apps.notifications.dispatcher.send_sms', side_effect=fake_send), \
+                ThreadPoolExecutor(max_workers=2) as pool:
+            delivered, failed, skipped = _deliver(batch, pool)
+        self.assertEqual((delivered, failed, skipped), ([ok.pk], [bad.pk], []))
+
+    def test_metrics_endpoint_requires_admin(self):
+        from .dispatcher import dispatch_pending
+        Notification.objects.create(recipient=self.user, title="A", message="m", notif_type="EMAIL")
+        dispatch_pending()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get('/api/notifications/notifications/dispatch-metrics/').status_code, 403)
+        admin = User.objects.create_superuser(login_id='admin01', password='pass123')
+        client.force_authenticate(user=admin)
+        response = client.get('/api/notifications/notifications/dispatch-metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["sent"], 1)
+
+    def test_metrics_accumulate_across_runs_in_the_database(self):
+        from .dispatcher import dispatch_pending, get_metrics
+        from .models import DispatchMetrics
+        self.assertEqual(get_metrics()["sent"], 0)
+        for title in ("A", "B"):
+            Notification.objects.create(recipient=self.user, title=title, message="m", notif_type="EMAIL")
+            dispatch_pending()
+        metrics = get_metrics()
+        self.assertEqual((metrics["batches"], metrics["sent"]), (2, 2))
+        self.assertEqual(metrics["last_run"]["sent"], 1)
+        self.assertEqual(DispatchMetrics.objects.count(), 1)
@@ -1,5 +1,9 @@
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from .dispatcher import get_metrics
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -7,7 +11,15 @@ class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['sent', 'notif_type']
+    ordering = ['-created_at']
 
     def get_queryset(self):
         user = self.request.user
         return Notification.objects.filter(recipient=user)
+
+    @action(detail=False, methods=['get'], url_path='dispatch-metrics', permission_classes=[IsAdminUser])
+    def dispatch_metrics(self, request):
+        """Cumulative dispatcher throughput and the most recent run."""
+        return Response(get_metrics())
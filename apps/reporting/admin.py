@@ -1,11 +1,16 @@
 from django.contrib import admin
-from .models import KPI, AuditLog, StudentPerformance
+from .models import KPI, KPISnapshot, AuditLog, StudentPerformance
 
 @admin.register(KPI)
 class KPIAdmin(admin.ModelAdmin):
     list_display = ['metric', 'value', 'created_at', 'updated_at']
     search_fields = ['metric']
 
+@admin.register(KPISnapshot)
+class KPISnapshotAdmin(admin.ModelAdmin):
+    list_display = ['kpi', 'bucket', 'period_start', 'value', 'running_count']
+    list_filter = ['bucket', 'kpi']
+
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ['user', 'module', 'action', 'object_repr', 'timestamp']
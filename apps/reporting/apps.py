@@ -4,3 +4,6 @@ class ReportingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reporting'
     verbose_name = "ERP Reporting & Analytics"
+
+    def ready(self):
+        from . import signals  # noqa: F401
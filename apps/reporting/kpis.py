@@ -0,0 +1,211 @@
+"""
+Incremental KPI engine.
+
+Each source-backed KPI stores a running sum and count plus the highest
+source primary key already folded in (``KPI.high_water_id``). A refresh
+aggregates only rows above that mark, grouped by day, and adds the result
+to the KPI and to its daily and per-term `KPISnapshot` buckets.
+
+Rows edited or deleted after they were folded are corrected through the
+signal handlers in `apps.reporting.signals`, which apply the difference
+with the KPI row locked. Writes that bypass signals (``QuerySet.update``,
+raw SQL) or ids that commit out of order can still cause drift: a row that
+commits after a higher id was folded sits below the mark and is never
+folded. ``refresh_kpis(rebuild=True)`` recomputes everything from scratch;
+``CELERY_BEAT_SCHEDULE`` runs the refresh every 15 minutes and the rebuild
+nightly.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import KPI, KPISnapshot, StudentPerformance
+from apps.finance.models import Payment
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0")
+
+
+class KPISource:
+    """Describes how a KPI is derived from a source table."""
+
+    def __init__(self, metric, model, field, kind, time_field, scale=1, description=""):
+        assert kind in ("sum", "avg")
+        self.metric = metric
+        self.model = model
+        self.field = field
+        self.kind = kind
+        self.time_field = time_field
+        self.scale = Decimal(str(scale))
+        self.description = description
+
+    def value(self, total, count):
+        if self.kind == "sum":
+            return float(total * self.scale)
+        return float(total / count * self.scale) if count else 0.0
+
+    def contribution(self, instance):
+        """``(amount, day)`` a single source row adds to the KPI."""
+        amount = getattr(instance, self.field)
+        moment = getattr(instance, self.time_field)
+        if amount is None or moment is None:
+            return None
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        return Decimal(str(amount)), moment.date()
+
+
+FINANCE_SOURCES = [
+    KPISource("Total Fees Collected", Payment, "amount_cents", "sum", "paid_at", scale="0.01",
+              description="Sum of all payments, in major currency units."),
+]
+PERFORMANCE_SOURCES = [
+    KPISource("Average Attendance", StudentPerformance, "attendance_percentage", "avg", "created_at",
+              description="Mean attendance percentage across student performance records."),
+    KPISource("Average Student Score", StudentPerformance, "score", "avg", "created_at",
+              description="Mean score across student performance records."),
+]
+KPI_SOURCES = FINANCE_SOURCES + PERFORMANCE_SOURCES
+
+
+def sources_for(model):
+    return [source for source in KPI_SOURCES if source.model is model]
+
+
+def _term_starts():
+    """Ascending ``(start_date, end_date)`` pairs of academic years (terms)."""
+    from apps.academic.models import AcademicYear
+
+    return list(AcademicYear.objects.order_by("start_date").values_list("start_date", "end_date"))
+
+
+def _term_for(day, terms):
+    for start, end in terms:
+        if start <= day <= end:
+            return start
+    return None
+
+
+def _locked_kpi(source):
+    KPI.objects.get_or_create(metric=source.metric, defaults={"description": source.description})
+    return KPI.objects.select_for_update().get(metric=source.metric)
+
+
+def _apply_buckets(kpi, source, deltas, terms):
+    """
+    Add ``{day: (sum, count)}`` deltas to the KPI's daily and term buckets.
+    Must run with the KPI row locked.
+    """
+    if not deltas:
+        return
+    wanted = {}
+    for day, (total, count) in deltas.items():
+        for bucket, start in (("day", day), ("term", _term_for(day, terms))):
+            if start is None:
+                continue
+            acc = wanted.setdefault((bucket, start), [ZERO, 0])
+            acc[0] += total
+            acc[1] += count
+
+    existing = {
+        (snap.bucket, snap.period_start): snap
+        for snap in KPISnapshot.objects.filter(
+            kpi=kpi, bucket__in={b for b, _ in wanted}, period_start__in={s for _, s in wanted}
+        )
+    }
+    to_update, to_create = [], []
+    for (bucket, start), (total, count) in wanted.items():
+        snap = existing.get((bucket, start))
+        if snap is None:
+            snap = KPISnapshot(kpi=kpi, bucket=bucket, period_start=start)
+            to_create.append(snap)
+        else:
+            to_update.append(snap)
+        snap.running_sum += total
+        snap.running_count += count
+        snap.value = source.value(snap.running_sum, snap.running_count)
+    KPISnapshot.objects.bulk_update(to_update, ["running_sum", "running_count", "value"], batch_size=500)
+    KPISnapshot.objects.bulk_create(to_create, batch_size=500)
+
+
+def fold(source, rebuild=False):
+    """
+    Fold source rows above the KPI's high-water mark into its running state.
+    Returns the number of rows folded.
+    """
+    with transaction.atomic():
+        kpi = _locked_kpi(source)
+        if rebuild:
+            kpi.running_sum, kpi.running_count, kpi.high_water_id = ZERO, 0, 0
+            kpi.snapshots.all().delete()
+
+        new_rows = source.model.objects.filter(pk__gt=kpi.high_water_id)
+        max_id = new_rows.aggregate(max_id=Max("pk"))["max_id"]
+        if max_id is None:
+            if rebuild:
+                kpi.value = 0
+                kpi.save(update_fields=["running_sum", "running_count", "high_water_id", "value", "updated_at"])
+            return 0
+
+        daily = (
+            new_rows.filter(pk__lte=max_id, **{f"{source.field}__isnull": False})
+            .annotate(day=TruncDate(source.time_field))
+            .values("day")
+            .annotate(total=Sum(source.field), count=Count("pk"))
+        )
+        deltas = {}
+        folded = 0
+        for row in daily:
+            total = Decimal(str(row["total"] or 0))
+            deltas[row["day"]] = (total, row["count"])
+            kpi.running_sum += total
+            kpi.running_count += row["count"]
+            folded += row["count"]
+        deltas.pop(None, None)
+        _apply_buckets(kpi, source, deltas, _term_starts())
+
+        kpi.high_water_id = max_id
+        kpi.value = source.value(kpi.running_sum, kpi.running_count)
+        kpi.save(update_fields=["running_sum", "running_count", "high_water_id", "value", "updated_at"])
+    logger.debug("Folded %s rows into KPI %s", folded, source.metric)
+    return folded
+
+
+def refresh_kpis(sources=None, rebuild=False):
+    """Fold new rows for every KPI in ``sources``; returns ``{metric: rows folded}``."""
+    return {source.metric: fold(source, rebuild=rebuild) for source in (sources or KPI_SOURCES)}
+
+
+def apply_change(source, instance, old, new):
+    """
+    Correct a KPI for an already-folded row whose contribution changed from
+    ``old`` to ``new`` (either may be None, see `KPISource.contribution`).
+    Rows above the high-water mark are skipped; the next fold counts them.
+    """
+    if old == new:
+        return
+    with transaction.atomic():
+        kpi = KPI.objects.select_for_update().filter(metric=source.metric).first()
+        if kpi is None or instance.pk is None or instance.pk > kpi.high_water_id:
+            return
+        deltas = {}
+        if old is not None:
+            amount, day = old
+            total, count = deltas.get(day, (ZERO, 0))
+            deltas[day] = (total - amount, count - 1)
+        if new is not None:
+            amount, day = new
+            total, count = deltas.get(day, (ZERO, 0))
+            deltas[day] = (total + amount, count + 1)
+        for total, count in deltas.values():
+            kpi.running_sum += total
+            kpi.running_count += count
+        _apply_buckets(kpi, source, deltas, _term_starts())
+        kpi.value = source.value(kpi.running_sum, kpi.running_count)
+        kpi.save(update_fields=["running_sum", "running_count", "value", "updated_at"])
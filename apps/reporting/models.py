@@ -11,12 +11,40 @@ class KPI(models.Model):
     metric = models.CharField(max_length=255, unique=True, default='default_metric')
     description = models.TextField(blank=True)
     value = models.FloatField(default=0)
+    # Running state for KPIs maintained incrementally by apps.reporting.kpis
+    running_sum = models.DecimalField(max_digits=24, decimal_places=4, default=0)
+    running_count = models.BigIntegerField(default=0)
+    high_water_id = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.metric
 
+class KPISnapshot(models.Model):
+    """
+    Time-bucketed KPI history: the sum and count of source rows falling in
+    one day or one academic term, so trends can be read without rescanning.
+    """
+    BUCKET_CHOICES = (
+        ('day', 'Daily'),
+        ('term', 'Term'),
+    )
+    kpi = models.ForeignKey(KPI, on_delete=models.CASCADE, related_name='snapshots')
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    period_start = models.DateField()
+    running_sum = models.DecimalField(max_digits=24, decimal_places=4, default=0)
+    running_count = models.BigIntegerField(default=0)
+    value = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kpi', 'bucket', 'period_start')
+        ordering = ['kpi', 'bucket', 'period_start']
+
+    def __str__(self):
+        return f"{self.kpi} [{self.bucket} {self.period_start}] = {self.value}"
+
 class AuditLog(models.Model):
     """
     Tracks changes across critical modules for compliance & reporting
@@ -33,11 +61,15 @@ class AuditLog(models.Model):
     related_object_name = models.CharField(max_length=255, blank=True)
     object_id = models.CharField(max_length=255, null=True, blank=True)
     object_repr = models.CharField(max_length=255, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by the caller so batched writes keep the event time (see apps.core.audit).
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     additional_info = models.JSONField(blank=True, null=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='auditlog_timestamp_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} {self.action} on {self.object_repr} in {self.module}"
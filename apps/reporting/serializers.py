@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import KPI, AuditLog, StudentPerformance
+from .models import KPI, KPISnapshot, AuditLog, StudentPerformance
 from apps.academic.models import Student, Course
 
 class KPISerializer(serializers.ModelSerializer):
@@ -8,6 +8,12 @@ class KPISerializer(serializers.ModelSerializer):
         fields = ['id', 'metric', 'value', 'description', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class KPISnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = KPISnapshot
+        fields = ['bucket', 'period_start', 'value', 'running_sum', 'running_count', 'updated_at']
+        read_only_fields = fields
+
 class AuditLogSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
 
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.finance.models import Payment
+from .models import StudentPerformance
+from .kpis import apply_change, sources_for
+
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=StudentPerformance)
+def remember_kpi_contribution(sender, instance, **kwargs):
+    """Capture the stored row before an update so its old contribution can be reversed."""
+    if instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._kpi_previous = {s.metric: s.contribution(previous) for s in sources_for(sender)}
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=StudentPerformance)
+def correct_kpis_on_update(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_kpi_previous", None)
+    if created or previous is None:
+        return
+    for source in sources_for(sender):
+        apply_change(source, instance, previous.get(source.metric), source.contribution(instance))
+    del instance._kpi_previous
+
+
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=StudentPerformance)
+def correct_kpis_on_delete(sender, instance, **kwargs):
+    for source in sources_for(sender):
+        apply_change(source, instance, source.contribution(instance), None)
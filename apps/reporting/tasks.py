@@ -1,19 +1,21 @@
 from celery import shared_task
-from django.db.models import Sum, Avg
-from .models import KPI, StudentPerformance
-from apps.finance.models import Payment  # Corrected import
+from django.conf import settings
+from apps.core.partitioning import PARTITIONED_MODELS, archive_partitions, ensure_partitions
+from .kpis import FINANCE_SOURCES, PERFORMANCE_SOURCES, refresh_kpis
 
 @shared_task
-def update_finance_kpis():
-    # The Payment model does not have a status field. We sum all payments.
-    total_collected_cents = Payment.objects.aggregate(total=Sum('amount_cents'))['total'] or 0
-    total_collected = total_collected_cents / 100
-    KPI.objects.update_or_create(metric='Total Fees Collected', defaults={'value': total_collected})
+def update_finance_kpis(rebuild=False):
+    # Folds only payments recorded since the last run; rebuild=True rescans.
+    return refresh_kpis(FINANCE_SOURCES, rebuild=rebuild)
 
 @shared_task
-def update_student_performance_kpis():
-    avg_attendance = StudentPerformance.objects.aggregate(avg_attendance=Avg('attendance_percentage'))['avg_attendance'] or 0
-    KPI.objects.update_or_create(metric='Average Attendance', defaults={'value': avg_attendance})
-    
-    avg_score = StudentPerformance.objects.aggregate(avg_score=Avg('score'))['avg_score'] or 0
-    KPI.objects.update_or_create(metric='Average Student Score', defaults={'value': avg_score})
\ No newline at end of file
+def update_student_performance_kpis(rebuild=False):
+    return refresh_kpis(PERFORMANCE_SOURCES, rebuild=rebuild)
+
+@shared_task
+def maintain_log_partitions():
+    # Monthly: add upcoming audit/webhook log partitions, archive expired ones.
+    for label in PARTITIONED_MODELS:
+        ensure_partitions(label, months_ahead=settings.LOG_PARTITION_MONTHS_AHEAD)
+        if settings.LOG_RETENTION_MONTHS:
+            archive_partitions(label, settings.LOG_RETENTION_MONTHS, settings.LOG_ARCHIVE_DIR)
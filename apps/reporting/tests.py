@@ -1,16 +1,32 @@
 import factory
+import gzip
 import logging
-from django.test import TestCase
+import os
+import tempfile
+import unittest
+from unittest import mock
+from datetime import timedelta
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from django.db import models
+from django.db import connection, models, transaction
 from apps.users.models import User
 from apps.academic.models import Student, Course
 from apps.finance.models import Payment, Ledger, Invoice
-from .models import KPI, AuditLog, StudentPerformance
+from .models import KPI, KPISnapshot, AuditLog, StudentPerformance
 from .tasks import update_finance_kpis, update_student_performance_kpis
+from apps.academic.models import AcademicYear
+from apps.core.audit import AuditWriter, record
+from apps.core.partitioning import (
+    archive_partitions, convert_table, ensure_partitions, is_partitioned, month_start, monthly_partitions,
+)
+from cerps import celery_app
+from cerps.middleware.audit import AuditMiddleware
 
 # Silence Celery logging during tests
 logging.getLogger('celery').setLevel(logging.CRITICAL)
@@ -119,7 +135,7 @@ class ReportingAPITests(TestCase):
         url = reverse('kpi-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_kpi_as_staff(self):
         url = reverse('kpi-list')
@@ -139,7 +155,7 @@ class ReportingAPITests(TestCase):
         url = reverse('auditlog-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_list_audit_logs_as_regular_user_denied(self):
         self.client.force_authenticate(user=self.regular_user)
@@ -151,7 +167,7 @@ class ReportingAPITests(TestCase):
         url = reverse('studentperformance-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
 
     def test_create_student_performance_as_staff(self):
         url = reverse('studentperformance-list')
@@ -173,8 +189,8 @@ class ReportingAPITests(TestCase):
         url = reverse('kpi-list') + '?search=Total Fees'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['metric'], 'Total Fees')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['metric'], 'Total Fees')
 
 class ReportingTaskTests(TestCase):
     def setUp(self):
@@ -215,4 +231,228 @@ class ReportingTaskTests(TestCase):
         self.assertAlmostEqual(avg_attendance_kpi.value, 85.0)
 
         avg_score_kpi = KPI.objects.get(metric='Average Student Score')
-        self.assertAlmostEqual(avg_score_kpi.value, 88.5)
\ No newline at end of file
+        self.assertAlmostEqual(avg_score_kpi.value, 88.5)
+
+class IncrementalKPITests(TestCase):
+    def setUp(self):
+        user = UserFactory()
+        self.student = Student.objects.create(user=user, admission_number='ADM-KPI-1')
+        self.course = CourseFactory()
+        ledger = Ledger.objects.create(student=self.student)
+        self.invoice = Invoice.objects.create(ledger=ledger, amount_cents=100000, due_date=timezone.now().date())
+
+    def _pay(self, cents, days_ago=0):
+        return Payment.objects.create(
+            invoice=self.invoice, amount_cents=cents, payment_method='cash',
+            paid_at=timezone.now() - timezone.timedelta(days=days_ago),
+        )
+
+    def test_only_new_payments_are_folded(self):
+        self._pay(10000)
+        self._pay(20000)
+        self.assertEqual(update_finance_kpis()['Total Fees Collected'], 2)
+        kpi = KPI.objects.get(metric='Total Fees Collected')
+        self.assertEqual(kpi.value, 300.0)
+
+        self._pay(5000)
+        self.assertEqual(update_finance_kpis()['Total Fees Collected'], 1)
+        kpi.refresh_from_db()
+        self.assertEqual(kpi.value, 350.0)
+        self.assertEqual(kpi.running_count, 3)
+
+    def test_fold_after_high_water_mark_scans_only_new_rows(self):
+        self._pay(10000)
+        update_finance_kpis()
+        with self.assertNumQueries(5):
+            # savepoint, get_or_create, lock, max(id), release
+            update_finance_kpis()
+
+    def test_updates_and_deletes_of_folded_rows_are_corrected(self):
+        payment = self._pay(10000)
+        other = self._pay(20000)
+        update_finance_kpis()
+        payment.amount_cents = 15000
+        payment.save()
+        other.delete()
+        kpi = KPI.objects.get(metric='Total Fees Collected')
+        self.assertEqual(kpi.value, 150.0)
+        self.assertEqual(kpi.running_count, 1)
+        update_finance_kpis(rebuild=True)
+        kpi.refresh_from_db()
+        self.assertEqual(kpi.value, 150.0)
+
+    def test_daily_and_term_history(self):
+        today = timezone.localdate()
+        AcademicYear.objects.create(
+            name='KPI Year', start_date=today - timezone.timedelta(days=30), end_date=today + timezone.timedelta(days=300)
+        )
+        self._pay(10000, days_ago=2)
+        self._pay(20000, days_ago=2)
+        self._pay(5000)
+        update_finance_kpis()
+        kpi = KPI.objects.get(metric='Total Fees Collected')
+        daily = list(KPISnapshot.objects.filter(kpi=kpi, bucket='day').values_list('value', flat=True))
+        self.assertEqual(daily, [300.0, 50.0])
+        term = KPISnapshot.objects.get(kpi=kpi, bucket='term')
+        self.assertEqual(term.value, 350.0)
+
+        client = APIClient()
+        client.force_authenticate(user=UserFactory(is_staff=True))
+        response = client.get(reverse('kpi-history', kwargs={'pk': kpi.pk}) + '?bucket=day')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['value'] for row in response.data], [300.0, 50.0])
+        response = client.get(reverse('kpi-history', kwargs={'pk': kpi.pk}) + '?start=2024-13-45')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_performance_averages_are_incremental(self):
+        StudentPerformance.objects.create(student=self.student, course=self.course, grade='A', attendance_percentage=90, score=92)
+        StudentPerformance.objects.create(student=self.student, course=self.course, grade='B', attendance_percentage=80, score=85)
+        update_student_performance_kpis()
+        StudentPerformance.objects.create(student=self.student, course=self.course, grade='C', attendance_percentage=70, score=60)
+        update_student_performance_kpis()
+        self.assertAlmostEqual(KPI.objects.get(metric='Average Attendance').value, 80.0)
+        self.assertAlmostEqual(KPI.objects.get(metric='Average Student Score').value, 79.0)
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = UserFactory(is_staff=True, is_superuser=True)
+        self.client.force_authenticate(user=self.admin)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin, module='Finance', action='update', object_repr=f'Invoice {i}')
+            for i in range(25)
+        ])
+        # Identical timestamps force the id tie-breaker to do the work.
+        AuditLog.objects.update(timestamp=timezone.now())
+
+    def test_walks_every_row_once(self):
+        url = reverse('auditlog-list') + '?page_size=10'
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, sorted(AuditLog.objects.values_list('id', flat=True), reverse=True))
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get(reverse('auditlog-list') + '?page_size=10')
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']],
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('auditlog-list') + '?cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AuditWriterTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.writer = AuditWriter(queue_size=2, batch_size=10, spill_dir=tempfile.mkdtemp())
+
+    def _event(self, n):
+        return {'user_id': self.user.pk, 'module': 'finance', 'action': 'create',
+                'object_repr': f'invoice {n}', 'timestamp': timezone.now(), 'additional_info': {'n': n}}
+
+    def test_full_queue_spills_and_replays(self):
+        for n in range(3):
+            self.writer.emit('reporting.AuditLog', self._event(n), start=False)
+        with self.assertNumQueries(1):
+            self.writer.flush()
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+        self.assertEqual(self.writer.replay_spill(), 1)
+        spilled = AuditLog.objects.get(object_repr='invoice 2')
+        self.assertEqual(spilled.additional_info, {'n': 2})
+        self.assertEqual(spilled.user, self.user)
+        self.assertEqual(self.writer.replay_spill(), 0)
+
+    def test_rows_are_queued_only_on_commit(self):
+        writer = mock.Mock()
+        with mock.patch('apps.core.audit.get_writer', return_value=writer):
+            with self.captureOnCommitCallbacks() as callbacks:
+                with transaction.atomic():
+                    record('reporting.AuditLog', **self._event('kept'))
+            with self.captureOnCommitCallbacks() as rolled_back:
+                try:
+                    with transaction.atomic():
+                        record('reporting.AuditLog', **self._event('rolled back'))
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            writer.emit.assert_not_called()
+            self.assertEqual(rolled_back, [])
+            for callback in callbacks:
+                callback()
+        writer.emit.assert_called_once()
+        self.assertEqual(writer.emit.call_args.args[1]['object_repr'], 'invoice kept')
+
+    def test_middleware_audits_authenticated_writes(self):
+        middleware = AuditMiddleware(lambda request: HttpResponse(status=201))
+        with self.settings(AUDIT_ASYNC=False):
+            for method, user in (('post', self.user), ('get', self.user), ('post', AnonymousUser())):
+                request = getattr(RequestFactory(), method)('/api/finance/invoices/')
+                request.user = user
+                middleware(request)
+        log = AuditLog.objects.get()
+        self.assertEqual((log.user, log.module, log.action), (self.user, 'finance', 'create'))
+
+    def test_api_writes_and_log_action_are_audited(self):
+        from apps.core.models import AuditLog as CoreAuditLog
+        from apps.core.utils import log_action
+        admin = UserFactory(is_staff=True, is_superuser=True)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        with self.settings(AUDIT_ASYNC=False):
+            response = client.post(reverse('kpi-list'), {'metric': 'Audited', 'value': 1}, format='json')
+            log_action(admin, 'created_ledger', {'ledger': 1})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        log = AuditLog.objects.get()
+        self.assertEqual((log.user, log.module, log.action), (admin, 'reporting', 'create'))
+        self.assertEqual(CoreAuditLog.objects.get().details, {'ledger': 1})
+
+
+class BeatScheduleTests(SimpleTestCase):
+    def test_schedule_names_registered_tasks(self):
+        celery_app.loader.import_default_modules()
+        for name, entry in settings.CELERY_BEAT_SCHEDULE.items():
+            self.assertIn(entry['task'], celery_app.tasks, name)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'declarative partitioning needs PostgreSQL')
+class LogPartitioningTests(TestCase):
+    def test_partitioned_audit_log_keeps_working(self):
+        admin = UserFactory(is_staff=True, is_superuser=True)
+        now = timezone.now()
+        expired = now - timedelta(days=800)
+        AuditLog.objects.create(user=admin, module='finance', action='create', timestamp=expired)
+        self.assertEqual(convert_table('reporting.AuditLog', months_ahead=1), 1)
+        table = AuditLog._meta.db_table
+        self.assertTrue(is_partitioned(table))
+        self.assertIn(month_start(expired), monthly_partitions(table))
+
+        AuditLog.objects.create(user=admin, module='finance', action='update')
+        future = now + timedelta(days=200)
+        AuditLog.objects.create(user=admin, module='hostel', action='update', timestamp=future)
+        self.assertNotIn(month_start(future), monthly_partitions(table))
+        ensure_partitions('reporting.AuditLog', months_ahead=0, now=future)
+        self.assertIn(month_start(future), monthly_partitions(table))
+
+        archive_dir = tempfile.mkdtemp()
+        self.assertIn(f'{table}_p{expired:%Y%m}', archive_partitions('reporting.AuditLog', 24, archive_dir))
+        self.assertNotIn(month_start(expired), monthly_partitions(table))
+        with gzip.open(os.path.join(archive_dir, f'{table}_p{expired:%Y%m}.csv.gz'), 'rt') as archived:
+            self.assertIn('finance,create', archived.read())
+
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.get(reverse('auditlog-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['module'] for row in response.data['results']], ['hostel', 'finance'])
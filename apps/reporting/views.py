@@ -1,15 +1,21 @@
 import logging
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import KPI, AuditLog, StudentPerformance
-from .serializers import KPISerializer, AuditLogSerializer, StudentPerformanceSerializer
+from .models import KPI, KPISnapshot, AuditLog, StudentPerformance
+from .serializers import KPISerializer, KPISnapshotSerializer, AuditLogSerializer, StudentPerformanceSerializer
 from .permissions import IsStaffOrReadOnly
+from apps.core.exports import ExportMixin
+from apps.core.pagination import LookupPagination
 
 logger = logging.getLogger(__name__)
 
 class KPIViewSet(viewsets.ModelViewSet):
     queryset = KPI.objects.all()
     serializer_class = KPISerializer
+    pagination_class = LookupPagination
     permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["metric"]
@@ -17,8 +23,32 @@ class KPIViewSet(viewsets.ModelViewSet):
     ordering_fields = ["created_at", "value"]
     ordering = ["-created_at"]
 
-class AuditLogViewSet(viewsets.ModelViewSet):
-    queryset = AuditLog.objects.all()
+    @action(detail=True, methods=["get"])
+    def history(self, request, pk=None):
+        """
+        Daily or per-term KPI trend from stored snapshots.
+        Query params: bucket (day|term, default day), start, end (YYYY-MM-DD).
+        """
+        kpi = self.get_object()
+        bucket = request.query_params.get("bucket", "day")
+        if bucket not in dict(KPISnapshot.BUCKET_CHOICES):
+            return Response({"detail": "bucket must be 'day' or 'term'."}, status=status.HTTP_400_BAD_REQUEST)
+        snapshots = KPISnapshot.objects.filter(kpi=kpi, bucket=bucket)
+        for param, lookup in (("start", "period_start__gte"), ("end", "period_start__lte")):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    day = parse_date(value)
+                except ValueError:
+                    # Well-formed but not a real date, e.g. 2024-13-45.
+                    day = None
+                if day is None:
+                    return Response({"detail": f"{param} must be a date (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+                snapshots = snapshots.filter(**{lookup: day})
+        return Response(KPISnapshotSerializer(snapshots.order_by("period_start"), many=True).data)
+
+class AuditLogViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = AuditLog.objects.select_related("user")
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
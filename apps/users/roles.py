@@ -0,0 +1,125 @@
+"""
+Role resolution for permission classes and viewsets.
+
+A user's group names are loaded once per request (memoized on the user
+instance attached to the request), so answering "is this user
+Admissions/HR/HostelAdmin" does not cost a `groups.filter(...).exists()`
+query per check. When the default cache is shared between processes
+(Redis) they are also kept there between requests, and the signal handlers
+in `apps.users.signals` drop the entries whenever a user's group
+membership changes. A per-process cache is not used: an invalidation would
+only reach the process that made it, and a revoked group would stay in
+effect in the others.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.core.caching import cache_is_shared
+
+# Bump when the cached payload changes shape so old entries are ignored.
+ROLES_CACHE_VERSION = 1
+ROLES_CACHE_TIMEOUT = getattr(settings, "USER_ROLES_CACHE_TIMEOUT", 60 * 15)
+
+_REQUEST_ATTR = "_cerps_roles"
+
+
+class UserRoles:
+    """
+    Snapshot of the role information permission checks need.
+    Group names come from the database or the shared cache; the boolean
+    flags are read from the already-loaded user row.
+    """
+    __slots__ = (
+        "groups", "is_authenticated", "is_superuser", "is_staff",
+        "is_student", "is_faculty", "is_finance", "is_hr",
+    )
+
+    def __init__(self, groups=(), is_authenticated=False, is_superuser=False, is_staff=False,
+                 is_student=False, is_faculty=False, is_finance=False, is_hr=False):
+        self.groups = frozenset(groups)
+        self.is_authenticated = is_authenticated
+        self.is_superuser = is_superuser
+        self.is_staff = is_staff
+        self.is_student = is_student
+        self.is_faculty = is_faculty
+        self.is_finance = is_finance
+        self.is_hr = is_hr
+
+    def in_group(self, *names):
+        """True if the user belongs to any of the given groups."""
+        return not self.groups.isdisjoint(names)
+
+    def __repr__(self):
+        return f"UserRoles(groups={sorted(self.groups)})"
+
+
+ANONYMOUS_ROLES = UserRoles()
+
+
+def _cache_key(user_id):
+    return f"users:roles:{user_id}"
+
+
+def _load_group_names(user):
+    if not cache_is_shared():
+        return list(user.groups.values_list("name", flat=True))
+    key = _cache_key(user.pk)
+    names = cache.get(key, version=ROLES_CACHE_VERSION)
+    if names is None:
+        names = list(user.groups.values_list("name", flat=True))
+        cache.set(key, names, ROLES_CACHE_TIMEOUT, version=ROLES_CACHE_VERSION)
+    return names
+
+
+def get_roles(user):
+    """
+    Return the `UserRoles` for ``user``, hitting the database at most once
+    per user instance (and only on a cache miss with a shared cache).
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_ROLES
+    roles = getattr(user, _REQUEST_ATTR, None)
+    if roles is None:
+        roles = UserRoles(
+            groups=_load_group_names(user),
+            is_authenticated=True,
+            is_superuser=user.is_superuser,
+            is_staff=user.is_staff,
+            is_student=getattr(user, "is_student", False),
+            is_faculty=getattr(user, "is_faculty", False),
+            is_finance=getattr(user, "is_finance", False),
+            is_hr=getattr(user, "is_hr", False),
+        )
+        setattr(user, _REQUEST_ATTR, roles)
+    return roles
+
+
+def user_in_groups(user, *names):
+    """Shortcut for ``get_roles(user).in_group(*names)``."""
+    return get_roles(user).in_group(*names)
+
+
+def invalidate_roles(*user_ids):
+    """
+    Drop cached roles for the given users.
+    The entries are deleted immediately and again once the surrounding
+    transaction commits, so a concurrent request cannot re-cache the
+    pre-commit membership.
+    """
+    keys = [_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys or not cache_is_shared():
+        return
+
+    def _delete():
+        cache.delete_many(keys, version=ROLES_CACHE_VERSION)
+
+    _delete()
+    transaction.on_commit(_delete)
+
+
+def forget_request_roles(user):
+    """Clear the per-request memo on a user instance."""
+    if hasattr(user, _REQUEST_ATTR):
+        delattr(user, _REQUEST_ATTR)
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import User
+from .roles import forget_request_roles, invalidate_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate cached roles whenever group membership changes, from either side."""
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        if action == "pre_clear":
+            return
+        forget_request_roles(instance)
+        invalidate_roles(instance.pk)
+        return
+    # group.user_set.add/remove/clear(...)
+    if action == "pre_clear":
+        invalidate_roles(*instance.user_set.values_list("pk", flat=True))
+    elif pk_set:
+        invalidate_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    # A rename changes every member's group names.
+    if not created:
+        invalidate_roles(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    invalidate_roles(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # New rows may reuse a primary key whose roles are still cached.
+    if created:
+        invalidate_roles(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_roles(instance.pk)
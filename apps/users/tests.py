@@ -2,6 +2,10 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import override_settings
+from apps.core.testing import SharedCacheMixin
+from .roles import get_roles
 
 User = get_user_model()
 
@@ -37,3 +41,56 @@ class UserModuleTests(TestCase):
         self.assertEqual(res.status_code, 200)
         self.student.refresh_from_db()
         self.assertTrue(self.student.check_password('NewPwd123!'))
+
+
+class RoleResolutionTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(login_id='HR001', password='HrPass123!', is_hr=True)
+        self.hr_group = Group.objects.create(name='HR')
+
+    def _fresh(self):
+        # A new instance, as the authentication backend would load per request
+        return User.objects.get(pk=self.user.pk)
+
+    def test_roles_loaded_once_per_request(self):
+        user = self._fresh()
+        with self.assertNumQueries(1):
+            get_roles(user)
+            get_roles(user).in_group('HR')
+            get_roles(user).in_group('Admissions')
+
+    def test_roles_served_from_cache_across_requests(self):
+        get_roles(self._fresh())
+        user = self._fresh()
+        with self.assertNumQueries(0):
+            roles = get_roles(user)
+        self.assertTrue(roles.is_hr)
+        self.assertFalse(roles.is_student)
+
+    def test_per_process_cache_is_not_used_across_requests(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            get_roles(self._fresh())
+            user = self._fresh()
+            with self.assertNumQueries(1):
+                get_roles(user)
+
+    def test_group_add_invalidates_cache(self):
+        self.assertFalse(get_roles(self._fresh()).in_group('HR'))
+        self.user.groups.add(self.hr_group)
+        self.assertTrue(get_roles(self._fresh()).in_group('HR'))
+
+    def test_reverse_group_changes_invalidate_cache(self):
+        self.hr_group.user_set.add(self.user)
+        self.assertTrue(get_roles(self._fresh()).in_group('HR'))
+        self.hr_group.user_set.clear()
+        self.assertFalse(get_roles(self._fresh()).in_group('HR'))
+
+    def test_group_rename_invalidates_cache(self):
+        self.user.groups.add(self.hr_group)
+        self.assertTrue(get_roles(self._fresh()).in_group('HR'))
+        self.hr_group.name = 'People'
+        self.hr_group.save()
+        roles = get_roles(self._fresh())
+        self.assertFalse(roles.in_group('HR'))
+        self.assertTrue(roles.in_group('People'))
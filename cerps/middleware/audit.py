@@ -1,11 +1,38 @@
 import logging
 from django.utils.deprecation import MiddlewareMixin
-from datetime import datetime
+from apps.core.audit import record
 
 logger = logging.getLogger(__name__)
 
+AUDITED_METHODS = {'POST': 'create', 'PUT': 'update', 'PATCH': 'update', 'DELETE': 'delete'}
+
+
+def _module(path):
+    parts = [part for part in path.split('/') if part]
+    if parts and parts[0] == 'api':
+        parts = parts[1:]
+    return parts[0][:50] if parts else ''
+
+
 class AuditMiddleware(MiddlewareMixin):
-    def process_request(self, request):
+    """
+    Logs every request and queues a reporting AuditLog row for successful
+    writes by authenticated users. Runs on the response so users
+    authenticated by DRF (token/JWT) are seen too.
+    """
+
+    def process_response(self, request, response):
         user = getattr(request, 'user', None)
-        user_info = user.username if user and user.is_authenticated else 'Anonymous'
-        logger.info(f"[{datetime.now()}] Request: {request.method} {request.path} by {user_info}")
+        authenticated = user is not None and user.is_authenticated
+        logger.info(
+            "Request: %s %s by %s -> %s", request.method, request.path,
+            user.get_username() if authenticated else 'Anonymous', response.status_code
+        )
+        action = AUDITED_METHODS.get(request.method)
+        if action and authenticated and response.status_code < 400:
+            record(
+                'reporting.AuditLog', user_id=user.pk, module=_module(request.path), action=action,
+                object_repr=request.path[:255],
+                additional_info={'method': request.method, 'status': response.status_code},
+            )
+        return response
@@ -12,6 +12,7 @@ Enhanced for CERPS ERP:
 from pathlib import Path
 from datetime import timedelta
 import os
+from celery.schedules import crontab
 
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -66,6 +67,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Queues an AuditLog row per successful write (see apps.core.audit).
+    'cerps.middleware.audit.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -129,6 +132,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Keyset (cursor) pagination everywhere; lookup tables opt into
+    # apps.core.pagination.LookupPagination.
+    'DEFAULT_PAGINATION_CLASS': 'apps.core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 SIMPLE_JWT = {
@@ -160,12 +167,143 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Periodic tasks, run by `celery -A cerps beat`
+CELERY_BEAT_SCHEDULE = {
+    # Before the month turns: add upcoming log partitions, archive expired ones.
+    'maintain-log-partitions': {
+        'task': 'apps.reporting.tasks.maintain_log_partitions',
+        'schedule': crontab(minute=30, hour=2, day_of_month=25),
+    },
+    'snapshot-admissions-funnel': {
+        'task': 'apps.admissions.tasks.snapshot_admissions_funnel',
+        'schedule': crontab(minute=55, hour=23),
+    },
+    'expire-admission-offers': {
+        'task': 'apps.admissions.tasks.expire_admission_offers',
+        'schedule': crontab(minute=5, hour=0),
+    },
+    'purge-stale-document-uploads': {
+        'task': 'apps.admissions.tasks.purge_stale_document_uploads',
+        'schedule': crontab(minute=15, hour=3),
+    },
+    # KPIs fold new rows every 15 minutes; the nightly rebuild picks up rows
+    # that committed after a higher id was folded, and writes that bypassed signals.
+    'refresh-finance-kpis': {
+        'task': 'apps.reporting.tasks.update_finance_kpis',
+        'schedule': crontab(minute='*/15'),
+    },
+    'refresh-performance-kpis': {
+        'task': 'apps.reporting.tasks.update_student_performance_kpis',
+        'schedule': crontab(minute='*/15'),
+    },
+    'rebuild-finance-kpis': {
+        'task': 'apps.reporting.tasks.update_finance_kpis',
+        'schedule': crontab(minute=10, hour=1),
+        'kwargs': {'rebuild': True},
+    },
+    'rebuild-performance-kpis': {
+        'task': 'apps.reporting.tasks.update_student_performance_kpis',
+        'schedule': crontab(minute=20, hour=1),
+        'kwargs': {'rebuild': True},
+    },
+    # Report-only; drift is fixed by running reconcile_ledgers --fix by hand.
+    'reconcile-ledgers': {
+        'task': 'apps.finance.tasks.reconcile_ledgers',
+        'schedule': crontab(minute=45, hour=1),
+    },
+}
+
 # Default auto field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache: Redis when REDIS_CACHE_URL is set, per-process memory otherwise
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL', '')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'cerps',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cerps',
+        }
+    }
+
+# Seconds a user's resolved group names stay cached (see apps.users.roles)
+USER_ROLES_CACHE_TIMEOUT = int(os.environ.get('USER_ROLES_CACHE_TIMEOUT', 60 * 15))
+
+# Notification dispatcher (see apps.notifications.dispatcher)
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 500))
+NOTIFICATION_SMTP_CONNECTIONS = int(os.environ.get('NOTIFICATION_SMTP_CONNECTIONS', 4))
+NOTIFICATION_SMS_WORKERS = int(os.environ.get('NOTIFICATION_SMS_WORKERS', 16))
+
+# Buffered audit writer (see apps.core.audit)
+AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'True') == 'True'
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2.0))
+AUDIT_SPILL_DIR = os.environ.get('AUDIT_SPILL_DIR', str(BASE_DIR / 'var' / 'audit-spill'))
+
+# Monthly log partitions (see apps.core.partitioning, manage.py partition_logs)
+LOG_PARTITION_MONTHS_AHEAD = int(os.environ.get('LOG_PARTITION_MONTHS_AHEAD', 3))
+LOG_RETENTION_MONTHS = int(os.environ.get('LOG_RETENTION_MONTHS', 24))
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', str(BASE_DIR / 'var' / 'log-archive'))
+
+# Payment webhook processing (see apps.integrations.webhooks)
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 100))
+WEBHOOK_VERIFY_WORKERS = int(os.environ.get('WEBHOOK_VERIFY_WORKERS', 8))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 5))
+WEBHOOK_SCHEDULE_DELAY = int(os.environ.get('WEBHOOK_SCHEDULE_DELAY', 2))
+WEBHOOK_RETRY_DELAY = int(os.environ.get('WEBHOOK_RETRY_DELAY', 60))
+
+# Outbound HTTP client for integrations (see apps.integrations.http_client)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+HTTP_BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.2))
+HTTP_BACKOFF_MAX = float(os.environ.get('HTTP_BACKOFF_MAX', 5.0))
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+HTTP_CIRCUIT_FAILURES = int(os.environ.get('HTTP_CIRCUIT_FAILURES', 5))
+HTTP_CIRCUIT_RESET = int(os.environ.get('HTTP_CIRCUIT_RESET', 30))
+
+# Moodle sync (see apps.integrations.moodle, manage.py sync_moodle)
+MOODLE_BASE_URL = os.environ.get('MOODLE_BASE_URL', '')
+MOODLE_TOKEN = os.environ.get('MOODLE_TOKEN', '')
+MOODLE_PAGE_SIZE = int(os.environ.get('MOODLE_PAGE_SIZE', 500))
+
+# Ledger reconciliation (see apps.finance.posting, manage.py reconcile_ledgers)
+LEDGER_RECONCILE_CHUNK_SIZE = int(os.environ.get('LEDGER_RECONCILE_CHUNK_SIZE', 1000))
+LEDGER_RECONCILE_WORKERS = int(os.environ.get('LEDGER_RECONCILE_WORKERS', 4))
+
+# Bulk fee invoicing (see apps.finance.billing)
+BILLING_CHUNK_SIZE = int(os.environ.get('BILLING_CHUNK_SIZE', 500))
+
+# Admissions review queue (see apps.admissions.reviews)
+ADMISSIONS_REVIEWS_REQUIRED = int(os.environ.get('ADMISSIONS_REVIEWS_REQUIRED', 1))
+ADMISSIONS_REVIEW_CLAIM_MINUTES = int(os.environ.get('ADMISSIONS_REVIEW_CLAIM_MINUTES', 30))
+ADMISSIONS_REVIEW_BATCH_MAX = int(os.environ.get('ADMISSIONS_REVIEW_BATCH_MAX', 500))
+
+# Admissions decision engine (see apps.admissions.decisions)
+ADMISSIONS_DECISION_BATCH_SIZE = int(os.environ.get('ADMISSIONS_DECISION_BATCH_SIZE', 1000))
+ADMISSIONS_OFFER_DAYS = int(os.environ.get('ADMISSIONS_OFFER_DAYS', 14))
+
+# Admissions document uploads (see apps.admissions.uploads)
+ADMISSIONS_UPLOAD_DIR = os.environ.get('ADMISSIONS_UPLOAD_DIR', str(BASE_DIR / 'var' / 'admission-uploads'))
+ADMISSIONS_UPLOAD_MAX_BYTES = int(os.environ.get('ADMISSIONS_UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+ADMISSIONS_UPLOAD_CHUNK_BYTES = int(os.environ.get('ADMISSIONS_UPLOAD_CHUNK_BYTES', 5 * 1024 * 1024))
+ADMISSIONS_UPLOAD_EXPIRY_HOURS = int(os.environ.get('ADMISSIONS_UPLOAD_EXPIRY_HOURS', 48))
+ADMISSIONS_THUMBNAIL_SIZE = int(os.environ.get('ADMISSIONS_THUMBNAIL_SIZE', 256))
+
 # Stripe settings
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY", "")
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
+PAYSTACK_SECRET_KEY = os.environ.get("PAYSTACK_SECRET_KEY", "")
 
 # Debug Toolbar internal IPs
 if DEBUG:
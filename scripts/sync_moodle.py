@@ -1,36 +1,21 @@
-import requests
 import os
+import sys
 import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cerps.settings")
 django.setup()
 
-from apps.users.models import CustomUser
+from django.conf import settings
+from apps.integrations.lti import sync_moodle_users
 
-MOODLE_API_URL = "https://yourmoodle.com/webservice/rest/server.php"
-MOODLE_TOKEN = "your_token_here"
+MOODLE_BASE_URL = os.environ.get("MOODLE_BASE_URL", settings.MOODLE_BASE_URL)
+MOODLE_TOKEN = os.environ.get("MOODLE_TOKEN", settings.MOODLE_TOKEN)
 
-def sync_students():
-    params = {
-        "wstoken": MOODLE_TOKEN,
-        "wsfunction": "core_user_get_users",
-        "criteria[0][key]": "username",
-        "criteria[0][value]": "%",
-        "moodlewsrestformat": "json"
-    }
-    response = requests.get(MOODLE_API_URL, params=params)
-    data = response.json()
-    for student in data.get("users", []):
-        if not CustomUser.objects.filter(username=student["username"]).exists():
-            CustomUser.objects.create_user(
-                username=student["username"],
-                first_name=student["firstname"],
-                last_name=student["lastname"],
-                email=student["email"],
-                password="defaultpass",
-                is_student=True
-            )
-            print(f"Synced student: {student['username']}")
+def sync_students(full=False):
+    # Paged, diffed against local users and written in bulk; only records
+    # changed since the last run are applied unless full=True.
+    stats = sync_moodle_users(MOODLE_BASE_URL, MOODLE_TOKEN, full=full)
+    print(f"Synced students: {stats}")
 
 if __name__ == "__main__":
-    sync_students()
+    sync_students(full="--full" in sys.argv)